@@ -1 +1,7 @@
+import sys
+
+from .batch import verify_many
 from .verifier import validate_extensions, verify
+
+if sys.version_info >= (3, 5):
+    from .aio import verify_async
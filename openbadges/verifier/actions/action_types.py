@@ -37,3 +37,11 @@ RUN_VALIDATION_REPORT = 'RUN_VALIDATION_REPORT'
 SET_OPENBADGES_VERSION = 'SET_OPENBADGES_VERSION'
 SET_VALIDATION_SUBJECT = 'SET_VALIDATION_SUBJECT'
 SET_VERIFIED_PROFILE = 'SET_VERIFIED_PROFILE'
+SET_LIMIT_REACHED = 'SET_LIMIT_REACHED'
+
+
+"""
+BATCH Action:
+Apply several actions in order as a single dispatch.
+"""
+BATCH = 'BATCH'
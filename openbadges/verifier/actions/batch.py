@@ -0,0 +1,19 @@
+from .action_types import BATCH
+
+
+def batch_actions(actions):
+    """
+    Combine actions into one action that the store applies in order in a single dispatch.
+    Nested batches are flattened.
+    """
+    flattened = []
+    for action in actions:
+        if action.get('type') == BATCH:
+            flattened.extend(action['actions'])
+        else:
+            flattened.append(action)
+
+    return {
+        'type': BATCH,
+        'actions': flattened
+    }
@@ -19,13 +19,29 @@ def add_task(task_name, **kwargs):
     return task
 
 
-def resolve_task(task_id, success=True, result=''):
-    return {
+def restore_task(task_meta, allow_duplicate=False, **kwargs):
+    """
+    Returns an action adding a copy of a task entry (without its task_id), including its completion and result.
+    With allow_duplicate, the task is added even if it duplicates one already in the tasks state.
+    """
+    task = {'type': ADD_TASK}
+    task.update((key, value) for key, value in task_meta.items() if key != 'task_id')
+    task.update(**kwargs)
+    if allow_duplicate:
+        task['allow_duplicate'] = True
+    return task
+
+
+def resolve_task(task_id, success=True, result='', metrics=None):
+    action = {
         'type': RESOLVE_TASK,
         'task_id': task_id,
         'success': success,
         'result': result
     }
+    if metrics is not None:
+        action['metrics'] = metrics
+    return action
 
 
 def trigger_condition(condition_key, result=''):
@@ -1,4 +1,4 @@
-from .action_types import (RUN_VALIDATION_REPORT, SET_OPENBADGES_VERSION, SET_VALIDATION_SUBJECT,
+from .action_types import (RUN_VALIDATION_REPORT, SET_LIMIT_REACHED, SET_OPENBADGES_VERSION, SET_VALIDATION_SUBJECT,
                            SET_VERIFIED_PROFILE)
 
 
@@ -48,3 +48,15 @@ def set_verified_recipient_profile(id_type, confirmed_id):
         'identityType': id_type,
         'identityValue': confirmed_id
     }
+
+
+def set_limit_reached(limit_name):
+    """
+    Record that verification stopped early at a limit.
+    :param limit_name: One of ("deadline_seconds", "max_tasks", "max_fetches")
+    :return: dict
+    """
+    return {
+        'type': SET_LIMIT_REACHED,
+        'limit': limit_name
+    }
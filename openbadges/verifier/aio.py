@@ -0,0 +1,175 @@
+"""
+An asyncio entry point for verification (Python 3.5+).
+
+Tasks remain synchronous functions. They are run against responses held in memory, and any
+HTTP resource a task asks for that has not been fetched yet is fetched through an async
+transport before the task runs again. Many verifications can then share one event loop.
+"""
+import asyncio
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .contexts import BundledContextLoader
+from .exceptions import ResourceNotLoaded
+from .scheduler import TaskScheduler
+from .store import create_verification_store
+from . import tasks
+from .tasks.task_types import IO_BOUND_TASKS
+from .utils import CachableDocumentLoader
+from .verifier import _get_options, dispatch_task_result, generate_report, measure_task, queue_input_tasks, task_batches
+
+
+ACCEPT_HEADERS = {'Accept': 'application/ld+json, application/json, image/png, image/svg+xml'}
+
+
+def build_response(url, status_code, headers, content):
+    """
+    Make a requests.Response out of data received by an async transport, so that tasks can
+    handle it exactly as they would a response from a requests session.
+    :param url: str
+    :param status_code: int
+    :param headers: dict-like
+    :param content: bytes
+    :return: requests.Response
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = ''
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
+
+
+class AiohttpTransport(object):
+    """
+    The default async transport. Performs GET requests with an aiohttp ClientSession, which may be
+    shared across verifications by passing it in. Requires the 'async' extra (aiohttp).
+    """
+    def __init__(self, session=None):
+        self.session = session
+        self._owns_session = session is None
+
+    async def get(self, url, headers=None):
+        if self.session is None:
+            import aiohttp
+            self.session = aiohttp.ClientSession()
+
+        async with self.session.get(url, headers=headers) as resp:
+            content = await resp.read()
+            return build_response(url, resp.status, resp.headers, content)
+
+    async def close(self):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class PrefetchedSession(object):
+    """
+    A stand-in for a requests session that serves GET requests from responses already fetched
+    by the async driver. A request for any other URL is recorded in `missing` and raises
+    ResourceNotLoaded.
+    """
+    def __init__(self):
+        self.responses = {}
+        self.missing = set()
+
+    def get(self, url, headers=None, **kwargs):
+        try:
+            response = self.responses[url]
+        except KeyError:
+            self.missing.add(url)
+            raise ResourceNotLoaded(url)
+
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def fetch(self, urls, transport):
+        urls = [url for url in set(urls) if url not in self.responses]
+        responses = await asyncio.gather(*[self._fetch_one(url, transport) for url in urls])
+        self.responses.update(zip(urls, responses))
+
+    @staticmethod
+    async def _fetch_one(url, transport):
+        try:
+            return await transport.get(url, headers=ACCEPT_HEADERS)
+        except Exception as e:
+            # Surface transport errors to tasks the same way a requests session would.
+            return requests.ConnectionError(e)
+
+
+async def call_tasks_async(task_metas, store, session, transport, options):
+    """
+    Runs tasks against the current state, fetching the HTTP resources they need and running them
+    again until they complete, then resolves them and dispatches their actions in task order.
+    :param task_metas: list of dicts (entries in tasks state)
+    :param store: pydux store
+    :param session: PrefetchedSession (also used by options['jsonld_options']['documentLoader'])
+    :param transport: object with an async get(url, headers) method returning a requests.Response
+    """
+    state = store.get_state()
+    results = [None] * len(task_metas)
+    task_metrics = [None] * len(task_metas)
+    pending = list(range(len(task_metas)))
+
+    while pending:
+        missing = set()
+        retry = []
+        for i in pending:
+            session.missing = set()
+            try:
+                results[i], task_metrics[i] = measure_task(
+                    tasks.task_named(task_metas[i]['name']), task_metas[i], state, options)
+            except ResourceNotLoaded:
+                pass
+            if session.missing:
+                missing.update(session.missing)
+                retry.append(i)
+
+        if missing:
+            await session.fetch(missing, transport)
+        pending = retry
+
+    for task_meta, result, metrics in zip(task_metas, results, task_metrics):
+        dispatch_task_result(task_meta, result, store, metrics, options)
+
+
+async def verify_async(badge_input, recipient_profile=None, **options):
+    """
+    Verify and validate Open Badges without blocking the event loop on network requests.
+    :param badge_input: str (url or json) or python file-like object (baked badge image)
+    :param recipient_profile: dict of a trusted Profile describing the entity assumed to be recipient
+    :param options: dict of options. See DEFAULT_OPTIONS for values. Also accepts 'transport', an object with
+    an async get(url, headers) method returning a requests.Response (default: AiohttpTransport)
+    :return: dict
+    """
+    transport = options.pop('transport', None)
+    owns_transport = transport is None
+    if transport is None:
+        transport = AiohttpTransport()
+
+    session = PrefetchedSession()
+    selected_options = _get_options(options).copy()
+    selected_options['http_session'] = session
+    doc_loader = CachableDocumentLoader(session=session)
+    if selected_options['bundled_contexts']:
+        doc_loader = BundledContextLoader(doc_loader)
+    selected_options['jsonld_options'] = {'documentLoader': doc_loader}
+
+    store = create_verification_store(selected_options)
+    queue_input_tasks(store, badge_input, recipient_profile)
+    scheduler = TaskScheduler(store)
+
+    try:
+        for next_tasks in task_batches(store, scheduler, IO_BOUND_TASKS, selected_options):
+            await call_tasks_async(next_tasks, scheduler, session, transport, selected_options)
+    finally:
+        if owns_transport:
+            await transport.close()
+
+    return generate_report(store, options=selected_options)
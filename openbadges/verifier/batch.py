@@ -0,0 +1,166 @@
+from future.standard_library import install_aliases
+install_aliases()
+
+from multiprocessing import Pool
+import os
+from queue import Empty, Queue
+import shutil
+import six
+import tempfile
+import traceback
+
+from pyld.jsonld import JsonLdError
+import requests_cache
+
+from .actions.input import store_input
+from .actions.tasks import report_message
+from .logger import logger
+from .openbadges_context import OPENBADGES_CONTEXT_V2_URI
+from .store import create_verification_store
+from .utils import clear_shared_loaders, MESSAGE_LEVEL_ERROR
+from .verifier import _get_options, generate_report, verification_store
+
+
+# Inputs submitted to the pool ahead of the results consumed, per worker process.
+PENDING_INPUTS_PER_JOB = 2
+
+# Seconds between checks for submitted inputs that failed without a callback, as on Python 2.
+FAILURE_POLL_INTERVAL = 0.5
+
+_worker_options = None
+
+
+def _init_worker(options):
+    global _worker_options
+    clear_shared_loaders(close=False)  # Don't share connections inherited from the parent process
+    _worker_options = _get_options(options)
+
+
+def _verify_one(index, badge_input, selected_options):
+    try:
+        store = verification_store(badge_input, options=selected_options)
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        return index, _error_report(badge_input, e, selected_options)
+    return index, generate_report(store, options=selected_options)
+
+
+def _error_report(badge_input, error, selected_options):
+    """
+    Returns the report of a verification of badge_input that could not be completed because of error.
+    """
+    store = create_verification_store(selected_options)
+    store.dispatch(store_input(badge_input))
+    store.dispatch(report_message(
+        "Verification could not be completed: {}".format(
+            ''.join(traceback.format_exception_only(type(error), error)).strip()),
+        message_level=MESSAGE_LEVEL_ERROR, success=False
+    ))
+    return generate_report(store, options=selected_options)
+
+
+def _verify_in_worker(index, badge_input):
+    return _verify_one(index, badge_input, _worker_options)
+
+
+def _shared_cache_options(options):
+    """
+    Returns options for worker processes along with a temporary directory to clean up, if any.
+    The default in-memory cache cannot be shared between processes, so it is replaced by a
+    sqlite cache in a temporary directory, if requests_cache can use sqlite here.
+    """
+    if not options.get('use_cache', True) or options.get('cache_backend', 'memory') != 'memory':
+        return options, None
+    if not sqlite_cache_available():
+        return options, None  # Each worker keeps its own in-memory cache
+
+    cache_dir = tempfile.mkdtemp(prefix='openbadges-cache-')
+    shared_options = options.copy()
+    shared_options.update({'cache_backend': 'sqlite', 'cache_name': os.path.join(cache_dir, 'cache')})
+    return shared_options, cache_dir
+
+
+def sqlite_cache_available():
+    return 'sqlite' in requests_cache.backends.registry
+
+
+def _warm_cache(selected_options):
+    if not selected_options['use_cache']:
+        return
+    try:
+        selected_options['jsonld_options']['documentLoader'](OPENBADGES_CONTEXT_V2_URI)
+    except JsonLdError:
+        pass  # Workers will retry the fetch themselves
+
+
+def verify_many(inputs, jobs=1, **options):
+    """
+    Verify and validate many Open Badges inputs, yielding results as each verification completes.
+    Only a few inputs per worker are read ahead of the results consumed, so inputs may be a
+    generator over a very large batch.
+    :param inputs: iterable of str (url, json or jws). With jobs > 1, each input must be picklable.
+    :param jobs: int number of worker processes. With 1, inputs are verified in this process.
+    :param options: dict of options. See DEFAULT_OPTIONS for values
+    :return: generator of (input, report dict) tuples, in order of completion. An input whose verification
+    fails in the pool, such as one that cannot be pickled, has a report with the error.
+    """
+    if jobs <= 1:
+        selected_options = _get_options(options)
+        for badge_input in inputs:
+            yield badge_input, _verify_one(0, badge_input, selected_options)[1]
+        return
+
+    options, cache_dir = _shared_cache_options(options)
+    selected_options = _get_options(options)
+    _warm_cache(selected_options)
+
+    pool = Pool(jobs, _init_worker, (options,))
+    completed = Queue()
+    pending = {}
+    inputs = enumerate(inputs)
+
+    def submit_next():
+        try:
+            index, badge_input = next(inputs)
+        except StopIteration:
+            return
+        callbacks = {'callback': completed.put}
+        if six.PY3:
+            # Raised for failures outside the verification itself, such as an input that cannot be pickled.
+            callbacks['error_callback'] = lambda e, index=index: completed.put((index, e))
+        pending[index] = badge_input, pool.apply_async(_verify_in_worker, (index, badge_input), **callbacks)
+
+    def next_completed():
+        while True:
+            try:
+                return completed.get(timeout=FAILURE_POLL_INTERVAL)
+            except Empty:
+                # Without an error callback, a failed input is only seen by its AsyncResult.
+                for index, (_, result) in list(pending.items()):
+                    if result.ready() and not result.successful():
+                        try:
+                            result.get()
+                        except Exception as e:
+                            return index, e
+
+    try:
+        for _ in range(jobs * PENDING_INPUTS_PER_JOB):
+            submit_next()
+
+        while pending:
+            index, report = next_completed()
+            if index not in pending:
+                continue  # Reported both by its error callback and by polling
+            badge_input = pending.pop(index)[0]
+            if isinstance(report, Exception):
+                logger.error("Verification of input {} failed in the pool: {!r}".format(index, report))
+                report = _error_report(badge_input, report, selected_options)
+            submit_next()
+            yield badge_input, report
+
+        pool.close()
+        pool.join()
+    finally:
+        pool.terminate()
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,336 @@
+"""
+Compaction of JSON-LD documents against the Open Badges v2 context, with reuse of results across
+verifications enabled by passing a CompactionCache as the 'compaction_cache' verification option.
+
+A result is cached by a digest of the input document and the context URLs it references. Alongside
+it are kept the extension contexts found while compacting it and a digest of every document that
+was loaded to compute it. A cached result is only reused while the document loader still returns
+the same version of each of those documents. That is checked at most once every recheck_after
+seconds per entry, so most hits cost a digest of the input and a copy of the result, and no load.
+
+Documents whose only context is the Open Badges v2 context are compacted natively when the loader
+serves the bundled copy of that context: each property is renamed and each value normalized the
+way pyld does for that term and kind of value, as observed once per process by compacting a probe
+document with pyld. Anything else falls back to pyld.
+"""
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+from timeit import default_timer
+
+import six
+
+from .contexts import compact
+from .openbadges_context import OPENBADGES_CONTEXT_V2_DICT, OPENBADGES_CONTEXT_V2_URI
+from .utils import ContextTracker, ExpiringCache, memoize_strings
+
+
+class CompactionCache(ExpiringCache):
+    """
+    Thread-safe cache of compaction results by (document digest, referenced context URLs).
+    Entries expire expire_after seconds after they are recorded, and the oldest are evicted beyond
+    max_entries. A hit reloads the documents used to compute the result, to check they are unchanged,
+    only if they were last checked more than recheck_after seconds ago.
+    A cache passed to worker processes by verify_many() starts empty in each worker.
+    """
+    def __init__(self, expire_after=300, max_entries=1000, recheck_after=60):
+        super(CompactionCache, self).__init__(expire_after=expire_after, max_entries=max_entries)
+        self.recheck_after = recheck_after
+
+    def __getstate__(self):
+        return dict(super(CompactionCache, self).__getstate__(), recheck_after=self.recheck_after)
+
+    def is_current(self, entry, document_loader):
+        """
+        Whether the documents entry was computed from are unchanged, or were checked recently.
+        """
+        if default_timer() < entry['checked'] + self.recheck_after:
+            return True
+        if not _versions_match(entry['versions'], document_loader):
+            return False
+        entry['checked'] = default_timer()
+        return True
+
+
+class DocumentRecorder(object):
+    """
+    Wraps a document loader and records a digest of each document it loads, by url.
+    """
+    def __init__(self, document_loader):
+        self.document_loader = document_loader
+        self.versions = {}
+
+    def __call__(self, url):
+        doc = self.document_loader(url)
+        self.versions[url] = _document_digest(doc)
+        return doc
+
+
+def compact_openbadges_data(input_data, jsonld_options, cache=None):
+    """
+    Compacts input_data against the Open Badges v2 context.
+    :param input_data: dict of JSON-LD data
+    :param jsonld_options: dict of pyld options, with a 'documentLoader'
+    :param cache: CompactionCache or None
+    :return: tuple (compacted dict, list of the urls of extension contexts loaded)
+    """
+    document_loader = jsonld_options['documentLoader']
+    key = None
+    if cache is not None:
+        key = compaction_key(input_data)
+        entry = cache.get(key)
+        if entry is not None and cache.is_current(entry, document_loader):
+            return copy.deepcopy(entry['result']), list(entry['contexts'])
+
+    recorder = DocumentRecorder(document_loader)
+    context_tracker = ContextTracker(recorder)
+    result = compact_natively(input_data, context_tracker)
+    if result is None:
+        # Pass the tracker in a copy of the options; the options dict may be shared by concurrent verifications.
+        result = compact(input_data, OPENBADGES_CONTEXT_V2_URI,
+                         options=dict(jsonld_options, documentLoader=context_tracker))
+    contexts = list(context_tracker.contexts)
+
+    if key is not None:
+        cache.set(key, {
+            'result': copy.deepcopy(result),
+            'contexts': tuple(contexts),
+            'versions': tuple(recorder.versions.items()),
+            'checked': default_timer()
+        })
+    return result, contexts
+
+
+def compaction_key(input_data):
+    """
+    :param input_data: dict of JSON-LD data
+    :return: tuple (SHA-256 digest of the document, sorted tuple of the context urls it references)
+    """
+    serialized = json.dumps(input_data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest(), tuple(sorted(_referenced_contexts(input_data)))
+
+
+def _referenced_contexts(value):
+    urls = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == '@context':
+                urls.update(c for c in (item if isinstance(item, list) else [item]) if isinstance(c, six.string_types))
+            urls.update(_referenced_contexts(item))
+    elif isinstance(value, list):
+        for item in value:
+            urls.update(_referenced_contexts(item))
+    return urls
+
+
+def _document_digest(doc):
+    document = doc.get('document')
+    if not isinstance(document, six.string_types):
+        document = json.dumps(document, sort_keys=True)
+    if isinstance(document, six.text_type):
+        document = document.encode('utf-8')
+    return hashlib.sha256(document).hexdigest()
+
+
+def _versions_match(versions, document_loader):
+    try:
+        return all(_document_digest(document_loader(url)) == digest for url, digest in versions)
+    except Exception:
+        return False  # A document that can no longer be loaded; compacting again reports the error.
+
+
+"""
+Native compaction
+"""
+V2_TERMS = OPENBADGES_CONTEXT_V2_DICT['@context']
+
+PROBE_VALUES = {
+    'string': 'probe value',
+    'iri': 'http://example.org/probe-value',
+    'int': 7,
+    'float': 1.5,
+    'bool': True,
+    'node': {'name': 'probe value'},
+    'reference': {'id': 'http://example.org/probe-value'},
+    'empty': [],
+}
+
+_compacted_terms = {}  # (term, kind of value): (compacted term, whether a reference compacts to its id) or None
+_compacted_types = {}  # type term: compacted type term or None
+
+
+class _UnsupportedDocument(Exception):
+    pass
+
+
+def compact_natively(input_data, document_loader):
+    """
+    Returns the compaction of input_data against the Open Badges v2 context, identical to the result
+    of pyld, or None if input_data does not use only that context in a way that is compacted natively.
+    The context is loaded with document_loader as pyld would, and must be the bundled context.
+    """
+    if not isinstance(input_data, dict) or input_data.get('@context') != OPENBADGES_CONTEXT_V2_URI:
+        return None
+    context_document = document_loader(OPENBADGES_CONTEXT_V2_URI).get('document')
+    if not isinstance(context_document, six.string_types) or not _is_bundled_v2_context(context_document):
+        return None
+
+    try:
+        compacted = _compact_node(dict((k, v) for k, v in input_data.items() if k != '@context'))
+    except _UnsupportedDocument:
+        return None
+    if list(compacted.keys()) == ['id']:
+        return None  # pyld drops a top-level node with nothing but an id.
+    result = {'@context': OPENBADGES_CONTEXT_V2_URI}
+    result.update(compacted)
+    return result
+
+
+@memoize_strings(maxsize=16)
+def _is_bundled_v2_context(document):
+    try:
+        return json.loads(document) == OPENBADGES_CONTEXT_V2_DICT
+    except ValueError:
+        return False
+
+
+def _compact_node(node):
+    values_by_iri = {}
+    for key, value in node.items():
+        if key == 'id':
+            if not _is_plain_iri(value):
+                raise _UnsupportedDocument()
+            values_by_iri['@id'] = [('id', value)]
+        elif key == 'type':
+            types = [_compact_type(t) for t in (value if isinstance(value, list) else [value])]
+            if types:
+                values_by_iri['@type'] = [('type', types[0] if len(types) == 1 else types)]
+        elif key in V2_TERMS and not key.startswith('@') and value is not None:
+            iri = _term_iri(key)
+            if iri in values_by_iri:
+                raise _UnsupportedDocument()  # Values of different terms for one property would be merged.
+            values_by_iri[iri] = _compact_property_values(key, value)
+        elif value is not None or key not in V2_TERMS:
+            raise _UnsupportedDocument()
+
+    # pyld adds properties in order of their expanded IRIs, each value to the term selected for it.
+    compacted = {}
+    for iri in sorted(values_by_iri):
+        values_by_term = OrderedDict()
+        for term, value in values_by_iri[iri]:
+            values_by_term.setdefault(term, []).append(value)
+        for term, values in values_by_term.items():
+            compacted[term] = values[0] if len(values) == 1 else values
+    return compacted
+
+
+def _compact_property_values(term, value):
+    if isinstance(value, list) and not value:
+        return [(_compacted_term(term, 'empty')[0], [])]
+
+    compacted_values = []
+    for item in (value if isinstance(value, list) else [value]):
+        if isinstance(item, dict):
+            item = _compact_node(item)
+            if not item:
+                raise _UnsupportedDocument()
+        kind = _value_kind(item)
+        compacted_term, to_id = _compacted_term(term, kind)
+        if kind == 'reference' and to_id:
+            item = item['id']
+        compacted_values.append((compacted_term, item))
+    return compacted_values
+
+
+def _value_kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, six.integer_types):
+        return 'int'
+    if isinstance(value, float) and value == value and value not in (float('inf'), float('-inf')):
+        return 'float'
+    if isinstance(value, six.string_types):
+        return 'iri' if _is_plain_iri(value) else 'string'
+    if isinstance(value, dict):
+        return 'reference' if list(value.keys()) == ['id'] else 'node'
+    raise _UnsupportedDocument()
+
+
+def _is_plain_iri(value):
+    """
+    Whether value is an absolute IRI to pyld that it leaves unchanged: not a compact IRI using
+    a term of the context, nor within a namespace the context defines.
+    """
+    if not isinstance(value, six.string_types) or ':' not in value:
+        return False
+    return value.split(':', 1)[0] not in V2_TERMS and not value.startswith(_V2_TERM_IRIS)
+
+
+def _compacted_term(term, kind):
+    """
+    Returns the term pyld compacts a value of this kind of the property term to, and whether a
+    reference is compacted to its id, as observed by compacting a probe document.
+    """
+    key = (term, kind)
+    if key not in _compacted_terms:
+        _compacted_terms[key] = _probe_term(term, kind)
+    if _compacted_terms[key] is None:
+        raise _UnsupportedDocument()
+    return _compacted_terms[key]
+
+
+def _probe_term(term, kind):
+    definition = V2_TERMS[term]
+    if kind == 'string' and isinstance(definition, dict) and definition.get('@type') == '@id':
+        return None  # Relative IRI references are resolved.
+    probe_value = PROBE_VALUES[kind]
+    compacted = _probe({term: probe_value})
+    if compacted is None or len(compacted) != 1:
+        return None
+    compacted_term, value = list(compacted.items())[0]
+    if _same_json(value, probe_value):
+        return compacted_term, False
+    if kind == 'reference' and _same_json(value, probe_value['id']):
+        return compacted_term, True
+    return None
+
+
+def _compact_type(type_term):
+    if not isinstance(type_term, six.string_types) or type_term not in V2_TERMS or type_term.startswith('@'):
+        raise _UnsupportedDocument()
+    if type_term not in _compacted_types:
+        compacted = _probe({'type': type_term})
+        compacted_type = compacted.get('type') if compacted is not None and len(compacted) == 1 else None
+        _compacted_types[type_term] = compacted_type if isinstance(compacted_type, six.string_types) else None
+    if _compacted_types[type_term] is None:
+        raise _UnsupportedDocument()
+    return _compacted_types[type_term]
+
+
+def _probe(data):
+    try:
+        compacted = compact(dict(data, **{'@context': V2_TERMS}), OPENBADGES_CONTEXT_V2_DICT)
+    except Exception:
+        return None
+    compacted.pop('@context', None)
+    return compacted
+
+
+def _same_json(value, other):
+    return json.dumps(value, sort_keys=True) == json.dumps(other, sort_keys=True)
+
+
+def _term_iri(term):
+    value = V2_TERMS[term]
+    if isinstance(value, dict):
+        value = value['@id']
+    if value in V2_TERMS and value != term:
+        return _term_iri(value)
+    prefix, _, suffix = value.partition(':')
+    if suffix and prefix in V2_TERMS:
+        return _term_iri(prefix) + suffix
+    return value
+
+
+_V2_TERM_IRIS = tuple(sorted(set(_term_iri(term) for term in V2_TERMS if V2_TERMS[term] not in ('@id', '@type'))))
@@ -0,0 +1,175 @@
+"""
+JSON-LD processing with the contexts bundled with the verifier: the Open Badges v1 and v2 contexts,
+the extension contexts in the extensions package, and any registered with register_context().
+The Open Badges contexts are bundled both at their w3id.org URIs and at the URLs these redirect to.
+
+compact() and expand() wrap the pyld functions of the same names. When a document's context is, or
+loads as, one of the bundled contexts, the processed active context for it is computed once per
+process and reused, instead of processing its term definitions again for every call.
+
+A BundledContextLoader serves the bundled contexts, and the JSON-schemas of the bundled extensions,
+from memory, which the 'bundled_contexts' verification option enables.
+"""
+import json
+import threading
+
+from pyld import jsonld
+
+from .extensions import ApplyLink, ExampleExtension, GeoLocation
+from .openbadges_context import (OPENBADGES_CONTEXT_V1_DICT, OPENBADGES_CONTEXT_V1_REDIRECT_URI,
+                                 OPENBADGES_CONTEXT_V1_URI, OPENBADGES_CONTEXT_V2_DICT,
+                                 OPENBADGES_CONTEXT_V2_REDIRECT_URI, OPENBADGES_CONTEXT_V2_URI)
+
+
+_bundled_documents = {}  # url: serialized JSON-LD document, or JSON-schema of a bundled extension
+_bundled_contexts = ()  # tuple of (url, name, @context object); an object in an array @context is named url#index
+_processed_contexts = {}  # (base IRI, name of each bundled context processed in turn): active context
+_processed_context_keys = {}  # id of an active context in _processed_contexts: its key
+_contexts_lock = threading.Lock()
+
+
+def compact(input_, ctx, options=None):
+    return ContextCachingProcessor().compact(input_, ctx, options)
+
+
+def expand(input_, options=None):
+    return ContextCachingProcessor().expand(input_, options)
+
+
+def register_context(url, document):
+    """
+    Bundles a JSON-LD context document, such as that of an extension, so that it is processed once per
+    process and served from memory by a BundledContextLoader.
+    :param url: str url of the context
+    :param document: dict JSON-LD document with an @context
+    """
+    global _bundled_contexts
+    contexts = document['@context'] if isinstance(document['@context'], list) else [document['@context']]
+    names = [url] if len(contexts) == 1 else ['{}#{}'.format(url, i) for i in range(len(contexts))]
+
+    with _contexts_lock:
+        if url in _bundled_documents:
+            _forget_processed_contexts()  # Active contexts may have been processed from the former document.
+        _bundled_documents[url] = json.dumps(document)
+        _bundled_contexts = tuple(entry for entry in _bundled_contexts if entry[0] != url) + tuple(
+            (url, name, ctx) for name, ctx in zip(names, contexts) if isinstance(ctx, dict))
+
+
+def unregister_context(url):
+    """
+    Removes a context bundled with register_context(), which will be loaded and processed as any other.
+    """
+    global _bundled_contexts
+    with _contexts_lock:
+        if _bundled_documents.pop(url, None) is not None:
+            _forget_processed_contexts()
+            _bundled_contexts = tuple(entry for entry in _bundled_contexts if entry[0] != url)
+
+
+def reset_contexts():
+    """
+    Restores the contexts bundled with the package, removing any others registered since,
+    and forgets the active contexts processed from them.
+    """
+    for url in list(_bundled_documents):
+        unregister_context(url)
+    _register_package_contexts()
+
+
+def bundled_document(url):
+    """
+    Returns the serialized JSON-LD context, or extension JSON-schema, document bundled for url, or None.
+    """
+    return _bundled_documents.get(url)
+
+
+def bundled_context_name(ctx):
+    """
+    Returns the name of the bundled context object equal to ctx, or None.
+    """
+    for _, name, bundled in _bundled_contexts:
+        if ctx is bundled or (isinstance(ctx, dict) and len(ctx) == len(bundled) and ctx == bundled):
+            return name
+    return None
+
+
+def _forget_processed_contexts():
+    _processed_contexts.clear()
+    _processed_context_keys.clear()
+
+
+def _register_package_contexts():
+    for url in (OPENBADGES_CONTEXT_V1_URI, OPENBADGES_CONTEXT_V1_REDIRECT_URI):
+        register_context(url, OPENBADGES_CONTEXT_V1_DICT)
+    for url in (OPENBADGES_CONTEXT_V2_URI, OPENBADGES_CONTEXT_V2_REDIRECT_URI):
+        register_context(url, OPENBADGES_CONTEXT_V2_DICT)
+    for extension in (ExampleExtension, ApplyLink, GeoLocation):
+        register_context(extension.context_url, extension.context_json)
+        with _contexts_lock:
+            for schema_url, schema in extension.validation_schema.items():
+                _bundled_documents[schema_url] = json.dumps(schema)
+
+
+class BundledContextLoader(object):
+    """
+    Wraps a document loader to serve the bundled contexts from memory, without a request.
+    Other urls are loaded by the wrapped loader, whose session remains available to tasks.
+    """
+    def __init__(self, document_loader):
+        self.document_loader = document_loader
+        self.session = getattr(document_loader, 'session', None)
+
+    def __call__(self, url):
+        document = bundled_document(url)
+        if document is None:
+            return self.document_loader(url)
+        return {'contextUrl': None, 'documentUrl': url, 'document': document}
+
+
+class ContextCachingProcessor(jsonld.JsonLdProcessor):
+    """
+    A pyld processor that reuses the active context resulting from processing a sequence of bundled
+    contexts on an initial context. Other contexts are processed, and cached, by pyld as usual.
+    Active contexts are shared between calls, as pyld shares those from its own cache.
+    """
+    def _process_context(self, active_ctx, local_ctx, options):
+        if isinstance(local_ctx, dict) and isinstance(local_ctx.get('@context'), list):
+            local_ctx = local_ctx['@context']
+        ctxs = local_ctx if isinstance(local_ctx, list) else [local_ctx]
+        if not ctxs:
+            return super(ContextCachingProcessor, self)._process_context(active_ctx, ctxs, options)
+
+        # Process each context in turn, as pyld does, so that a bundled context can follow another.
+        for ctx in ctxs:
+            if isinstance(ctx, dict) and '@context' in ctx:
+                ctx = ctx['@context']
+            key = _active_context_key(active_ctx)
+            name = bundled_context_name(ctx) if key is not None else None
+            if name is None:
+                active_ctx = super(ContextCachingProcessor, self)._process_context(active_ctx, [ctx], options)
+                continue
+
+            key += (name,)
+            processed = _processed_contexts.get(key)
+            if processed is None:
+                processed = super(ContextCachingProcessor, self)._process_context(active_ctx, [ctx], options)
+                with _contexts_lock:
+                    processed = _processed_contexts.setdefault(key, processed)
+                    _processed_context_keys[id(processed)] = key
+            active_ctx = processed
+        return active_ctx
+
+
+def _active_context_key(active_ctx):
+    """
+    Returns the key of an initial active context or of one in _processed_contexts, or None.
+    """
+    if not active_ctx['mappings'] and set(active_ctx.keys()) <= {'@base', 'mappings', 'inverse'}:
+        return (active_ctx['@base'],)
+    key = _processed_context_keys.get(id(active_ctx))
+    if key is not None and _processed_contexts.get(key) is active_ctx:
+        return key
+    return None
+
+
+_register_package_contexts()
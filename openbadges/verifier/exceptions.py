@@ -10,6 +10,16 @@ class SkipTask(Exception):
     pass
 
 
+class ResourceNotLoaded(Exception):
+    """
+    This exception indicates that a task requested an HTTP resource that has not been
+    loaded yet. The caller may load the resource and run the task again.
+    """
+    def __init__(self, url=None):
+        super(ResourceNotLoaded, self).__init__(url)
+        self.url = url
+
+
 class TaskPrerequisitesError(Exception):
     """
     This exception indicates that the present task has prerequisites better
@@ -0,0 +1,59 @@
+from timeit import default_timer
+
+from .actions.tasks import report_message, resolve_task
+from .actions.validation_report import set_limit_reached
+from .tasks.task_types import FETCH_HTTP_NODE
+from .utils import MESSAGE_LEVEL_ERROR
+
+
+class VerificationLimits(object):
+    """
+    Tracks a verification against the 'deadline_seconds', 'max_tasks' and 'max_fetches' options.
+    Limits that are None are not enforced.
+    """
+    def __init__(self, options):
+        self.deadline_seconds = options.get('deadline_seconds')
+        self.max_tasks = options.get('max_tasks')
+        self.max_fetches = options.get('max_fetches')
+        self.started = default_timer()
+        self.task_count = 0
+        self.fetch_count = 0
+
+    def limit_reached(self, next_tasks):
+        """
+        Returns the name of the limit that running next_tasks would exceed, or None.
+        :param next_tasks: list of dicts (entries in tasks state)
+        """
+        if self.deadline_seconds is not None and default_timer() - self.started >= self.deadline_seconds:
+            return 'deadline_seconds'
+        if self.max_tasks is not None and self.task_count + len(next_tasks) > self.max_tasks:
+            return 'max_tasks'
+        if self.max_fetches is not None and self.fetch_count + _count_fetches(next_tasks) > self.max_fetches:
+            return 'max_fetches'
+        return None
+
+    def count(self, tasks_run):
+        self.task_count += len(tasks_run)
+        self.fetch_count += _count_fetches(tasks_run)
+
+    def stop_actions(self, state, limit):
+        """
+        Returns the actions that record a verification stopped at a limit: an error message naming
+        the limit, and a failed result for each task that was not executed.
+        """
+        actions = [
+            set_limit_reached(limit),
+            report_message(
+                "Verification stopped early: reached {} limit of {}".format(limit, getattr(self, limit)),
+                message_level=MESSAGE_LEVEL_ERROR, success=False)
+        ]
+        for task in state['tasks']:
+            if not task.get('complete'):
+                actions.append(resolve_task(
+                    task['task_id'], success=False,
+                    result="Task not executed: verification stopped early at {} limit".format(limit)))
+        return actions
+
+
+def _count_fetches(task_metas):
+    return len([t for t in task_metas if t.get('name') == FETCH_HTTP_NODE])
@@ -0,0 +1,74 @@
+"""
+Per-task instrumentation, recorded when the 'metrics' verification option is set.
+"""
+import threading
+import time
+from timeit import default_timer
+
+
+# CPU time of the current thread where available, so that concurrent tasks are measured separately.
+_cpu_timer = getattr(time, 'thread_time', None) or getattr(time, 'process_time', None) or time.clock
+
+_measuring = threading.local()
+
+METRIC_NAMES = ('wallSeconds', 'cpuSeconds', 'httpRequests', 'httpBytes', 'httpCacheHits',)
+
+
+def measure_call(func, *args, **kwargs):
+    """
+    Calls func and measures its wall time, CPU time and HTTP traffic, as recorded
+    by record_http_response on the same thread.
+    :return: tuple (return value of func, metrics dict)
+    """
+    metrics = dict((name, 0) for name in METRIC_NAMES)
+    outer_metrics = getattr(_measuring, 'metrics', None)
+    _measuring.metrics = metrics
+    wall_start, cpu_start = default_timer(), _cpu_timer()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        metrics['wallSeconds'] = default_timer() - wall_start
+        metrics['cpuSeconds'] = _cpu_timer() - cpu_start
+        _measuring.metrics = outer_metrics
+    return result, metrics
+
+
+def record_http_response(response):
+    """
+    Counts an HTTP response against the task being measured on this thread, if any.
+    """
+    metrics = getattr(_measuring, 'metrics', None)
+    if metrics is None:
+        return
+    if getattr(response, 'from_cache', False):
+        metrics['httpCacheHits'] += 1
+    else:
+        metrics['httpRequests'] += 1
+        metrics['httpBytes'] += len(response.content or b'')
+
+
+def summarize_metrics(tasks):
+    """
+    Builds the metrics section of a report from the metrics recorded on resolved tasks.
+    :param tasks: list of dicts (tasks state)
+    :return: dict with per-task metrics, and totals by task name and overall
+    """
+    summary = {'tasks': [], 'byTaskName': {}, 'total': dict((name, 0) for name in METRIC_NAMES)}
+    summary['total']['taskCount'] = 0
+
+    for task in tasks:
+        metrics = task.get('metrics')
+        if metrics is None:
+            continue
+        entry = {'task_id': task['task_id'], 'name': task.get('name')}
+        entry.update(metrics)
+        summary['tasks'].append(entry)
+
+        by_name = summary['byTaskName'].setdefault(task.get('name'), dict((name, 0) for name in METRIC_NAMES))
+        by_name['taskCount'] = by_name.get('taskCount', 0) + 1
+        summary['total']['taskCount'] += 1
+        for name in METRIC_NAMES:
+            by_name[name] += metrics[name]
+            summary['total'][name] += metrics[name]
+
+    return summary
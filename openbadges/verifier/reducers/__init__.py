@@ -1,14 +1,48 @@
 from pydux import combine_reducers
 
-from .input import input_reducer
-from .graph import graph_reducer
-from .tasks import task_reducer
-from .verification_report import verification_report_reducer
-
-
-main_reducer = combine_reducers({
-    'input': input_reducer,
-    'graph': graph_reducer,
-    'tasks': task_reducer,
-    'report': verification_report_reducer
-})
+from ..actions.action_types import BATCH
+from .input import input_reducer, INPUT_ACTIONS, update_input
+from .graph import graph_reducer, GRAPH_ACTIONS, update_graph
+from .tasks import task_reducer, TASK_ACTIONS
+from .verification_report import REPORT_ACTIONS, update_verification_report, verification_report_reducer
+
+
+# State key: (action types handled, reducer, in-place update function or None)
+SLICE_REDUCERS = {
+    'input': (INPUT_ACTIONS, input_reducer, update_input),
+    'graph': (GRAPH_ACTIONS, graph_reducer, update_graph),
+    'tasks': (TASK_ACTIONS, task_reducer, None),
+    'report': (REPORT_ACTIONS, verification_report_reducer, update_verification_report)
+}
+
+combined_reducer = combine_reducers(dict((key, reducer) for key, (_, reducer, _) in SLICE_REDUCERS.items()))
+
+
+def batch_reducer(state, action):
+    """
+    Apply the actions of a BATCH action in order. Where pydux would copy a slice of state for
+    each action, each slice is copied at most once, and then updated in place.
+    """
+    state = state or {}
+    new_state = {}
+    for key, (action_types, reducer, update) in SLICE_REDUCERS.items():
+        slice_state = state.get(key)
+        copied = False
+        for sub_action in action['actions']:
+            if sub_action.get('type') not in action_types:
+                continue
+            if copied and update is not None:
+                update(slice_state, sub_action)
+            else:
+                slice_state = reducer(slice_state, sub_action)
+                copied = True
+        if not copied:
+            slice_state = reducer(slice_state, action)
+        new_state[key] = slice_state
+    return new_state
+
+
+def main_reducer(state, action):
+    if action.get('type') == BATCH:
+        return batch_reducer(state, action)
+    return combined_reducer(state, action)
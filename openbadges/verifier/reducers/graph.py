@@ -1,15 +1,20 @@
 import copy
 
 from ..actions.action_types import ADD_NODE, PATCH_NODE, PATCH_NODE_REFERENCE, UPDATE_NODE
-from ..state import get_node_by_id
+from ..state import BlankNodeAllocator, get_node_by_id, NodeGraph
 from ..utils import list_of
 
 
-current_node_number = -1
-def get_next_blank_node_id():
-    global current_node_number
-    current_node_number += 1
-    return "_:b{}".format(current_node_number)
+_process_blank_node_ids = BlankNodeAllocator()
+
+
+def get_next_blank_node_id(graph=None):
+    """
+    Allocate a blank node id from the allocator of a graph state, or the process-wide allocator
+    if the graph has none.
+    """
+    allocator = getattr(graph, 'blank_node_ids', None) or _process_blank_node_ids
+    return allocator.next_id()
 
 
 def _flatten_node(node, node_id=None):
@@ -34,30 +39,41 @@ def _flatten_node(node, node_id=None):
     return node_list
 
 
-def graph_reducer(state=None, action=None):
-    if state is None:
-        state = []
+def _next_graph(state):
+    if isinstance(state, NodeGraph):
+        return state.successor()
+    return NodeGraph(state)
+
+
+def _replace_node(state, node_id, updated_node):
+    # Move the node to the end of the graph, as the most recently written node
+    state.replace_node(node_id, updated_node)
+
 
+GRAPH_ACTIONS = (ADD_NODE, PATCH_NODE, PATCH_NODE_REFERENCE, UPDATE_NODE,)
+
+
+def update_graph(state, action):
+    """
+    Apply a graph action to a NodeGraph graph state, modifying it in place.
+    """
     if action.get('type') == ADD_NODE:
-        state = list(state)  # copy state instead of mutating original
         new_node = copy.deepcopy(action.get('data'))
         if not new_node.get('id'):
-            new_node['id'] = action.get('node_id', get_next_blank_node_id())
+            new_node['id'] = action.get('node_id') or get_next_blank_node_id(state)
         # new_nodes = _flatten_node(new_node, action.get('node_id'))
         new_nodes = [new_node]
-        state.extend(new_nodes)
+        for node in new_nodes:
+            state.add_node(node)
     elif action.get('type') == UPDATE_NODE:
-        existing_node = get_node_by_id({'graph': state}, action.get('node_id'))
-        updated_node = action.get('data')
-        state = [node for node in state if node is not existing_node]
-        state.append(updated_node)
+        get_node_by_id({'graph': state}, action.get('node_id'))
+        _replace_node(state, action.get('node_id'), action.get('data'))
     elif action.get('type') == PATCH_NODE:
         try:
             existing_node = get_node_by_id({'graph': state}, action.get('node_id'))
             updated_node = copy.copy(existing_node)
             updated_node.update(action.get('data'))
-            state = [node for node in state if node is not existing_node]
-            state.append(updated_node)
+            _replace_node(state, existing_node['id'], updated_node)
         except IndexError:
             pass
     elif action.get('type') == PATCH_NODE_REFERENCE:
@@ -70,9 +86,17 @@ def graph_reducer(state=None, action=None):
                 raise NotImplementedError("TODO: handle complex node paths!")
             prop = node_path[1]
             updated_node[prop] = new_node_id
-            state = [node for node in state if node is not existing_node]
-            state.append(updated_node)
+            _replace_node(state, existing_node['id'], updated_node)
         except IndexError:
             pass
 
+
+def graph_reducer(state=None, action=None):
+    if state is None:
+        state = NodeGraph()
+
+    if action.get('type') in GRAPH_ACTIONS:
+        state = _next_graph(state)  # write a new version instead of mutating original
+        update_graph(state, action)
+
     return state
@@ -1,19 +1,28 @@
 from ..actions.action_types import STORE_INPUT, SET_INPUT_TYPE, STORE_ORIGINAL_RESOURCE
 
 
-def input_reducer(state=None, action=None):
-    if isinstance(state, dict):
-        new_state = state.copy()
-    else:
-        new_state = {}
+INPUT_ACTIONS = (STORE_INPUT, SET_INPUT_TYPE, STORE_ORIGINAL_RESOURCE,)
+
 
+def update_input(state, action):
+    """
+    Apply an input action to the input state dict, modifying it in place.
+    """
     if action.get('type') == STORE_INPUT:
-        new_state.update({'value': action.get('input')})
+        state.update({'value': action.get('input')})
     elif action.get('type') == SET_INPUT_TYPE:
-        new_state.update({'input_type': action.get('input_type')})
+        state.update({'input_type': action.get('input_type')})
     elif action.get('type') == STORE_ORIGINAL_RESOURCE:
-        original_json = new_state.get('original_json', {})
+        original_json = state.get('original_json', {})
         original_json[action['node_id']] = action.get('data')
-        new_state['original_json'] = original_json
+        state['original_json'] = original_json
+
+
+def input_reducer(state=None, action=None):
+    if isinstance(state, dict):
+        new_state = state.copy()
+    else:
+        new_state = {}
 
+    update_input(new_state, action)
     return new_state
@@ -1,10 +1,177 @@
+from itertools import islice
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 from ..actions.action_types import (ADD_TASK, DELETE_OUTDATED_NODE_TASKS, REPORT_MESSAGE, RESOLVE_TASK,
                                     TRIGGER_CONDITION, UPDATE_TASK)
-from ..tasks.task_types import (FETCH_HTTP_NODE, VALIDATE_EXPECTED_NODE_CLASS, VALIDATE_PROPERTY,
-                                VALIDATE_RDF_TYPE_PROPERTY, UPGRADE_TASKS)
+from ..tasks.task_types import (FETCH_HTTP_NODE, VALIDATE_EXPECTED_NODE_CLASS, VALIDATE_NODE_PROPERTIES,
+                                VALIDATE_PROPERTY, VALIDATE_RDF_TYPE_PROPERTY, UPGRADE_TASKS)
 from ..state import filter_active_tasks, MESSAGE_LEVEL_INFO
 
 
+TASK_ACTIONS = (ADD_TASK, DELETE_OUTDATED_NODE_TASKS, REPORT_MESSAGE, RESOLVE_TASK, TRIGGER_CONDITION, UPDATE_TASK,)
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def _class_key(task):
+    return task.get('node_id'), _hashable(task.get('node_path'))
+
+
+def _property_key(task):
+    return task.get('node_id'), _hashable(task.get('node_path')), task.get('prop_name')
+
+
+class _TaskStorage(object):
+    """
+    Backing list shared by successive TaskList versions, with indexes over the tasks in it.
+    Each append or replacement makes a new version. The task a replacement displaced is kept, so
+    that earlier versions still see the task they had.
+    """
+    def __init__(self, tasks):
+        self.tasks = []
+        self.version = 0
+        self.replaced = {}  # index in tasks: list of (version that replaced it, displaced task), in order
+        self.positions = {}  # task_id: index in tasks
+        self.class_keys = set()  # (node_id, node_path) of VALIDATE_EXPECTED_NODE_CLASS tasks
+        self.property_keys = set()  # (node_id, node_path, prop_name) of all tasks
+        self.urls = set()  # url of all tasks
+        for task in tasks:
+            self.append(task)
+
+    def append(self, task):
+        self.version += 1
+        self.positions[task['task_id']] = len(self.tasks)
+        self.tasks.append(task)
+        if task.get('name') == VALIDATE_EXPECTED_NODE_CLASS:
+            self.class_keys.add(_class_key(task))
+        self.property_keys.add(_property_key(task))
+        self.urls.add(task.get('url'))
+
+    def replace(self, task):
+        self.version += 1
+        position = self.positions[task['task_id']]
+        self.replaced.setdefault(position, []).append((self.version, self.tasks[position]))
+        self.tasks[position] = task
+
+    def task_at(self, position, version):
+        """Returns the task at position as it was in version."""
+        for replaced_in, task in self.replaced.get(position, ()):
+            if version < replaced_in:
+                return task
+        return self.tasks[position]
+
+
+class TaskList(Sequence):
+    """
+    The tasks state: a read-only sequence of task dicts, indexed by task_id and by the keys used
+    to detect duplicate tasks. Successive versions share one backing list, so the latest version
+    appends and resolves tasks without copying the list. A superseded version is unchanged: it
+    keeps its length and sees its tasks as they were, and adding to it copies the tasks it has.
+    """
+    def __init__(self, tasks=(), storage=None):
+        self._storage = _TaskStorage(tasks) if storage is None else storage
+        self._length = len(self._storage.tasks)
+        self._version = self._storage.version
+
+    def _is_latest(self):
+        return self._version == self._storage.version
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('task index out of range')
+        if self._is_latest():
+            return self._storage.tasks[index]
+        return self._storage.task_at(index, self._version)
+
+    def __iter__(self):
+        if self._is_latest():
+            return islice(self._storage.tasks, self._length)
+        return (self._storage.task_at(i, self._version) for i in range(self._length))
+
+    def __eq__(self, other):
+        if isinstance(other, TaskList) and other._storage is self._storage and other._version == self._version:
+            return True
+        return isinstance(other, (list, TaskList)) and list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'TaskList({!r})'.format(list(self))
+
+    def _current(self):
+        """Return a TaskList that is the latest version of its storage, copying if necessary."""
+        if self._is_latest():
+            return self
+        return TaskList(self)
+
+    def with_task_added(self, task):
+        current = self._current()
+        current._storage.append(task)
+        return TaskList(storage=current._storage)
+
+    def with_task_replaced(self, task):
+        current = self._current()
+        current._storage.replace(task)
+        return TaskList(storage=current._storage)
+
+    def get_task(self, task_id):
+        """Raises IndexError if no task with task_id is in this version."""
+        position = self._storage.positions.get(task_id)
+        if position is None or position >= self._length:
+            raise IndexError('No task with task_id {}'.format(task_id))
+        return self[position]
+
+    def has_duplicate_of(self, action):
+        storage = self._current()._storage
+        try:
+            if action.get('name') == VALIDATE_EXPECTED_NODE_CLASS:
+                return _class_key(action) in storage.class_keys
+            elif action.get('name') in [VALIDATE_PROPERTY, VALIDATE_RDF_TYPE_PROPERTY]:
+                return _property_key(action) in storage.property_keys
+            elif action.get('name') == FETCH_HTTP_NODE:
+                return action.get('url') in storage.urls
+        except TypeError:  # Unhashable values; compare them one by one
+            return _task_to_add_exists(self, action)
+        return False
+
+    def without_duplicate_properties(self, properties):
+        """
+        Returns the VALIDATE_PROPERTY tasks of properties that would be added as separate tasks:
+        those that duplicate neither a task in this version nor an earlier one of properties.
+        """
+        keys = set()
+        unique_properties = []
+        for property_task in properties:
+            key = _property_key(property_task)
+            if key not in keys and not self.has_duplicate_of(property_task):
+                keys.add(key)
+                unique_properties.append(property_task)
+        return unique_properties
+
+
+def _as_task_list(state):
+    if isinstance(state, TaskList):
+        return state._current()
+    return TaskList(state)
+
+
 def _task_to_add_exists(state, action):
     try:
         if action.get('name') == VALIDATE_EXPECTED_NODE_CLASS:
@@ -36,20 +203,26 @@ def _task_to_add_exists(state, action):
 
 def task_reducer(state=None, action=None):
     if state is None or len(state) == 0:
-        state = []
+        state = TaskList()
         task_counter = 1
     else:
         task_counter = state[-1]['task_id'] + 1
 
-    if action.get('type') == ADD_TASK and not _task_to_add_exists(state, action):
+    if action.get('type') == ADD_TASK:
+        state = _as_task_list(state)
+        if not action.get('allow_duplicate') and state.has_duplicate_of(action):
+            return state
         new_task = {'task_id': task_counter, 'complete': False}
-        for key in [k for k in list(action.keys()) if k != 'type']:
+        for key in [k for k in list(action.keys()) if k not in ('type', 'allow_duplicate',)]:
             new_task[key] = action[key]
-        return list(state) + [new_task]
+        if action.get('name') == VALIDATE_NODE_PROPERTIES and 'properties' in action and not action.get('complete'):
+            return _with_node_properties_added(state, new_task)
+        return state.with_task_added(new_task)
 
     elif action.get('type') == RESOLVE_TASK:
+        state = _as_task_list(state)
         try:
-            task = [t for t in state if t['task_id'] == action['task_id']][0]
+            task = state.get_task(action['task_id'])
         except KeyError:
             return state
         else:
@@ -59,7 +232,9 @@ def task_reducer(state=None, action=None):
                 'success': action.get('success'),
                 'result': action.get('result')
             })
-            return _new_state_with_updated_item(state, action['task_id'], update)
+            if action.get('metrics') is not None:
+                update['metrics'] = action['metrics']
+            return state.with_task_replaced(update)
 
     elif action.get('type') == UPDATE_TASK:
         try:
@@ -70,7 +245,8 @@ def task_reducer(state=None, action=None):
             update = task.copy()
             for key in [k for k in list(action.keys()) if k not in ('type', 'task_id',)]:
                 update[key] = action[key]
-            return _new_state_with_updated_item(state, action['task_id'], update)
+            # The update may change the keys tasks are indexed by, so index a new list.
+            return TaskList(_new_state_with_updated_item(state, action['task_id'], update))
 
     elif action.get('type') == REPORT_MESSAGE:
         new_task = {
@@ -81,7 +257,9 @@ def task_reducer(state=None, action=None):
             'result': action.get('message'),
             'messageLevel': action.get('messageLevel', MESSAGE_LEVEL_INFO)
         }
-        return list(state) + [new_task]
+        if action.get('subgraphs'):
+            new_task['subgraphs'] = action['subgraphs']
+        return _as_task_list(state).with_task_added(new_task)
 
     elif action.get('type') == TRIGGER_CONDITION:
         new_task = {
@@ -91,16 +269,39 @@ def task_reducer(state=None, action=None):
             'success': action.get('success', True),
             'result': action.get('message')
         }
-        return list(state) + [new_task]
+        if action.get('subgraphs'):
+            new_task['subgraphs'] = action['subgraphs']
+        return _as_task_list(state).with_task_added(new_task)
 
     elif action.get('type') == DELETE_OUTDATED_NODE_TASKS:
         node_id = action.get('node_id', 'UNKNOWN')
-        return list(
+        return TaskList(
             filter(lambda tt: not all([tt.get('node_id') == node_id and tt.get('name') in UPGRADE_TASKS]), state)
         )
     return state
 
 
+def _with_node_properties_added(state, task):
+    """
+    Adds a VALIDATE_NODE_PROPERTIES task followed by a pending VALIDATE_PROPERTY task for each of its
+    properties that would have been added had they been separate tasks. These wait for the combined
+    task, which resolves them in place, so their results are where those of separate tasks would be.
+    """
+    properties = []
+    for i, property_task in enumerate(state.without_duplicate_properties(task['properties'])):
+        property_task = dict(property_task, task_id=task['task_id'] + 1 + i, complete=False,
+                             prerequisites=[task['task_key']])
+        property_task.pop('type', None)
+        if task.get('subgraphs'):
+            property_task['subgraphs'] = task['subgraphs']
+        properties.append(property_task)
+
+    state = state.with_task_added(dict(task, properties=properties))
+    for property_task in properties:
+        state = state.with_task_added(property_task)
+    return state
+
+
 def _new_state_with_updated_item(state, item_id, update):
     new_state = []
     for i in range(0, len(state)):
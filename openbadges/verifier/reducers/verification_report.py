@@ -1,25 +1,36 @@
-from ..actions.action_types import (RUN_VALIDATION_REPORT, SET_OPENBADGES_VERSION, SET_VALIDATION_SUBJECT,
-                                    SET_VERIFIED_PROFILE)
+from ..actions.action_types import (RUN_VALIDATION_REPORT, SET_LIMIT_REACHED, SET_OPENBADGES_VERSION,
+                                    SET_VALIDATION_SUBJECT, SET_VERIFIED_PROFILE)
 
 
-def verification_report_reducer(state, action):
-    if state is None:
-        state = {}
+REPORT_ACTIONS = (SET_LIMIT_REACHED, SET_OPENBADGES_VERSION, SET_VALIDATION_SUBJECT, SET_VERIFIED_PROFILE,)
+
 
+def update_verification_report(state, action):
+    """
+    Apply a verification report action to the report state dict, modifying it in place.
+    """
     action_type = action.get('type')
     if action_type == RUN_VALIDATION_REPORT:
         # TODO
-        return state
+        return
     elif action_type == SET_OPENBADGES_VERSION:
-        state = state.copy()
         state['openBadgesVersion'] = action.get('version')
     elif action_type == SET_VALIDATION_SUBJECT:
-        state = state.copy()
         state['validationSubject'] = action.get('node_id')
     elif action_type == SET_VERIFIED_PROFILE:
-        state = state.copy()
         state['recipientProfile'] = {
             action.get('identityType', 'email'): action.get('identityValue')
         }
+    elif action_type == SET_LIMIT_REACHED:
+        state['limitReached'] = action.get('limit')
+
+
+def verification_report_reducer(state, action):
+    if state is None:
+        state = {}
+
+    if action.get('type') in REPORT_ACTIONS:
+        state = state.copy()
+        update_verification_report(state, action)
 
     return state
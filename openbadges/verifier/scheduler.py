@@ -0,0 +1,209 @@
+import heapq
+
+from .actions.action_types import (ADD_TASK, BATCH, DELETE_OUTDATED_NODE_TASKS, DELETE_TASK, REPORT_MESSAGE,
+                                  RESOLVE_TASK, TRIGGER_CONDITION, UPDATE_TASK)
+from .utils import list_of
+
+
+class TaskScheduler(object):
+    """
+    Keeps track of which queued tasks are ready to run without rescanning the task list.
+
+    Wraps a store: actions dispatched through the scheduler are passed on to the store,
+    and the resulting change to the tasks state is used to update a prerequisite index
+    keyed by task `name` and `task_key` and a ready queue per task name ordered by `task_id`.
+    Readiness follows the same rule as `state.filter_active_tasks`, so `next_task()`
+    returns the same task that `filter_active_tasks(state)[0]` would.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.rebuild()
+
+    def get_state(self):
+        return self.store.get_state()
+
+    def dispatch(self, action):
+        result = self.store.dispatch(action)
+        self._observe(action)
+        return result
+
+    def rebuild(self):
+        """
+        Recompute all indexes from the current tasks state.
+        """
+        self._positions = {}  # task_id: index in the tasks list
+        self._incomplete = set()  # task_ids
+        self._key_total = {}  # prerequisite key: count of tasks known by that key
+        self._key_pending = {}  # prerequisite key: count of incomplete tasks known by that key
+        self._waiting = {}  # prerequisite key: set of task_ids that list it as a prerequisite
+        self._blocked = {}  # task_id: count of unsatisfied prerequisite keys
+        self._names = {}  # task_id: task name
+        self._ready = {}  # task name: heap of task_ids, which may include some no longer ready
+        self._known_count = 0
+
+        tasks = self.get_state().get('tasks', [])
+        for task in tasks:
+            self._count_task(task)
+        for task in tasks:
+            self._queue_task(task)
+        self._known_count = len(tasks)
+
+    def get_task(self, task_id):
+        """
+        Return the current version of a task by its task_id.
+        """
+        return self.get_state()['tasks'][self._positions[task_id]]
+
+    def next_task(self):
+        """
+        Return the first ready task in task list order, or None if no tasks are ready.
+        """
+        task_id = self._first_ready_id()
+        return self.get_task(task_id) if task_id is not None else None
+
+    def next_tasks(self, deferred_names=()):
+        """
+        Return the next tasks to run. This is the first ready task in task list order, except
+        that ready tasks whose names are in deferred_names are held back while any other task
+        is ready. Once only deferred tasks are ready, all of them are returned together.
+        """
+        task_id = self._first_ready_id(deferred_names)
+        if task_id is not None:
+            return [self.get_task(task_id)]
+        return self._ready_tasks(deferred_names)
+
+    def ready_tasks(self):
+        """
+        Return all ready tasks in task list order.
+        """
+        return self._ready_tasks(list(self._ready))
+
+    def _is_ready(self, task_id):
+        return task_id in self._incomplete and not self._blocked.get(task_id)
+
+    def _push_ready(self, task_id):
+        heapq.heappush(self._ready.setdefault(self._names[task_id], []), task_id)
+
+    def _first_ready_id(self, excluded_names=()):
+        """
+        Return the lowest ready task_id of a task whose name is not in excluded_names, dropping
+        the task_ids ahead of it in its queue that are no longer ready.
+        """
+        first = None
+        for name in list(self._ready):
+            if name in excluded_names:
+                continue
+            queue = self._ready[name]
+            while queue and not self._is_ready(queue[0]):
+                heapq.heappop(queue)
+            if not queue:
+                del self._ready[name]
+            elif first is None or queue[0] < first:
+                first = queue[0]
+        return first
+
+    def _ready_tasks(self, names):
+        tasks = self.get_state().get('tasks', [])
+        task_ids = []
+        for name in names:
+            queue = self._ready.get(name)
+            if queue:
+                # A sorted list is a heap.
+                queue[:] = sorted(set(task_id for task_id in queue if self._is_ready(task_id)))
+                task_ids.extend(queue)
+        return [tasks[self._positions[task_id]] for task_id in sorted(task_ids)]
+
+    @staticmethod
+    def _task_keys(task):
+        keys = set()
+        for key in (task.get('name'), task.get('task_key')):
+            if key is not None:
+                keys.add(key)
+        return keys
+
+    def _key_is_satisfied(self, key):
+        return self._key_total.get(key, 0) > 0 and self._key_pending.get(key, 0) == 0
+
+    def _count_task(self, task):
+        self._positions[task['task_id']] = self._known_count
+        self._names[task['task_id']] = task.get('name')
+        self._known_count += 1
+        for key in self._task_keys(task):
+            self._key_total[key] = self._key_total.get(key, 0) + 1
+            if not task.get('complete'):
+                self._key_pending[key] = self._key_pending.get(key, 0) + 1
+        if not task.get('complete'):
+            self._incomplete.add(task['task_id'])
+
+    def _queue_task(self, task):
+        if task.get('complete'):
+            return
+        task_id = task['task_id']
+        prerequisites = set(list_of(task.get('prerequisites', [])))
+        for prereq in prerequisites:
+            self._waiting.setdefault(prereq, set()).add(task_id)
+        self._blocked[task_id] = len([p for p in prerequisites if not self._key_is_satisfied(p)])
+        if not self._blocked[task_id]:
+            self._push_ready(task_id)
+
+    def _add_task(self, task):
+        keys = self._task_keys(task)
+        was_satisfied = dict((key, self._key_is_satisfied(key)) for key in keys)
+        self._count_task(task)
+        for key in keys:
+            self._key_changed(key, was_satisfied[key])
+        self._queue_task(task)
+
+    def _resolve_task(self, task_id):
+        if task_id not in self._incomplete:
+            return
+        task = self.get_state()['tasks'][self._positions[task_id]]
+        self._incomplete.discard(task_id)
+        self._blocked.pop(task_id, None)
+        queue = self._ready.get(task['name'], [])
+        while queue and not self._is_ready(queue[0]):
+            heapq.heappop(queue)
+        for key in self._task_keys(task):
+            was_satisfied = self._key_is_satisfied(key)
+            self._key_pending[key] -= 1
+            self._key_changed(key, was_satisfied)
+
+    def _key_changed(self, key, was_satisfied):
+        is_satisfied = self._key_is_satisfied(key)
+        if is_satisfied == was_satisfied:
+            return
+        for task_id in self._waiting.get(key, ()):
+            if task_id not in self._incomplete:
+                continue
+            self._blocked[task_id] += -1 if is_satisfied else 1
+            if not self._blocked[task_id]:
+                self._push_ready(task_id)
+
+    def _observe_batch(self, actions):
+        tasks = self.get_state().get('tasks', [])
+        action_types = set(a.get('type') for a in actions)
+
+        if action_types & set((DELETE_OUTDATED_NODE_TASKS, DELETE_TASK, UPDATE_TASK)) or len(tasks) < self._known_count:
+            self.rebuild()
+            return
+        # Index counts don't depend on the order changes are observed in. Tasks added by the
+        # batch are indexed as they are after it, including any resolved within it.
+        for action in actions:
+            if action.get('type') == RESOLVE_TASK:
+                self._resolve_task(action.get('task_id'))
+        for task in tasks[self._known_count:]:
+            self._add_task(task)
+
+    def _observe(self, action):
+        tasks = self.get_state().get('tasks', [])
+        action_type = action.get('type')
+
+        if action_type == BATCH:
+            self._observe_batch(action['actions'])
+        elif action_type in (ADD_TASK, REPORT_MESSAGE, TRIGGER_CONDITION) and len(tasks) >= self._known_count:
+            for task in tasks[self._known_count:]:
+                self._add_task(task)
+        elif action_type == RESOLVE_TASK and len(tasks) == self._known_count:
+            self._resolve_task(action.get('task_id'))
+        elif action_type in (DELETE_OUTDATED_NODE_TASKS, DELETE_TASK, UPDATE_TASK) or len(tasks) != self._known_count:
+            self.rebuild()
@@ -1,11 +1,170 @@
+import itertools
 import six
 
 from .actions.action_types import REPORT_MESSAGE
 from .utils import list_of, MESSAGE_LEVEL_ERROR, MESSAGE_LEVEL_INFO, MESSAGE_LEVEL_WARNING
 
+
+class BlankNodeAllocator(object):
+    """
+    Allocates blank node ids _:b0, _:b1, ... for the graph of one verification.
+    """
+    def __init__(self):
+        self._numbers = itertools.count()
+
+    def next_id(self):
+        return "_:b{}".format(next(self._numbers))  # next() on a count is atomic, so this is thread-safe
+
+
+class _GraphStorage(object):
+    """
+    Nodes written to the graph states of one verification, in the order they were written, and
+    indexed by id. Each write makes a new version. A node that is replaced is kept, marked with the
+    version that removed it, so that earlier versions still see it.
+    """
+    def __init__(self):
+        self.nodes = []
+        self.removed = {}  # index in nodes: version that removed it
+        self.positions = {}  # node id: indexes in nodes of the nodes written with that id
+        self.version = 0
+        self.length = 0  # number of nodes in the latest version
+
+    def add(self, node):
+        self.version += 1
+        self.positions.setdefault(node.get('id'), []).append(len(self.nodes))
+        self.nodes.append(node)
+        self.length += 1
+
+    def remove(self, position):
+        self.version += 1
+        self.removed[position] = self.version
+        self.length -= 1
+
+
+class NodeGraph(object):
+    """
+    Graph state: a sequence of nodes indexed by id, that carries the blank node allocator of its store.
+    A graph without an allocator uses one shared by the whole process.
+
+    Successive versions share one storage, so that the latest version adds and replaces a node in
+    constant time without copying the graph. A superseded version is unchanged: it sees the nodes
+    it had, and writing to it copies them first. As with a list of nodes, a node id may be added
+    more than once; lookups find the first node with the id.
+    """
+    def __init__(self, nodes=(), blank_node_ids=None):
+        self._storage = _GraphStorage()
+        for node in nodes:
+            self._storage.add(node)
+        self._set_version()
+        self.blank_node_ids = blank_node_ids
+
+    def _set_version(self):
+        self._version = self._storage.version
+        self._slots = len(self._storage.nodes)
+        self._length = self._storage.length
+
+    def _is_present(self, position):
+        return position < self._slots and self._storage.removed.get(position, self._version + 1) > self._version
+
+    def _position(self, node_id):
+        try:
+            positions = self._storage.positions.get(node_id, ())
+        except TypeError:  # Unhashable id
+            return None
+        for position in positions:
+            if self._is_present(position):
+                return position
+        return None
+
+    def _positions(self):
+        return (position for position in range(self._slots) if self._is_present(position))
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, node_id):
+        return self._position(node_id) is not None
+
+    def __getitem__(self, node_id):
+        position = self._position(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        return self._storage.nodes[position]
+
+    def get(self, node_id, default=None):
+        position = self._position(node_id)
+        return default if position is None else self._storage.nodes[position]
+
+    def keys(self):
+        return [node.get('id') for node in self.values()]
+
+    def values(self):
+        return [self._storage.nodes[position] for position in self._positions()]
+
+    def items(self):
+        return [(node.get('id'), node) for node in self.values()]
+
+    def __eq__(self, other):
+        if isinstance(other, NodeGraph):
+            return self.values() == other.values()
+        return isinstance(other, list) and self.values() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'NodeGraph({!r})'.format(self.values())
+
+    def copy(self):
+        return NodeGraph(self.values(), self.blank_node_ids)
+
+    def successor(self):
+        """
+        Returns a graph to write the next version to, which shares this graph's storage.
+        """
+        graph = NodeGraph(blank_node_ids=self.blank_node_ids)
+        graph._storage = self._storage
+        graph._version, graph._slots, graph._length = self._version, self._slots, self._length
+        return graph
+
+    def _make_latest(self):
+        if self._version != self._storage.version:
+            nodes = self.values()
+            self._storage = _GraphStorage()
+            for node in nodes:
+                self._storage.add(node)
+            self._set_version()
+
+    def add_node(self, node):
+        """
+        Appends node to this graph, keeping any node already added with the same id.
+        """
+        self._make_latest()
+        self._storage.add(node)
+        self._set_version()
+
+    def replace_node(self, node_id, updated_node):
+        """
+        Removes the first node with node_id, and appends updated_node as the most recently written node.
+        Raises KeyError if there is no node with node_id.
+        """
+        self._make_latest()
+        position = self._position(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        self._storage.remove(position)
+        self._storage.add(updated_node)
+        self._set_version()
+
+
 INITIAL_STATE = {
     'input': {},
-    'graph': [],
+    'graph': NodeGraph(),
     'tasks': [],
     'validationReport': {}
 }
@@ -35,6 +194,11 @@ def filter_failed_tasks(state):
     return [t for t in state.get('tasks') if not t.get('success')]
 
 
+def task_is_error(task):
+    # True for a task reported as an ERROR-level message, as counted in the report's errorCount
+    return task.get('success') is False and task.get('messageLevel', MESSAGE_LEVEL_ERROR) == MESSAGE_LEVEL_ERROR
+
+
 # Messages
 def filter_messages_for_report(state):
     messages = []
@@ -62,14 +226,31 @@ def format_message(task_meta):
 
 
 # Graph
+def graph_nodes(state):
+    """
+    Returns the list of nodes in state's graph in order. The graph is a NodeGraph, but a hand-built
+    state may give it as a list of nodes.
+    """
+    graph = state['graph']
+    if isinstance(graph, NodeGraph):
+        return graph.values()
+    return graph
+
+
 def get_node_by_id(state, node_id):
     """
-    Filter state to return first node that matches the requested id.
-    :param state: state object with "graph" property as a list
+    Look up the node in state's graph that has the requested id.
+    :param state: state object with "graph" property as a NodeGraph (or a list of nodes)
     :param node_id: IRI-format string
     Raises IndexError if no node found.
     """
-    return [node for node in state['graph'] if node.get('id') == node_id][0]
+    graph = state['graph']
+    if isinstance(graph, NodeGraph):
+        try:
+            return graph[node_id]
+        except KeyError:
+            raise IndexError("No node found with id {}".format(node_id))
+    return [node for node in graph if node.get('id') == node_id][0]
 
 
 def get_node_by_path(state, node_path):
@@ -77,7 +258,7 @@ def get_node_by_path(state, node_path):
     Filter state to return first node that matches the requested id and property path.
     A path takes the format ['_:b0', 'prop_name', 1, 'another_prop_name'].
     Each entry is either a string (dict key) or non-negative integer (list index).
-    :param state: state object with "graph" property as a list
+    :param state: state object with "graph" property
     :param node_path: node path list
     Raises IndexError if no node found or no list index found.
     Raises KeyError if no property found in node.
@@ -0,0 +1,94 @@
+from pydux import create_store
+
+from .actions.action_types import BATCH
+from .reducers import main_reducer
+from .reducers.graph import GRAPH_ACTIONS, update_graph
+from .reducers.input import INPUT_ACTIONS, update_input
+from .reducers.tasks import TASK_ACTIONS, TaskList, task_reducer
+from .reducers.verification_report import REPORT_ACTIONS, update_verification_report
+from .state import BlankNodeAllocator, graph_nodes, INITIAL_STATE, NodeGraph
+
+
+def _update_tasks(state, action):
+    state['tasks'] = task_reducer(state['tasks'], action)
+
+
+def _update_in_place(key, update):
+    def _update(state, action):
+        update(state[key], action)
+    return _update
+
+
+ACTION_HANDLERS = {}
+for action_types, handler in [
+        (INPUT_ACTIONS, _update_in_place('input', update_input)),
+        (GRAPH_ACTIONS, _update_in_place('graph', update_graph)),
+        (TASK_ACTIONS, _update_tasks),
+        (REPORT_ACTIONS, _update_in_place('report', update_verification_report))]:
+    for action_type in action_types:
+        ACTION_HANDLERS[action_type] = handler
+
+
+class FastStore(object):
+    """
+    A store with the same interface as a pydux store for main_reducer, that routes each action
+    only to the state it affects (or each action of a BATCH in turn) and updates that state in place rather than copying it.
+    get_state() returns the live state, so a state read before a dispatch reflects its changes.
+    """
+    def __init__(self, initial_state=None):
+        initial_state = INITIAL_STATE if initial_state is None else initial_state
+        blank_node_ids = getattr(initial_state.get('graph'), 'blank_node_ids', None) or BlankNodeAllocator()
+        self._state = {
+            'input': dict(initial_state.get('input') or {}),
+            'graph': NodeGraph(graph_nodes(initial_state), blank_node_ids),
+            'tasks': TaskList(initial_state.get('tasks') or []),
+            'report': dict(initial_state.get('report') or {})
+        }
+        self._listeners = []
+        self._is_dispatching = False
+
+    def get_state(self):
+        return self._state
+
+    def dispatch(self, action):
+        if not isinstance(action, dict):
+            raise TypeError('Actions must be a dict.')
+        if action.get('type') is None:
+            raise ValueError('Actions must have a non-None "type" property.')
+        if self._is_dispatching:
+            raise Exception('Reducers may not dispatch actions.')
+
+        actions = action['actions'] if action['type'] == BATCH else [action]
+        try:
+            self._is_dispatching = True
+            for action_to_apply in actions:
+                handler = ACTION_HANDLERS.get(action_to_apply.get('type'))
+                if handler is not None:
+                    handler(self._state, action_to_apply)
+        finally:
+            self._is_dispatching = False
+
+        for listener in list(self._listeners):
+            listener()
+        return action
+
+    def subscribe(self, listener):
+        if not hasattr(listener, '__call__'):
+            raise TypeError('Expected listener to be a function.')
+        self._listeners.append(listener)
+
+        def unsubscribe():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        return unsubscribe
+
+
+def create_verification_store(options=None):
+    """
+    Create an empty store for a verification, a FastStore if the 'fast_store' option is set.
+    Each store allocates blank node ids for its own graph, so concurrent verifications are independent.
+    """
+    initial_state = dict(INITIAL_STATE, graph=NodeGraph(blank_node_ids=BlankNodeAllocator()))
+    if options and options.get('fast_store'):
+        return FastStore(initial_state)
+    return create_store(main_reducer, initial_state)
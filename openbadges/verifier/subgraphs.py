@@ -0,0 +1,144 @@
+"""
+Reuse of validated BadgeClass and Issuer subgraphs across verifications, enabled by passing a
+SubgraphCache as the 'subgraph_cache' verification option.
+
+When a node of a cacheable class is fetched, the tasks that descend from that fetch are tagged with
+its subgraph key, (url, SHA-256 digest of the response). Once a verification is done, each subgraph
+whose tasks all completed is recorded in the cache: its nodes, its original resources and its
+resolved tasks. A later verification that fetches the same content from the same URL grafts these
+in as completed tasks instead of compacting and validating the node again.
+
+A subgraph ends at the documents fetched by its tasks, such as the Issuer of a BadgeClass: what
+descends from those fetches is not part of it. When a subgraph is grafted, its fetches are queued
+again, so that each of those documents is fetched and checked against its own subgraph key.
+"""
+import copy
+import hashlib
+import re
+from collections import OrderedDict
+
+import six
+
+from .actions.action_types import ADD_TASK, REPORT_MESSAGE, TRIGGER_CONDITION
+from .actions.graph import add_node
+from .actions.input import store_original_resource
+from .actions.tasks import restore_task
+from .state import get_node_by_id
+from .tasks.task_types import FETCH_HTTP_NODE
+from .utils import ExpiringCache
+
+
+SUBGRAPH_CLASSES = ('BadgeClass', 'Issuer', 'Profile',)
+
+# Actions that add entries to the tasks state, which are tagged with the subgraphs of the task emitting them
+TAGGED_ACTION_TYPES = (ADD_TASK, REPORT_MESSAGE, TRIGGER_CONDITION,)
+
+_ALLOCATED_BLANK_NODE_ID = re.compile(r'_:b\d+$')
+
+
+class SubgraphCache(ExpiringCache):
+    """
+    Thread-safe cache of validated subgraphs by (url, content digest). Entries expire expire_after
+    seconds after they are recorded, and the oldest are evicted beyond max_entries.
+    A cache passed to worker processes by verify_many() starts empty in each worker.
+    """
+
+
+def subgraph_key(url, content):
+    """
+    :param url: str url the node was fetched from
+    :param content: bytes of the response
+    """
+    return url, hashlib.sha256(content).hexdigest()
+
+
+def tag_actions(actions, subgraphs):
+    """
+    Returns actions with those that add tasks tagged with subgraphs, unless already tagged.
+    :param subgraphs: tuple of subgraph keys of the task that returned the actions
+    """
+    if not subgraphs:
+        return actions
+    return [dict(action, subgraphs=subgraphs)
+            if action.get('type') in TAGGED_ACTION_TYPES and 'subgraphs' not in action else action
+            for action in actions]
+
+
+def graft_actions(subgraph, subgraphs):
+    """
+    Returns the actions that add a cached subgraph to a verification: its original resources,
+    its nodes and its tasks, already resolved and tagged with subgraphs, except for its fetches
+    of other documents, which are queued to run again.
+    """
+    actions = [store_original_resource(node_id, data) for node_id, data in subgraph['original_json'].items()]
+    actions += [add_node(node['id'], data=node) for node in subgraph['nodes']]
+    for task in subgraph['tasks']:
+        if task.get('name') == FETCH_HTTP_NODE:
+            task = dict((k, v) for k, v in task.items() if k not in ('complete', 'success', 'result',))
+            actions.append(restore_task(copy.deepcopy(task), subgraphs=subgraphs))
+        else:
+            # The tasks of a subgraph were checked for duplicates as they were first added.
+            actions.append(restore_task(copy.deepcopy(task), allow_duplicate=True, subgraphs=subgraphs))
+    return actions
+
+
+def record_subgraphs(state, cache):
+    """
+    Records in cache the subgraphs of a finished verification that are not cached yet.
+    Nothing is recorded from a verification stopped early at a limit.
+    """
+    if state['report'].get('limitReached'):
+        return
+
+    tasks_by_key = OrderedDict()
+    for task in state['tasks']:
+        for key in task.get('subgraphs', ()):
+            tasks_by_key.setdefault(key, []).append(task)
+
+    for key, tasks in tasks_by_key.items():
+        if cache.get(key) is None:
+            subgraph = _collect_subgraph(state, key[0], tasks)
+            if subgraph is not None:
+                cache.set(key, subgraph)
+
+
+def _collect_subgraph(state, url, tasks):
+    """
+    Returns the cache entry for the subgraph of the node fetched from url, or None if it cannot be
+    reused: a task is incomplete, or a task refers to a node that was not loaded within the subgraph,
+    such as one in a document its tasks fetched, whose content may differ when the subgraph is reused.
+    """
+    if not all(task.get('complete') for task in tasks):
+        return None
+
+    fetched_urls = set(task['url'] for task in tasks if task.get('name') == FETCH_HTTP_NODE)
+    node_ids = [url]
+    for task in tasks:
+        node_id = task.get('node_id') or (task.get('node_path') or [None])[0]
+        if node_id is None or node_id in node_ids:
+            continue
+        is_local_blank_node = node_id.startswith('_:') and not _ALLOCATED_BLANK_NODE_ID.match(node_id)
+        if not is_local_blank_node:
+            return None
+        node_ids.append(node_id)
+
+    try:
+        nodes = [get_node_by_id(state, node_id) for node_id in node_ids]
+    except IndexError:
+        return None  # Such as a node that declared an id other than its url
+
+    original_json = state['input'].get('original_json', {})
+    resources = OrderedDict()
+    for node in nodes:
+        for value in [node['id']] + list(node.values()):
+            if isinstance(value, dict):
+                value = value.get('id')
+            if isinstance(value, six.string_types) and value in original_json and value not in fetched_urls:
+                resources[value] = original_json[value]
+
+    return copy.deepcopy({
+        'nodes': nodes,
+        'original_json': resources,
+        'tasks': [dict((k, v) for k, v in task.items() if k not in ('task_id', 'subgraphs', 'metrics',))
+                  for task in tasks]
+    })
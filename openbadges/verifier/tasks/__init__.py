@@ -8,8 +8,8 @@ from .object_upgrades import upgrade_0_5_node, upgrade_1_0_node, upgrade_1_1_nod
 from .validation import (assertion_timestamp_checks, assertion_verification_dependencies,
                          criteria_property_dependencies, detect_and_validate_node_class,
                          identity_object_property_dependencies, issuer_property_dependencies, placeholder_task,
-                         validate_expected_node_class, validate_rdf_type_property, validate_property,
-                         validate_revocationlist_entries, )
+                         validate_expected_node_class, validate_node_properties, validate_rdf_type_property,
+                         validate_property, validate_revocationlist_entries, )
 from .verification import (hosted_id_in_verification_scope, verify_recipient_against_trusted_profile)
 from .task_types import *
 
@@ -36,6 +36,7 @@ FUNCTIONS = {
     VALIDATE_EXPECTED_NODE_CLASS:              validate_expected_node_class,
     VALIDATE_EXTENSION_NODE:                   validate_extension_node,
     VALIDATE_EXTENSION_SINGLE:                 validate_single_extension,
+    VALIDATE_NODE_PROPERTIES:                  validate_node_properties,
     IMAGE_VALIDATION:                          validate_image,
     VALIDATE_RDF_TYPE_PROPERTY:                validate_rdf_type_property,
     VALIDATE_PROPERTY:                         validate_property,
@@ -7,7 +7,7 @@ from ..actions.graph import patch_node
 from ..actions.tasks import add_task
 from ..actions.validation_report import set_validation_subject
 from ..exceptions import TaskPrerequisitesError
-from ..state import get_node_by_id, get_node_by_path
+from ..state import get_node_by_id, get_node_by_path, graph_nodes
 from ..utils import list_of, make_string_from_bytes
 
 from .utils import task_result
@@ -118,7 +118,7 @@ def verify_signed_assertion_not_revoked(state, task_meta, **options):
     actions = [patch_node(revocation_list['id'], {'revokedAssertions': revoked_match})]
 
     if len(revoked_match):
-        assertion_records = [i for i in state['graph'] if i.get('id') == assertion_id]
+        assertion_records = [i for i in graph_nodes(state) if i.get('id') == assertion_id]
         msg = ''
         for a in revoked_match:
             try:
@@ -1,9 +1,10 @@
 import json
 import jsonschema
-from pyld import jsonld
 
 from ..actions.tasks import add_task
+from ..contexts import BundledContextLoader, bundled_document, compact
 from ..exceptions import TaskPrerequisitesError
+from ..metrics import record_http_response
 from ..openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from ..state import get_node_by_id, get_node_by_path
 from ..utils import jsonld_use_cache, list_of
@@ -14,6 +15,21 @@ from .utils import (abbreviate_value as abv,
                     combine_contexts, is_ld_term_in_list, task_result,)
 
 
+def _load_json(loader, url):
+    """
+    Loads the JSON document at url, from memory if the loader serves bundled documents and one is
+    bundled for url, or else with the loader's session.
+    """
+    if isinstance(loader, BundledContextLoader):
+        document = bundled_document(url)
+        if document is not None:
+            return json.loads(document)
+
+    response = loader.session.get(url, headers={'Accept': 'application/ld+json, application/json'})
+    record_http_response(response)
+    return response.json()
+
+
 def validate_single_extension(state, task_meta, **options):
     # node, extension, node_json=None, node_id_string=None, context_urls=None
     try:
@@ -42,7 +58,7 @@ def validate_single_extension(state, task_meta, **options):
     schema = extension['validation_schema']
 
     node_data['@context'] = OPENBADGES_CONTEXT_V2_URI
-    compact_data = jsonld.compact(
+    compact_data = compact(
         node_data, {'@context': combine_contexts(OPENBADGES_CONTEXT_V2_URI, context)},
         options=options.get('jsonld_options', jsonld_use_cache))
 
@@ -89,12 +105,11 @@ def validate_extension_node(state, task_meta, **options):
         if context_url == OPENBADGES_CONTEXT_V2_URI:
             continue
 
-        response = loader.session.get(context_url, headers={'Accept': 'application/ld+json, application/json'})
         try:
-            context_json = response.json()
+            context_json = _load_json(loader, context_url)
         except TypeError:
             continue
-        context_compact = jsonld.compact(context_json, OPENBADGES_CONTEXT_V2_URI, options=jsonld_options)
+        context_compact = compact(context_json, OPENBADGES_CONTEXT_V2_URI, options=jsonld_options)
 
         validation = list_of(context_compact.get('validation'))
         for val_entry in validation:
@@ -103,8 +118,7 @@ def validate_extension_node(state, task_meta, **options):
                     options=options.get('jsonld_options', jsonld_use_cache)):
                 try:
                     schema_url = val_entry['validationSchema']
-                    schema_json = loader.session.get(
-                        schema_url, headers={'Accept': 'application/ld+json, application/json'}).json()
+                    schema_json = _load_json(loader, schema_url)
                 except TypeError:
                     return task_result(False, 'Could not load JSON-schema from URL {}'.format(abv(schema_url)))
 
@@ -1,10 +1,7 @@
 import base64
 import json
 import mimeparse
-from pyld import jsonld
 import re
-import requests
-import requests_cache
 import six
 import sys
 import uuid
@@ -14,11 +11,14 @@ from ..actions.input import store_original_resource
 from ..actions.validation_report import set_validation_subject
 from ..actions.tasks import add_task, delete_outdated_node_tasks, report_message
 from ..actions.validation_report import set_openbadges_version
+from ..compaction import compact_openbadges_data
 from ..exceptions import TaskPrerequisitesError
+from ..metrics import record_http_response
 from ..openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from ..reducers.graph import get_next_blank_node_id
 from ..state import get_node_by_id, node_match_exists
-from ..utils import list_of, jsonld_use_cache,make_string_from_bytes, MESSAGE_LEVEL_WARNING
+from ..subgraphs import graft_actions, subgraph_key, SUBGRAPH_CLASSES
+from ..utils import get_http_session, list_of, jsonld_use_cache, make_string_from_bytes, MESSAGE_LEVEL_WARNING
 
 from .task_types import (DETECT_AND_VALIDATE_NODE_CLASS, FETCH_HTTP_NODE, INTAKE_JSON, JSONLD_COMPACT_DATA,
                          PROCESS_BAKED_RESOURCE, UPGRADE_0_5_NODE, UPGRADE_1_0_NODE, UPGRADE_1_1_NODE,
@@ -29,16 +29,12 @@ from .validation import OBClasses
 
 def fetch_http_node(state, task_meta, **options):
     url = task_meta['url']
-
-    if options.get('cache_backend'):
-        session = requests_cache.CachedSession(
-            backend=options['cache_backend'], expire_after=options.get('cache_expire_after', 300))
-    else:
-        session = requests.Session()
+    session = get_http_session(options)
 
     result = session.get(
         url, headers={'Accept': 'application/ld+json, application/json, image/png, image/svg+xml'}
     )
+    record_http_response(result)
 
     try:
         json.loads(result.text)
@@ -64,11 +60,27 @@ def fetch_http_node(state, task_meta, **options):
         return task_result(
             True, 'Successfully fetched image from {}'.format(url), actions)
 
+    intake_action = add_task(INTAKE_JSON, data=result.text, node_id=url,
+                             expected_class=task_meta.get('expected_class'),
+                             source_node_path=task_meta.get('source_node_path'))
+
+    # A fetched document is the boundary of the subgraph of the task that fetched it: what descends
+    # from it is only in its own subgraph, so it is checked against its own content when reused.
+    cache = options.get('subgraph_cache')
+    if cache is not None and task_meta.get('expected_class') in SUBGRAPH_CLASSES:
+        subgraphs = (subgraph_key(url, result.content),)
+        subgraph = cache.get(subgraphs[0])
+        if subgraph is not None:
+            return task_result(
+                message="Fetched JSON data from {} and reused its validated subgraph".format(url),
+                actions=graft_actions(subgraph, subgraphs))
+        intake_action['subgraphs'] = subgraphs
+    elif task_meta.get('subgraphs'):
+        intake_action['subgraphs'] = ()
+
     actions = [
         store_original_resource(node_id=url, data=result.text),
-        add_task(INTAKE_JSON, data=result.text, node_id=url,
-                 expected_class=task_meta.get('expected_class'),
-                 source_node_path=task_meta.get('source_node_path'))]
+        intake_action]
     return task_result(message="Successfully fetched JSON data from {}".format(url), actions=actions)
 
 
@@ -172,15 +184,10 @@ def jsonld_compact_data(state, task_meta, **options):
     except TypeError:
         return task_result(False, "Could not load data")
 
-    selected_options = options.get('jsonld_options', jsonld_use_cache)
-    selected_options['documentLoader'].contexts = set()
-
-    result = jsonld.compact(input_data, OPENBADGES_CONTEXT_V2_URI,
-                            options=selected_options)
-
-    new_contexts = list(selected_options['documentLoader'].contexts.copy())
+    result, new_contexts = compact_openbadges_data(
+        input_data, options.get('jsonld_options', jsonld_use_cache), options.get('compaction_cache'))
 
-    node_id = result.get('id', task_meta.get('node_id', get_next_blank_node_id()))
+    node_id = result.get('id') or task_meta.get('node_id') or get_next_blank_node_id(state.get('graph'))
 
     # Handle mismatch between URL node source and declared ID.
     if result.get('id') and task_meta.get('node_id') and result['id'] != task_meta['node_id']:
@@ -1,13 +1,14 @@
 import base64
 import re
 import requests
-import requests_cache
 import six
 
 from ..actions.input import store_original_resource
 from ..actions.tasks import add_task
 from ..exceptions import TaskPrerequisitesError
+from ..metrics import record_http_response
 from ..state import get_node_by_id, get_node_by_path
+from ..utils import get_http_session
 
 from .task_types import IMAGE_VALIDATION
 from .utils import (task_result, abbreviate_value,
@@ -27,11 +28,7 @@ def validate_image(state, task_meta, **options):
         else:
             node = get_node_by_path(state, node_path)
 
-        if options.get('cache_backend'):
-            session = requests_cache.CachedSession(
-                backend=options['cache_backend'], expire_after=options.get('cache_expire_after', 300))
-        else:
-            session = requests.Session()
+        session = get_http_session(options)
     except (IndexError, TypeError, KeyError):
         raise TaskPrerequisitesError()
 
@@ -73,6 +70,7 @@ def validate_image(state, task_meta, **options):
                 result = session.get(
                     url, headers={'Accept': 'application/ld+json, application/json, image/png, image/svg+xml'}
                 )
+                record_http_response(result)
                 result.raise_for_status()
                 content_type = result.headers['content-type']
                 encoded_body = base64.b64encode(result.content)
@@ -1,15 +1,15 @@
 import base64
+import functools
 import json
 from openbadges_bakery import unbake
-from pyld import jsonld
 import re
 from tempfile import NamedTemporaryFile
 
 from ..actions.input import set_input_type, store_input
 from ..actions.tasks import add_task, report_message
 from ..actions.validation_report import set_validation_subject
+from ..compaction import compact_openbadges_data
 from ..exceptions import TaskPrerequisitesError
-from ..openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from ..tasks.utils import is_url
 from ..utils import jsonld_use_cache, make_string_from_bytes, MESSAGE_LEVEL_ERROR
 from ..tasks.task_types import DETECT_INPUT_TYPE, FETCH_HTTP_NODE, PROCESS_JWS_INPUT
@@ -33,9 +33,9 @@ def input_is_jws(user_input):
     return bool(jws_regex.match(make_string_from_bytes(user_input)))
 
 
-def find_id_in_jsonld(json_string, jsonld_options):
+def find_id_in_jsonld(json_string, jsonld_options, compaction_cache=None):
     input_data = json.loads(json_string)
-    result = jsonld.compact(input_data, OPENBADGES_CONTEXT_V2_URI, options=jsonld_options)
+    result, _ = compact_openbadges_data(input_data, jsonld_options, compaction_cache)
     node_id = result.get('id','')
     return node_id
 
@@ -66,8 +66,10 @@ def detect_input_type(state, task_meta, **options):
         ))
         new_actions.append(set_validation_subject(input_value))
     elif input_is_json(input_value):
-        for url_finder in [find_id_in_jsonld, find_1_0_verify_url]:
-            id_url = url_finder(input_value, options.get('jsonld_options', jsonld_use_cache))
+        jsonld_options = options.get('jsonld_options', jsonld_use_cache)
+        for url_finder in [functools.partial(find_id_in_jsonld, compaction_cache=options.get('compaction_cache')),
+                           find_1_0_verify_url]:
+            id_url = url_finder(input_value, jsonld_options)
             if is_url(id_url):
                 detected_type = 'url'
                 new_actions.append(store_input(id_url))
@@ -45,7 +45,7 @@ def upgrade_1_1_node(state, task_meta, **options):
 
     if expected_class == OBClasses.Assertion or data.get('recipient') is not None:
         # Do assertion upgrades
-        dt_validator = PrimitiveValueValidator(ValueTypes.DATETIME)
+        dt_validator = PrimitiveValueValidator.for_type(ValueTypes.DATETIME)
         issued_on = data.get('issuedOn')
         patch = {}
         if not dt_validator(issued_on) and issued_on is not None:
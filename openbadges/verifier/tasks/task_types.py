@@ -32,6 +32,7 @@ objects are sound.
 """
 DETECT_AND_VALIDATE_NODE_CLASS = 'DETECT_AND_VALIDATE_NODE_CLASS'
 VALIDATE_EXPECTED_NODE_CLASS = 'VALIDATE_EXPECTED_NODE_CLASS'
+VALIDATE_NODE_PROPERTIES = 'VALIDATE_NODE_PROPERTIES'
 VALIDATE_RDF_TYPE_PROPERTY = 'VALIDATE_RDF_TYPE_PROPERTY'
 VALIDATE_PROPERTY = 'VALIDATE_PROPERTY'
 
@@ -67,6 +68,9 @@ CLASS_VALIDATION_TASKS = (ASSERTION_TIMESTAMP_CHECKS, ASSERTION_VERIFICATION_CHE
                           IMAGE_VALIDATION, ISSUER_PROPERTY_DEPENDENCIES,
                           VALIDATE_REVOCATIONLIST_ENTRIES, VERIFY_RECIPIENT_IDENTIFIER)
 
+# Tasks that spend most of their time waiting on the network and may run concurrently with one another.
+IO_BOUND_TASKS = (FETCH_HTTP_NODE, IMAGE_VALIDATION, VALIDATE_EXTENSION_NODE)
+
 
 """
 TRIGGERED CONDITIONS
@@ -1,11 +1,21 @@
-from pyld import jsonld
 import re
 import rfc3986
 import six
+import traceback
 
+from ..contexts import expand
+from ..exceptions import ResourceNotLoaded, SkipTask, TaskPrerequisitesError
+from ..logger import logger
 from ..openbadges_context import OPENBADGES_CONTEXT_V2_URI
+from ..utils import memoize_strings
 
 URN_REGEX = r'^urn:uuid:[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$'
+URN_PATTERN = re.compile(URN_REGEX, re.IGNORECASE)
+DATA_URI_PATTERN = re.compile(
+    r'(?P<scheme>^data):(?P<mimetypes>[^,]{0,}?)?(?P<encoding>base64)?,(?P<data>.*$)', re.IGNORECASE)
+
+# Results are memoized for ids up to this length; longer strings, such as data URIs of images, are not kept.
+MEMOIZED_ID_LENGTH = 512
 
 
 def task_result(success=True, message='', actions=None):
@@ -22,6 +32,38 @@ def task_result(success=True, message='', actions=None):
     return (success, message, actions,)
 
 
+def execute_task(task_func, task_meta, state, options=None):
+    """
+    Runs a task function against a state without dispatching anything. Errors raised by
+    the task are converted into a failed result, except ResourceNotLoaded, which is re-raised
+    so the caller can load the resource and run the task again.
+    :param task_func: func
+    :param task_meta: dict (single entry in tasks state)
+    :param state: dict
+    :return: tuple (success, message, actions), as returned by task_result
+    """
+    try:
+        return task_func(state, task_meta, **(options or {}))
+    except ResourceNotLoaded:
+        raise
+    except SkipTask:
+        raise NotImplemented("Implement SkipTask handling in call_task")
+    except TaskPrerequisitesError:
+        message = "Task could not run due to unmet prerequisites."
+        return False, message, []
+    except Exception as e:
+        cause = e
+        while cause is not None:
+            if isinstance(cause, ResourceNotLoaded):
+                raise cause  # Possibly wrapped by pyld when raised from a document loader
+            cause = getattr(cause, 'cause', None)
+
+        error_message = traceback.format_exception_only(type(e), e)
+        logger.error(traceback.format_exc())
+        message = "{} {}".format(e.__class__, error_message)
+        return False, message, []
+
+
 def is_empty_list(value):
     return isinstance(value, (tuple, list)) and len(value) == 0
 
@@ -47,11 +89,18 @@ def abbreviate_node_id(node_id=None, node_path=None, length=48):
 
 
 def is_iri(value):
-    return bool(
-        is_url(value) or
-        re.match(r'^_:', value) or
-        re.match(URN_REGEX, value, re.IGNORECASE)
-    )
+    if not isinstance(value, six.string_types):
+        return bool(is_url(value) or re.match(r'^_:', value))  # Raises TypeError, as for any non-string
+    return _is_iri(value)
+
+
+@memoize_strings(maxsize=8192, max_length=MEMOIZED_ID_LENGTH)
+def _is_iri(value):
+    if value.startswith('_:'):
+        return True
+    if value[:4].lower() == 'urn:':
+        return bool(URN_PATTERN.match(value))
+    return is_url(value)
 
 
 def is_blank_node_id(value):
@@ -59,29 +108,35 @@ def is_blank_node_id(value):
 
 
 def is_data_uri(value):
-    data_uri_regex = r'(?P<scheme>^data):(?P<mimetypes>[^,]{0,}?)?(?P<encoding>base64)?,(?P<data>.*$)'
-    ret = False
+    if not value or not isinstance(value, six.string_types) or value[:5].lower() != 'data:':
+        return False
+    return _is_data_uri(value)
+
+
+@memoize_strings(maxsize=1024, max_length=MEMOIZED_ID_LENGTH)
+def _is_data_uri(value):
     try:
-        if ((value and isinstance(value, six.string_types))
-                and rfc3986.is_valid_uri(value, require_scheme=True)
-                and re.match(data_uri_regex, value, re.IGNORECASE)
-                and re.match(data_uri_regex, value, re.IGNORECASE).group('scheme').lower() == 'data'):
-            ret = True
+        return bool(rfc3986.is_valid_uri(value, require_scheme=True) and DATA_URI_PATTERN.match(value))
     except ValueError:
-        pass
-    return ret
+        return False
 
 
 def is_url(value):
-    ret = False
+    if not value or not isinstance(value, six.string_types):
+        return False
+    return _is_url(value)
+
+
+@memoize_strings(maxsize=8192, max_length=MEMOIZED_ID_LENGTH)
+def _is_url(value):
+    # Check the scheme before parsing: most ids that are not URLs are ruled out by their first characters
+    if value[:5].lower() not in ('http:', 'https'):
+        return False
     try:
-        if ((value and isinstance(value, six.string_types))
-                and rfc3986.is_valid_uri(value, require_scheme=True)
-                and rfc3986.uri_reference(value).scheme.lower() in ['http', 'https']):
-            ret = True
+        return bool(rfc3986.is_valid_uri(value, require_scheme=True)
+                    and rfc3986.uri_reference(value).scheme.lower() in ['http', 'https'])
     except ValueError:
-        pass
-    return ret
+        return False
 
 
 def filter_tasks(state, **kwargs):
@@ -99,7 +154,7 @@ def is_ld_term_in_list(term, search_list, context=OPENBADGES_CONTEXT_V2_URI, opt
         '_:term': {'@type': term},
         '_:list': {'@type': search_list}
     }
-    result = jsonld.expand(construct, options)
+    result = expand(construct, options)
     return result[0]['_:term'][0]['@type'][0] in result[0]['_:list'][0]['@type']
 
 
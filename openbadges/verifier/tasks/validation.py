@@ -1,6 +1,5 @@
 import aniso8601
 from datetime import datetime
-from language_tags import tags as language_tags
 import numbers
 from pyld import jsonld
 from pytz import utc
@@ -8,22 +7,25 @@ import re
 import six
 
 from ..actions.graph import patch_node
-from ..actions.tasks import add_task, report_message
+from ..actions.tasks import add_task, report_message, resolve_task
+from ..actions.utils import generate_task_key
+from ..contexts import expand
 from ..exceptions import TaskPrerequisitesError, ValidationError
 from ..state import get_node_by_id, get_node_by_path
 from ..openbadges_context import OPENBADGES_CONTEXT_V2_DICT
-from ..utils import list_of, MESSAGE_LEVEL_WARNING
+from ..utils import list_of, memoize_strings, MESSAGE_LEVEL_WARNING
 
 from .task_types import (ASSERTION_TIMESTAMP_CHECKS, ASSERTION_VERIFICATION_CHECK,
                          ASSERTION_VERIFICATION_DEPENDENCIES, CLASS_VALIDATION_TASKS,
                          CRITERIA_PROPERTY_DEPENDENCIES, FETCH_HTTP_NODE, FLATTEN_EMBEDDED_RESOURCE,
                          HOSTED_ID_IN_VERIFICATION_SCOPE, IDENTITY_OBJECT_PROPERTY_DEPENDENCIES,
                          IMAGE_VALIDATION, ISSUER_PROPERTY_DEPENDENCIES, VALIDATE_EXPECTED_NODE_CLASS,
-                         VALIDATE_RDF_TYPE_PROPERTY, VALIDATE_PROPERTY, VALIDATE_REVOCATIONLIST_ENTRIES,
-                         VERIFY_RECIPIENT_IDENTIFIER)
+                         VALIDATE_NODE_PROPERTIES, VALIDATE_RDF_TYPE_PROPERTY, VALIDATE_PROPERTY,
+                         VALIDATE_REVOCATIONLIST_ENTRIES, VERIFY_RECIPIENT_IDENTIFIER)
 from .utils import (abbreviate_value as abv,
                     abbreviate_node_id as abv_node,
-                    is_blank_node_id, is_data_uri, is_empty_list, is_null_list, is_iri, is_url, task_result,)
+                    execute_task, is_blank_node_id, is_data_uri, is_empty_list, is_null_list, is_iri, is_url,
+                    task_result,)
 
 from future.standard_library import install_aliases
 install_aliases()
@@ -96,6 +98,13 @@ class ValueTypes(object):
     )
 
 
+DATETIME_TIMEZONE_REGEX = re.compile(r'.*[+-](?:\d{4}|\d{2}|\d{2}:\d{2})$')
+EMAIL_REGEX = re.compile(r'(^[^@\s]+@[^@\s]+$)')
+HASHED_IDENTITY_REGEXES = (re.compile(r'md5\$[\da-fA-F]{32}$'), re.compile(r'sha256\$[\da-fA-F]{64}$'),)
+HOSTNAME_REGEX = re.compile(r'(?=^.{4,253}$)(^((?!-)[a-zA-Z0-9-]{0,62}[a-zA-Z0-9]\.)+[a-zA-Z]{2,63}$)')
+TELEPHONE_REGEX = re.compile(r'^\+?[1-9]\d{1,14}(;ext=\d+)?$')
+
+
 class PrimitiveValueValidator(object):
     """
     A callable validator for primitive Open Badges value types. 
@@ -103,43 +112,68 @@ class PrimitiveValueValidator(object):
     Example usage: 
     PrimitiveValueValidator(ValueTypes.TEXT)("test value")
     > True
+
+    PrimitiveValueValidator.for_type(ValueTypes.TEXT) returns a shared instance instead of building a new one.
     """
+    VALUE_CHECK_FUNCTIONS = {
+        ValueTypes.BOOLEAN: '_validate_boolean',
+        ValueTypes.DATA_URI: '_validate_data_uri',
+        ValueTypes.DATA_URI_OR_URL: '_validate_data_uri_or_url',
+        ValueTypes.DATETIME: '_validate_datetime',
+        ValueTypes.EMAIL: '_validate_email',
+        ValueTypes.IDENTITY_HASH: '_validate_identity_hash',
+        ValueTypes.IRI: '_validate_iri',
+        ValueTypes.LANGUAGE: '_validate_language',
+        ValueTypes.COMPACT_IRI: '_validate_compact_iri',
+        ValueTypes.MARKDOWN_TEXT: '_validate_markdown_text',
+        ValueTypes.RDF_TYPE: '_validate_rdf_type',
+        ValueTypes.TELEPHONE: '_validate_tel',
+        ValueTypes.TEXT: '_validate_text',
+        ValueTypes.TEXT_OR_NUMBER: '_validate_text_or_number',
+        ValueTypes.URL: '_validate_url',
+        ValueTypes.URL_AUTHORITY: '_validate_url_authority'
+    }
+
+    _shared_validators = {}
+
     def __init__(self, value_type):
-        value_check_functions = {
-            ValueTypes.BOOLEAN: self._validate_boolean,
-            ValueTypes.DATA_URI: self._validate_data_uri,
-            ValueTypes.DATA_URI_OR_URL: self._validate_data_uri_or_url,
-            ValueTypes.DATETIME: self._validate_datetime,
-            ValueTypes.EMAIL: self._validate_email,
-            ValueTypes.IDENTITY_HASH: self._validate_identity_hash,
-            ValueTypes.IRI: self._validate_iri,
-            ValueTypes.LANGUAGE: self._validate_language,
-            ValueTypes.COMPACT_IRI: self._validate_compact_iri,
-            ValueTypes.MARKDOWN_TEXT: self._validate_markdown_text,
-            ValueTypes.RDF_TYPE: self._validate_rdf_type,
-            ValueTypes.TELEPHONE: self._validate_tel,
-            ValueTypes.TEXT: self._validate_text,
-            ValueTypes.TEXT_OR_NUMBER: self._validate_text_or_number,
-            ValueTypes.URL: self._validate_url,
-            ValueTypes.URL_AUTHORITY: self._validate_url_authority
-        }
         self.value_type = value_type
-        self.is_valid = value_check_functions[value_type]
+        self.is_valid = getattr(self, self.VALUE_CHECK_FUNCTIONS[value_type])
 
     def __call__(self, value):
         return self.is_valid(value)
 
+    @classmethod
+    def for_type(cls, value_type):
+        try:
+            return cls._shared_validators[value_type]
+        except KeyError:
+            validator = cls._shared_validators[value_type] = cls(value_type)
+            return validator
+
+    def validate_many(self, values):
+        """
+        Returns the index of the first invalid value of values, checking them in order, or None if all are valid.
+        """
+        is_valid = self.is_valid
+        for i, value in enumerate(values):
+            if not is_valid(value):
+                return i
+        return None
+
     @staticmethod
     def _validate_boolean(value):
         return isinstance(value, bool)
 
-    @classmethod
-    def _validate_compact_iri(cls, value):
-        if value == 'id' or cls._validate_iri(value):
+    @staticmethod
+    @memoize_strings(maxsize=4096)
+    def _validate_compact_iri(value):
+        # Memoized: expansion is costly, and the same terms are checked over and over
+        if value == 'id' or is_iri(value):
             return True
         try:
             test_data = {'@context': OPENBADGES_CONTEXT_V2_DICT, value: 'TEST'}
-            expanded = jsonld.expand(test_data)
+            expanded = expand(test_data)
             if len(list(expanded[0])) == 1:
                 return True
         except (jsonld.JsonLdError, IndexError):
@@ -155,6 +189,7 @@ class PrimitiveValueValidator(object):
         return bool(cls._validate_url(value) or cls._validate_data_uri(value))
 
     @staticmethod
+    @memoize_strings(maxsize=4096)
     def _validate_datetime(value):
         try:
             # aniso at least needs to think it can get a datetime from value
@@ -165,16 +200,16 @@ class PrimitiveValueValidator(object):
         # NOTE -- does not catch minus-sign (non-ascii char) tzinfo delimiter
         return (isinstance(value, six.string_types) and
                 (value[-1:]=='Z' or
-                 bool(re.match(r'.*[+-](?:\d{4}|\d{2}|\d{2}:\d{2})$', value))))
+                 bool(DATETIME_TIMEZONE_REGEX.match(value))))
 
 
     @staticmethod
     def _validate_email(value):
-        return bool(re.match(r'(^[^@\s]+@[^@\s]+$)', value))
+        return bool(EMAIL_REGEX.match(value))
 
     @staticmethod
     def is_hashed_identity_hash(value):
-        return bool(re.match(r'md5\$[\da-fA-F]{32}$', value) or re.match(r'sha256\$[\da-fA-F]{64}$', value))
+        return any(regex.match(value) for regex in HASHED_IDENTITY_REGEXES)
 
     @classmethod
     def _validate_identity_hash(cls, value):
@@ -192,7 +227,10 @@ class PrimitiveValueValidator(object):
         return is_iri(value)
 
     @staticmethod
+    @memoize_strings(maxsize=1024)
     def _validate_language(value):
+        # Imported on first use, as loading the language subtag registry takes about a tenth of a second
+        from language_tags import tags as language_tags
         return isinstance(value, six.string_types) and language_tags.check(value)
 
     @classmethod
@@ -200,16 +238,17 @@ class PrimitiveValueValidator(object):
         # All markdown is "valid" if it is a string.
         return cls._validate_text
 
-    @classmethod
-    def _validate_rdf_type(cls, value):
+    @staticmethod
+    @memoize_strings(maxsize=4096)
+    def _validate_rdf_type(value):
         try:
             if not(isinstance(value, six.string_types)):
                 raise ValidationError(
                     'RDF_TYPE entry {} must be a string value'.format(abv(value)))
 
-            expanded = jsonld.expand({"@context": OPENBADGES_CONTEXT_V2_DICT, 'type': value})
+            expanded = expand({"@context": OPENBADGES_CONTEXT_V2_DICT, 'type': value})
             expanded_value = expanded[0]['@type'][0]
-            if not cls._validate_iri(expanded_value):
+            if not is_iri(expanded_value):
                 raise ValidationError(
                     'RDF_TYPE entry {} must be a valid IRI in the document context'.format(
                         abv(value))
@@ -222,7 +261,7 @@ class PrimitiveValueValidator(object):
     @staticmethod
     def _validate_tel(value):
         """ Validates whether item passes E.164 validation (allows extensions)"""
-        return bool(re.match(r'^\+?[1-9]\d{1,14}(;ext=\d+)?$', value))
+        return bool(TELEPHONE_REGEX.match(value))
 
     @staticmethod
     def _validate_text(value):
@@ -241,12 +280,10 @@ class PrimitiveValueValidator(object):
         if not isinstance(value, six.string_types):
             return False
 
-        hostname = re.compile(r'(?=^.{4,253}$)(^((?!-)[a-zA-Z0-9-]{0,62}[a-zA-Z0-9]\.)+[a-zA-Z]{2,63}$)')
-
         test_value = 'http://{}/test'.format(value)
         parsed = urlparse(test_value)
         au = parsed.netloc
-        if not au or not hostname.match(au):
+        if not au or not HOSTNAME_REGEX.match(au):
             return False
 
         return parsed.scheme == 'http' and au == value and parsed.path == '/test' and not parsed.query
@@ -308,11 +345,12 @@ def validate_property(state, task_meta, **options):
 
     try:
         if prop_type != ValueTypes.ID:
-            for val in values_to_test:
-                value_check_function = PrimitiveValueValidator(prop_type)
-                if not value_check_function(val):
-                    raise ValidationError("{} property {} value {} not valid in {} {}".format(
-                        prop_type, prop_name, abv(val), node_class, abv_node(node_id, node_path)))
+            value_check_function = PrimitiveValueValidator.for_type(prop_type)
+            invalid_index = value_check_function.validate_many(values_to_test)
+            if invalid_index is not None:
+                raise ValidationError("{} property {} value {} not valid in {} {}".format(
+                    prop_type, prop_name, abv(values_to_test[invalid_index]), node_class,
+                    abv_node(node_id, node_path)))
         else:
             for i in range(len(values_to_test)):
                 val = values_to_test[i]
@@ -327,11 +365,13 @@ def validate_property(state, task_meta, **options):
                                  expected_class=task_meta.get('expected_class'),
                                  full_validate=task_meta.get('full_validate', True)))
                     continue
-                elif task_meta.get('allow_data_uri') and not PrimitiveValueValidator(ValueTypes.DATA_URI_OR_URL)(val):
+                elif (task_meta.get('allow_data_uri') and
+                        not PrimitiveValueValidator.for_type(ValueTypes.DATA_URI_OR_URL)(val)):
                     raise ValidationError("ID-type property {} had value `{}` that isn't URI or DATA URI in {}.".format(
                         prop_name, abv(val), abv_node(node_id, node_path))
                     )
-                elif not task_meta.get('allow_data_uri', False) and not PrimitiveValueValidator(ValueTypes.IRI)(val):
+                elif (not task_meta.get('allow_data_uri', False) and
+                        not PrimitiveValueValidator.for_type(ValueTypes.IRI)(val)):
                     actions.append(report_message(
                         "ID-type property {} had value `{}` where another scheme may have been expected {}.".format(
                             prop_name, abv(val), abv_node(node_id, node_path)
@@ -344,9 +384,10 @@ def validate_property(state, task_meta, **options):
                     target = get_node_by_id(state, val)
                 except IndexError:
                     if not task_meta.get('fetch', False):
-                        if task_meta.get('allow_remote_url') and PrimitiveValueValidator(ValueTypes.URL)(val):
+                        if task_meta.get('allow_remote_url') and PrimitiveValueValidator.for_type(ValueTypes.URL)(val):
                             continue
-                        if task_meta.get('allow_data_uri') and PrimitiveValueValidator(ValueTypes.DATA_URI)(val):
+                        if (task_meta.get('allow_data_uri') and
+                                PrimitiveValueValidator.for_type(ValueTypes.DATA_URI)(val)):
                             continue
                         raise ValidationError(
                             'Node {} has {} property value `{}` that appears not to be in URI format'.format(
@@ -613,10 +654,13 @@ class ClassValidators(OBClasses):
             ]
 
 
-def _get_validation_actions(node_class, node_id=None, node_path=None):
-    validators = ClassValidators(node_class).validators
-    actions = []
-    for validator in validators:
+def _compile_validation_plan(node_class):
+    """
+    Returns the add_task actions that validate an instance of node_class, without node_id or node_path.
+    Actions have a task_key only where the validator names one.
+    """
+    plan = []
+    for validator in ClassValidators(node_class).validators:
         if validator.get('prop_type') == ValueTypes.RDF_TYPE:
             action = add_task(VALIDATE_RDF_TYPE_PROPERTY, **validator)
         if validator.get('prop_type') in ValueTypes.PRIMITIVES:
@@ -626,6 +670,33 @@ def _get_validation_actions(node_class, node_id=None, node_path=None):
         else:
             continue
 
+        if 'task_key' not in validator:
+            del action['task_key']
+        plan.append(action)
+    return tuple(plan)
+
+
+_validation_plans = {}
+
+
+def get_validation_plan(node_class):
+    """
+    Returns the validation plan for node_class, compiled on first use. The plan is shared: treat it as read-only.
+    """
+    try:
+        return _validation_plans[node_class]
+    except KeyError:
+        plan = _validation_plans[node_class] = _compile_validation_plan(node_class)
+        return plan
+
+
+def _get_validation_actions(node_class, node_id=None, node_path=None):
+    actions = []
+    for template in get_validation_plan(node_class):
+        action = dict(template)
+        if 'task_key' not in action:
+            action['task_key'] = generate_task_key()
+
         if node_id:
             action['node_id'] = node_id
         else:
@@ -635,6 +706,50 @@ def _get_validation_actions(node_class, node_id=None, node_path=None):
     return actions
 
 
+def _combine_property_validations(actions, node_class, node_id=None, node_path=None):
+    """
+    Replaces the VALIDATE_PROPERTY actions without prerequisites by a single VALIDATE_NODE_PROPERTIES
+    action, at the position of the first of them.
+    """
+    properties = [a for a in actions if a.get('name') == VALIDATE_PROPERTY and not a.get('prerequisites')]
+    if len(properties) < 2:
+        return actions
+
+    combined_action = add_task(VALIDATE_NODE_PROPERTIES, node_class=node_class, properties=properties)
+    if node_id:
+        combined_action['node_id'] = node_id
+    else:
+        combined_action['node_path'] = node_path
+
+    combined_actions = []
+    for action in actions:
+        if action is properties[0]:
+            combined_actions.append(combined_action)
+        elif not any(action is p for p in properties):
+            combined_actions.append(action)
+    return combined_actions
+
+
+def validate_node_properties(state, task_meta, **options):
+    """
+    Runs the VALIDATE_PROPERTY tasks of a node in one pass ('single_pass_validation' option).
+    Each property was added as a pending task waiting for this one, which resolves it with its result
+    and then adds the actions it returned, as when the properties run as separate tasks.
+    """
+    actions = []
+    for property_task in task_meta.get('properties', []):
+        success, message, property_actions = execute_task(validate_property, property_task, state, options)
+        actions.append(resolve_task(property_task['task_id'], success=success, result=message))
+        actions.extend(property_actions)
+
+    return task_result(
+        True, "Validated {} properties of {} {}".format(
+            len(task_meta.get('properties', [])), task_meta.get('node_class'),
+            abv_node(task_meta.get('node_id'), task_meta.get('node_path'))),
+        actions
+    )
+
+
 def detect_and_validate_node_class(state, task_meta, **options):
     node_id = task_meta.get('node_id')
     node_path = task_meta.get('node_path')
@@ -660,6 +775,9 @@ def detect_and_validate_node_class(state, task_meta, **options):
                    if a.get('prop_name') == 'id'
                    or a.get('prop_name') is not None and node.get(a['prop_name']) is not None]
 
+    if options.get('single_pass_validation'):
+        actions = _combine_property_validations(actions, node_class, node_id, node_path)
+
     return task_result(
         True, "Declared type on node {} is {}".format(abv_node(node_id, node_path), declared_node_type),
         actions
@@ -686,7 +804,8 @@ def validate_expected_node_class(state, task_meta, **options):
                    or a.get('prop_name') is not None and node.get(a['prop_name']) is not None
                    or a.get('prop_name') is None and a.get('run_non_core') is True]
 
-
+    if options.get('single_pass_validation'):
+        actions = _combine_property_validations(actions, ', '.join(node_classes), node_id, node_path)
 
     return task_result(
         True, "Queued property validations for class {} instance {}".format(
@@ -851,7 +970,7 @@ def validate_revocationlist_entries(state, task_meta, **options):
     for entry in revoked_assertions:
         if isinstance(entry, dict):
             try:
-                if not PrimitiveValueValidator(ValueTypes.IRI)(entry['id']):
+                if not PrimitiveValueValidator.for_type(ValueTypes.IRI)(entry['id']):
                     return task_result(False, "RevocationList {} has entry with id {} not in IRI format".format(
                         node_id, entry['id']
                     ))
@@ -861,7 +980,7 @@ def validate_revocationlist_entries(state, task_meta, **options):
                         node_id, abv(entry.get('uid'))
                     ))
         elif isinstance(entry, six.string_types):
-            if not PrimitiveValueValidator(ValueTypes.IRI)(entry):
+            if not PrimitiveValueValidator.for_type(ValueTypes.IRI)(entry):
                 return task_result(False, "RevocationList {} has entry with id {} not in IRI format".format(
                     node_id, entry
                 ))
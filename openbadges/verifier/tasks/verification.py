@@ -4,7 +4,7 @@ import six
 from ..actions.tasks import report_message
 from ..actions.validation_report import set_verified_recipient_profile
 from ..exceptions import TaskPrerequisitesError
-from ..state import get_node_by_id, get_node_by_path
+from ..state import get_node_by_id, get_node_by_path, graph_nodes
 from ..utils import identity_hash, list_of, MESSAGE_LEVEL_WARNING
 
 from .utils import abbreviate_value as abv, task_result
@@ -84,7 +84,7 @@ def _matches_hash(profile_identifier, id_hash, salt=''):
 def verify_recipient_against_trusted_profile(state, task_meta, **options):
     try:
         # Use the ID of the first Assertion found in current state
-        assertion_id = [n for n in state['graph'] if n.get('type') == 'Assertion'][0]['id']
+        assertion_id = [n for n in graph_nodes(state) if n.get('type') == 'Assertion'][0]['id']
 
         identity_node = get_node_by_path(state, [assertion_id, 'recipient'])
         profile_id = task_meta['node_id']
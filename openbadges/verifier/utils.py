@@ -1,10 +1,16 @@
 from future.standard_library import install_aliases
 install_aliases()
 
+from collections import OrderedDict
+from datetime import timedelta
+import functools
 import hashlib
 import json
+import six
 import string
 import sys
+import threading
+from timeit import default_timer
 try:
     from urlparse import urlparse
 except ImportError:
@@ -14,6 +20,8 @@ import requests
 import requests_cache
 from pyld.jsonld import JsonLdError
 
+from .metrics import record_http_response
+
 
 MESSAGE_LEVEL_ERROR = 'ERROR'
 MESSAGE_LEVEL_WARNING = 'WARNING'
@@ -22,14 +30,29 @@ MESSAGE_LEVELS = (MESSAGE_LEVEL_ERROR, MESSAGE_LEVEL_WARNING, MESSAGE_LEVEL_INFO
 
 
 class CachableDocumentLoader(object):
-    def __init__(self, use_cache=False, backend='memory', expire_after=300, session=None):
+    """
+    A pyld document loader over a requests session, by default a requests_cache CachedSession.
+    A cached session discards an expired response when it is looked up. Expired responses that are
+    not looked up again are swept from the cache at most once every sweep_interval seconds
+    (expire_after by default), rather than on every load. Either may be a number of seconds, a
+    timedelta or None; there is no sweep if the interval is None, as responses then never expire.
+    stats() counts cache hits, misses and the responses removed by sweeps.
+    """
+    def __init__(self, use_cache=False, backend='memory', expire_after=300, session=None, cache_name='cache',
+                 sweep_interval=None):
         self.use_cache = use_cache
-        self.contexts = set()
+        self.sweep_interval = _seconds(expire_after if sweep_interval is None else sweep_interval)
+        self._next_sweep = None
+        self._schedule_sweep()
+        self._expiry_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
 
         if session is not None:
             self.session = session
         elif self.use_cache:
-            self.session = requests_cache.CachedSession(backend=backend, expire_after=expire_after)
+            self.session = requests_cache.CachedSession(
+                cache_name=cache_name, backend=backend, expire_after=expire_after)
         else:
             self.session = requests.Session()
 
@@ -48,21 +71,15 @@ class CachableDocumentLoader(object):
 
             response = self.session.get(
                 url, headers={'Accept': 'application/ld+json, application/json'})
+            record_http_response(response)
 
             doc = {'contextUrl': None, 'documentUrl': url, 'document': response.text}
 
             if self.use_cache:
                 doc['from_cache'] = response.from_cache
-                self.session.remove_expired_responses()
-
-            # Save URL for Potential Extension contexts.
-            try:
-                data = json.loads(response.text)
-                context = data['@context']
-                if any([isinstance(el, dict) for el in list_of(context)]):
-                    self.contexts.update([url])
-            except Exception:
-                pass
+                self._count('hits' if response.from_cache else 'misses')
+                if self._next_sweep is not None and default_timer() >= self._next_sweep:
+                    self._remove_expired_responses()
 
             return doc
 
@@ -75,6 +92,159 @@ class CachableDocumentLoader(object):
                 code='loading document failed',
                 cause=cause)
 
+    def stats(self):
+        """
+        :return: dict of the numbers of cache hits, misses and evictions by sweeps since the loader was created
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, counter, number=1):
+        with self._stats_lock:
+            self._stats[counter] += number
+
+    def _schedule_sweep(self):
+        if self.sweep_interval is not None:
+            self._next_sweep = default_timer() + self.sweep_interval
+
+    def _remove_expired_responses(self):
+        # The loader may be shared by concurrent verifications. One thread sweeps at a time and the
+        # others skip the sweep, which only keeps the cache small.
+        if not self._expiry_lock.acquire(False):
+            return
+        try:
+            self._schedule_sweep()
+            responses = self.session.cache.responses
+            size = len(responses)
+            self.session.remove_expired_responses()
+            self._count('evictions', max(size - len(responses), 0))
+        except RuntimeError:
+            pass  # The memory cache changed size during the sweep; it will be swept on a later request.
+        finally:
+            self._expiry_lock.release()
+
+
+def _seconds(interval):
+    """
+    :param interval: number of seconds, timedelta or None
+    :return: float number of seconds, or None
+    """
+    if isinstance(interval, timedelta):
+        return interval.total_seconds()
+    return interval
+
+
+class ContextTracker(object):
+    """
+    Wraps a document loader for a single JSON-LD operation, and records the URLs of loaded
+    documents that define terms in their @context: potential extension contexts.
+    A new tracker is used for each operation, so concurrent verifications sharing a loader
+    do not see each other's contexts.
+    """
+    def __init__(self, document_loader):
+        self.document_loader = document_loader
+        self.contexts = set()
+
+    def __call__(self, url):
+        doc = self.document_loader(url)
+        try:
+            data = doc['document']
+            if not isinstance(data, dict):
+                data = json.loads(data)
+            if any([isinstance(el, dict) for el in list_of(data['@context'])]):
+                self.contexts.add(url)
+        except Exception:
+            pass
+        return doc
+
+
+class ExpiringCache(object):
+    """
+    Thread-safe mapping whose entries expire expire_after seconds after they are set, and whose
+    oldest entries are evicted beyond max_entries. A pickled cache, such as one passed to worker
+    processes by verify_many(), is unpickled empty.
+    """
+    def __init__(self, expire_after=300, max_entries=1000):
+        self.expire_after = expire_after
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key: (expiry time, value)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'expire_after': self.expire_after, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= default_timer():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (default_timer() + self.expire_after, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_loaders = {}
+_shared_loaders_lock = threading.Lock()
+
+
+def shared_document_loader(use_cache=True, backend='memory', expire_after=300, cache_name='cache'):
+    """
+    Returns the process-wide document loader for the given cache settings, creating it on first use.
+    Its session is reused by every verification with the same settings, so connections are kept
+    alive and cached responses are hit across calls to verify().
+    """
+    key = (True, backend, expire_after, cache_name) if use_cache else (False,)
+    with _shared_loaders_lock:
+        loader = _shared_loaders.get(key)
+        if loader is None:
+            loader = _shared_loaders[key] = CachableDocumentLoader(
+                use_cache=use_cache, backend=backend, expire_after=expire_after, cache_name=cache_name)
+    return loader
+
+
+def clear_shared_loaders(close=True):
+    """
+    Discards the shared document loaders and their sessions, so the next verification starts with
+    an empty cache. Pass close=False in a forked child, where the connections belong to the parent.
+    """
+    with _shared_loaders_lock:
+        if close:
+            for loader in _shared_loaders.values():
+                loader.session.close()
+        _shared_loaders.clear()
+
+
+def get_http_session(options):
+    """
+    Returns the session that tasks should use for HTTP requests under the given verification options.
+    An 'http_session' option takes precedence over the cache settings.
+    """
+    if options.get('http_session') is not None:
+        return options['http_session']
+    elif options.get('use_cache') and options.get('cache_backend'):
+        return shared_document_loader(
+            backend=options['cache_backend'], expire_after=options.get('cache_expire_after', 300),
+            cache_name=options.get('cache_name', 'cache')).session
+    return shared_document_loader(use_cache=False).session
+
 
 jsonld_use_cache = {'documentLoader': CachableDocumentLoader(use_cache=True)}
 jsonld_no_cache = {'documentLoader': CachableDocumentLoader(use_cache=False)}
@@ -104,3 +274,38 @@ def make_string_from_bytes(input_value):
     if isinstance(input_value, bytes):
         return input_value.decode()
     return input_value
+
+
+def memoize_strings(maxsize=1024, max_length=None):
+    """
+    Decorator caching the results of a function of one argument for the maxsize most recently used
+    string arguments, of at most max_length characters if given. Other arguments are passed to the
+    function uncached. The function must not depend on anything but its argument. The cache is cleared
+    with the decorated function's cache_clear().
+    """
+    def decorator(func):
+        results = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def memoized(value):
+            if not isinstance(value, six.string_types) or max_length is not None and len(value) > max_length:
+                return func(value)
+            with lock:
+                if value in results:
+                    result = results[value] = results.pop(value)  # Most recently used last
+                    return result
+            result = func(value)
+            with lock:
+                results[value] = result
+                if len(results) > maxsize:
+                    results.popitem(last=False)
+            return result
+
+        def cache_clear():
+            with lock:
+                results.clear()
+
+        memoized.cache_clear = cache_clear
+        return memoized
+    return decorator
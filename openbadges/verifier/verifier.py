@@ -1,20 +1,24 @@
 import json
+from multiprocessing.pool import ThreadPool
 from openbadges_bakery import unbake
-from pydux import create_store
-import traceback
 
+from .actions.batch import batch_actions
 from .actions.input import set_input_type, store_input
 from .actions.tasks import add_task, report_message, resolve_task, trigger_condition
-from .exceptions import SkipTask, TaskPrerequisitesError
-from .logger import logger
+from .contexts import BundledContextLoader
+from .limits import VerificationLimits
+from .metrics import measure_call, summarize_metrics
 from .openbadges_context import OPENBADGES_CONTEXT_V2_URI
-from .reducers import main_reducer
-from .state import (filter_active_tasks, filter_messages_for_report, format_message,
-                    INITIAL_STATE, MESSAGE_LEVEL_ERROR, MESSAGE_LEVEL_WARNING,)
+from .scheduler import TaskScheduler
+from .store import create_verification_store
+from .subgraphs import record_subgraphs, tag_actions
+from .state import (filter_messages_for_report, format_message, graph_nodes, task_is_error,
+                    MESSAGE_LEVEL_ERROR, MESSAGE_LEVEL_WARNING,)
 from . import tasks
-from .tasks.task_types import INTAKE_JSON, JSONLD_COMPACT_DATA, VALIDATE_EXTENSION_NODE
+from .tasks.task_types import INTAKE_JSON, IO_BOUND_TASKS, JSONLD_COMPACT_DATA, VALIDATE_EXTENSION_NODE
+from .tasks.utils import execute_task
 from .tasks.validation import OBClasses
-from .utils import list_of, CachableDocumentLoader, jsonld_use_cache
+from .utils import list_of, jsonld_use_cache, shared_document_loader
 
 
 
@@ -23,7 +27,20 @@ DEFAULT_OPTIONS = {
     'use_cache': True,
     'cache_backend': 'memory',
     'cache_expire_after': 300,
-    'jsonld_options': jsonld_use_cache
+    'cache_name': 'cache',  # Cache name (e.g. sqlite file path) for persistent cache backends
+    'jsonld_options': jsonld_use_cache,
+    'max_workers': 1,  # Run ready I/O-bound tasks (HTTP fetches, images, extensions) on a thread pool if > 1
+    'fast_store': False,  # Use a store that updates state in place instead of the pydux immutable store
+    'metrics': False,  # Record time and HTTP traffic per task, and add a 'metrics' section to the report
+    'metrics_callback': None,  # Called as metrics_callback(task_meta, metrics) after each task if 'metrics'
+    'deadline_seconds': None,  # Stop verification early once it has run this long (checked between tasks)
+    'max_tasks': None,  # Stop verification early rather than run more than this many tasks
+    'max_fetches': None,  # Stop verification early rather than run more than this many FETCH_HTTP_NODE tasks
+    'fail_fast': False,  # Stop running tasks after the first ERROR-level failure
+    'single_pass_validation': False,  # Check a node's properties in one task rather than a task per property
+    'subgraph_cache': None,  # A subgraphs.SubgraphCache, to reuse validated BadgeClass and Issuer subgraphs
+    'compaction_cache': None,  # A compaction.CompactionCache, to reuse JSON-LD compaction results of identical documents
+    'bundled_contexts': False  # Serve the bundled Open Badges and registered JSON-LD contexts from memory, not HTTP
 }
 
 
@@ -35,18 +52,62 @@ def _get_options(options):
         selected = DEFAULT_OPTIONS
 
     if selected['use_cache']:
-        doc_loader = CachableDocumentLoader(
-            use_cache=selected['use_cache'],
+        doc_loader = shared_document_loader(
             backend=selected['cache_backend'],
-            expire_after=selected['cache_expire_after']
+            expire_after=selected['cache_expire_after'],
+            cache_name=selected['cache_name']
         )
     else:
-        doc_loader = CachableDocumentLoader(use_cache=False)
+        doc_loader = shared_document_loader(use_cache=False)
 
+    if selected['bundled_contexts']:
+        doc_loader = BundledContextLoader(doc_loader)
     selected['jsonld_options'] = {'documentLoader': doc_loader}
     return selected
 
 
+def measure_task(task_func, task_meta, state, options=DEFAULT_OPTIONS):
+    """
+    Runs a task function with execute_task, measuring it if the 'metrics' option is set.
+    :return: tuple (result, metrics dict or None)
+    """
+    if not options.get('metrics'):
+        return execute_task(task_func, task_meta, state, options), None
+    return measure_call(execute_task, task_func, task_meta, state, options)
+
+
+def dispatch_task_result(task_meta, result, store, metrics=None, options=DEFAULT_OPTIONS):
+    """
+    Resolves a task with the result of its task function and dispatches the actions it returned.
+    :param task_meta: dict (single entry in tasks state)
+    :param result: tuple (success, message, actions)
+    :param store: pydux store
+    :param metrics: dict of task metrics from measure_task, or None
+    """
+    if metrics is not None and options.get('metrics_callback') is not None:
+        options['metrics_callback'](task_meta, metrics)
+
+    success, message, actions = result
+    subgraphs = task_meta.get('subgraphs')
+    actions_to_dispatch = [resolve_task(task_meta.get('task_id'), success=success, result=message, metrics=metrics)]
+    if success:
+        for trigger in list_of(task_meta.get('triggers_completion', [])):
+            actions_to_dispatch.append(trigger_condition(trigger, 'Completed by {}: {}'.format(
+                task_meta.get('task_id'), task_meta.get('name')
+            )))
+
+    # Make updates and queue up next tasks, in a single dispatch.
+    try:
+        for action in actions:
+            if not isinstance(action, dict):
+                raise TypeError("Task {} returned actions of an unreadable type. Task details: {}".format(
+                    task_meta.get('name'), json.dumps(task_meta)
+                ))
+            actions_to_dispatch.append(action)
+    finally:
+        store.dispatch(batch_actions(tag_actions(actions_to_dispatch, subgraphs)))
+
+
 def call_task(task_func, task_meta, store, options=DEFAULT_OPTIONS):
     """
     Calls and resolves a task function in response to a queued task. May result
@@ -56,39 +117,52 @@ def call_task(task_func, task_meta, store, options=DEFAULT_OPTIONS):
     :param store: pydux store
     :return:
     """
-    actions = []
-    try:
-        success, message, actions = task_func(store.get_state(), task_meta, **options)
-    except SkipTask:
-        raise NotImplemented("Implement SkipTask handling in call_task")
-    except TaskPrerequisitesError:
-        message = "Task could not run due to unmet prerequisites."
-        store.dispatch(resolve_task(task_meta.get('task_id'), success=False, result=message))
-    except Exception as e:
-        error_message = traceback.format_exception_only(type(e), e)
-        logger.error(traceback.format_exc())
-        message = "{} {}".format(e.__class__, error_message)
-        store.dispatch(resolve_task(task_meta.get('task_id'), success=False, result=message))
-    else:
-        store.dispatch(resolve_task(task_meta.get('task_id'), success=success, result=message))
-        if success:
-            for trigger in list_of(task_meta.get('triggers_completion', [])):
-                store.dispatch(trigger_condition(trigger, 'Completed by {}: {}'.format(
-                    task_meta.get('task_id'), task_meta.get('name')
-                )))
-
-    # Make updates and queue up next tasks.
-    for action in actions:
-        if not isinstance(action, dict):
-            raise TypeError("Task {} returned actions of an unreadable type. Task details: {}".format(
-                task_meta.get('name'), json.dumps(task_meta)
-            ))
-        store.dispatch(action)
+    result, metrics = measure_task(task_func, task_meta, store.get_state(), options)
+    dispatch_task_result(task_meta, result, store, metrics, options)
 
 
-def verification_store(badge_input, recipient_profile=None, store=None, options=DEFAULT_OPTIONS):
-    if store is None:
-        store = create_store(main_reducer, INITIAL_STATE)
+def call_tasks_concurrently(task_metas, store, pool, options=DEFAULT_OPTIONS):
+    """
+    Runs several independent tasks on a thread pool against the same state, then resolves them
+    and dispatches their actions in task order, regardless of which finished first.
+    :param task_metas: list of dicts (entries in tasks state)
+    :param store: pydux store
+    :param pool: multiprocessing.pool.ThreadPool
+    """
+    state = store.get_state()
+    results = pool.map(
+        lambda task_meta: measure_task(tasks.task_named(task_meta['name']), task_meta, state, options),
+        task_metas
+    )
+    for task_meta, (result, metrics) in zip(task_metas, results):
+        dispatch_task_result(task_meta, result, store, metrics, options)
+
+
+def has_new_errors(scheduler, task_metas, known_task_count):
+    """
+    Returns True if any of the tasks just run, or any task added since there were known_task_count
+    tasks, is an ERROR-level failure.
+    :param scheduler: TaskScheduler
+    :param task_metas: list of dicts (entries in tasks state, as they were before running)
+    :param known_task_count: int length of the tasks state before running them
+    """
+    tasks_to_check = []
+    for task_meta in task_metas:
+        try:
+            tasks_to_check.append(scheduler.get_task(task_meta['task_id']))
+        except KeyError:
+            pass  # Deleted by its own actions
+    tasks_to_check.extend(scheduler.get_state()['tasks'][known_task_count:])
+    return any(task_is_error(t) for t in tasks_to_check)
+
+
+def queue_input_tasks(store, badge_input, recipient_profile=None):
+    """
+    Stores verification input and queues the first tasks needed to process it.
+    :param store: pydux store
+    :param badge_input: str (url or json) or python file-like object (baked badge image)
+    :param recipient_profile: dict of a trusted Profile describing the entity assumed to be recipient
+    """
     try:
         if hasattr(badge_input, 'read') and hasattr(badge_input, 'seek'):
             badge_input.seek(0)
@@ -119,17 +193,65 @@ def verification_store(badge_input, recipient_profile=None, store=None, options=
             task['node_id'] = profile_id
         store.dispatch(task)
 
+
+def task_batches(store, scheduler, deferred_names=(), options=DEFAULT_OPTIONS):
+    """
+    Drives a verification: yields each list of tasks to run next, which the caller runs and resolves
+    before continuing. Stops at the verification limits, on a task left unresolved, or after an error
+    if 'fail_fast' is set, then records validated subgraphs if there is a 'subgraph_cache' option.
+    :param store: pydux store
+    :param scheduler: TaskScheduler wrapping the store
+    :param deferred_names: task names to hold back and run together, as in TaskScheduler.next_tasks
+    """
+    limits = VerificationLimits(options)
     last_task_id = 0
-    while len(filter_active_tasks(store.get_state())):
-        active_tasks = filter_active_tasks(store.get_state())
-        task_meta = active_tasks[0]
-        task_func = tasks.task_named(task_meta['name'])
+    next_tasks = scheduler.next_tasks(deferred_names)
+    while next_tasks:
+        limit = limits.limit_reached(next_tasks)
+        if limit is not None:
+            scheduler.dispatch(batch_actions(limits.stop_actions(scheduler.get_state(), limit)))
+            break
+
+        if len(next_tasks) == 1:
+            if next_tasks[0]['task_id'] == last_task_id:
+                break
+            last_task_id = next_tasks[0]['task_id']
 
-        if task_meta['task_id'] == last_task_id:
+        known_task_count = len(scheduler.get_state()['tasks'])
+        limits.count(next_tasks)
+        yield next_tasks
+
+        if options.get('fail_fast') and has_new_errors(scheduler, next_tasks, known_task_count):
             break
+        next_tasks = scheduler.next_tasks(deferred_names)
+
+    if options.get('subgraph_cache') is not None:
+        record_subgraphs(store.get_state(), options['subgraph_cache'])
+
 
-        last_task_id = task_meta['task_id']
-        call_task(task_func, task_meta, store, options)
+def verification_store(badge_input, recipient_profile=None, store=None, options=DEFAULT_OPTIONS):
+    if store is None:
+        store = create_verification_store(options)
+    queue_input_tasks(store, badge_input, recipient_profile)
+
+    scheduler = TaskScheduler(store)
+    pool = None
+    deferred_tasks = ()
+    if options.get('max_workers', 1) > 1:
+        pool = ThreadPool(options['max_workers'])
+        deferred_tasks = IO_BOUND_TASKS
+
+    try:
+        for next_tasks in task_batches(store, scheduler, deferred_tasks, options):
+            if len(next_tasks) > 1:
+                call_tasks_concurrently(next_tasks, scheduler, pool, options)
+            else:
+                task_meta = next_tasks[0]
+                call_task(tasks.task_named(task_meta['name']), task_meta, scheduler, options)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     return store
 
@@ -162,10 +284,12 @@ def generate_report(store, options=DEFAULT_OPTIONS):
     report['valid'] = is_valid
 
     ret = {
-        'graph': state['graph'],
+        'graph': graph_nodes(state),
         'input': processed_input,
         'report': report
     }
+    if options.get('metrics'):
+        ret['metrics'] = summarize_metrics(state['tasks'])
     return ret
 
 
@@ -184,7 +308,7 @@ def verify(badge_input, recipient_profile=None, **options):
 
 def extension_validation_store(extension_input, store=None, options=DEFAULT_OPTIONS):
     if store is None:
-        store = create_store(main_reducer, INITIAL_STATE)
+        store = create_verification_store(options)
 
     if not isinstance(extension_input, dict):
         raise ValueError
@@ -196,15 +320,12 @@ def extension_validation_store(extension_input, store=None, options=DEFAULT_OPTI
     compact_task = add_task(JSONLD_COMPACT_DATA, detectAndValidateClass=False, data=json.dumps(extension_input))
     store.dispatch(compact_task)
 
-    tasks_remaining = True
-    while tasks_remaining:
-        active_tasks = filter_active_tasks(store.get_state())
-        if len(active_tasks) < 1:
-            tasks_remaining = False
-            break
-        task_meta = active_tasks[0]
+    scheduler = TaskScheduler(store)
+    task_meta = scheduler.next_task()
+    while task_meta is not None:
         task_func = tasks.task_named(task_meta['name'])
-        call_task(task_func, task_meta, store, options)
+        call_task(task_func, task_meta, scheduler, options)
+        task_meta = scheduler.next_task()
 
 
     all_tasks = store.get_state()['tasks']
@@ -69,6 +69,7 @@ setup(
     ],
     extras_require={
         'server':  ["Flask==0.12.1", 'gunicorn==19.7.1'],
+        'async': ['aiohttp>=3.0'],
     },
     entry_points="""
         [console_scripts]
@@ -0,0 +1,23 @@
+import pytest
+
+from openbadges.verifier.contexts import reset_contexts
+from openbadges.verifier.utils import clear_shared_loaders
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_loaders():
+    """
+    Mocked responses differ between tests, so don't let one test's cached responses leak into the next.
+    """
+    clear_shared_loaders()
+    yield
+    clear_shared_loaders()
+
+
+@pytest.fixture(autouse=True)
+def fresh_bundled_contexts():
+    """
+    Don't let contexts one test registers be bundled in the next.
+    """
+    yield
+    reset_contexts()
@@ -6,11 +6,12 @@ import sys
 
 from openbadges.verifier.actions.graph import add_node
 from openbadges.verifier.actions.tasks import add_task
+from openbadges.verifier.contexts import BundledContextLoader
 from openbadges.verifier.extensions import GeoLocation, ExampleExtension, ApplyLink
 from openbadges.verifier.openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from openbadges.verifier.reducers import main_reducer
 from openbadges.verifier.reducers.graph import graph_reducer
-from openbadges.verifier.state import INITIAL_STATE
+from openbadges.verifier.state import graph_nodes, INITIAL_STATE
 from openbadges.verifier.tasks.extensions import validate_extension_node
 from openbadges.verifier.tasks.graph import _get_extension_actions
 from openbadges.verifier.tasks import task_named
@@ -106,7 +107,6 @@ class ExtensionNodeValidationTests(unittest.TestCase):
     def load_mocks(self):
         loader = CachableDocumentLoader(use_cache=True)
         loader.session.cache.remove_old_entries(datetime.datetime.utcnow())
-        loader.contexts = set()
         self.options = {'jsonld_options': {'documentLoader': loader}}
 
         set_up_context_mock()
@@ -117,6 +117,9 @@ class ExtensionNodeValidationTests(unittest.TestCase):
         responses.add(responses.GET, schema_url, status=200, json=ExampleExtension.validation_schema[schema_url])
         loader.session.get(schema_url)
 
+        self.intake_node()
+
+    def intake_node(self):
         self.state = INITIAL_STATE
         task = add_task(
             INTAKE_JSON, data=json.dumps(self.first_node), node_id=self.first_node['id'])
@@ -127,7 +130,6 @@ class ExtensionNodeValidationTests(unittest.TestCase):
         self.state = main_reducer(self.state, actions[0])  # ADD_NODE
         self.validation_task = actions[1]  # VALIDATE_EXTENSION_NODE
 
-
     @responses.activate
     def test_validate_extension_node_basic(self):
         self.load_mocks()
@@ -138,13 +140,24 @@ class ExtensionNodeValidationTests(unittest.TestCase):
         self.assertIn('validated on node', message)
         self.assertEqual(len(actions), 0)
 
+    @responses.activate
+    def test_validate_extension_node_with_bundled_documents(self):
+        loader = BundledContextLoader(CachableDocumentLoader(use_cache=False))
+        self.options = {'jsonld_options': {'documentLoader': loader}}
+        self.intake_node()
+
+        result, message, actions = validate_extension_node(self.state, self.validation_task, **self.options)
+        self.assertTrue(result, "The bundled context and schema of the extension are used")
+        self.assertIn('validated on node', message)
+        self.assertEqual(len(responses.calls), 0)
+
     @responses.activate
     def test_validate_extension_node_invalid(self):
         self.load_mocks()
         task_meta = self.validation_task
 
         # String value is required, we'll try a number
-        self.state['graph'][0]['extensions:exampleExtension']['schema:text'] = 1337
+        graph_nodes(self.state)[0]['extensions:exampleExtension']['schema:text'] = 1337
 
         result, message, actions = validate_extension_node(self.state, task_meta, **self.options)
         self.assertFalse(result, "An invalid expression of a rule in schema should fail")
@@ -161,7 +174,7 @@ class ExtensionNodeValidationTests(unittest.TestCase):
         responses.add(responses.GET, schema_url, status=200, json=ApplyLink.validation_schema[schema_url])
         self.options['jsonld_options']['documentLoader'].session.get(schema_url)
 
-        self.state['graph'][0]['extensions:exampleExtension']['type'].append('extensions:ApplyLink')
+        graph_nodes(self.state)[0]['extensions:exampleExtension']['type'].append('extensions:ApplyLink')
         task_meta = self.validation_task.copy()
         task_meta['context_urls'].append(ApplyLink.context_url)
         task_meta['types_to_test'].append('extensions:ApplyLink')
@@ -201,7 +214,6 @@ class ComplexExtensionNodeValdiationTests(unittest.TestCase):
 
         loader = CachableDocumentLoader(use_cache=True)
         loader.session.cache.remove_old_entries(datetime.datetime.utcnow())
-        loader.contexts = set()
         options = {'jsonld_options': {'documentLoader': loader}}
 
         set_up_context_mock()
@@ -227,7 +239,7 @@ class ComplexExtensionNodeValdiationTests(unittest.TestCase):
         self.assertIn('validated on node', message)
         self.assertEqual(len(actions), 0)
 
-        del state['graph'][0]['schema:location']['schema:geo']['schema:latitude']
+        del graph_nodes(state)[0]['schema:location']['schema:geo']['schema:latitude']
         result, message, actions = validate_extension_node(state, task_meta)
         self.assertFalse(result, "A required property not present should be detected by JSON-schema.")
 
@@ -1,16 +1,22 @@
 import json
+import pickle
+from pyld import jsonld
 import responses
 import unittest
 
 from openbadges.verifier.actions.action_types import ADD_NODE, STORE_ORIGINAL_RESOURCE
 from openbadges.verifier.actions.graph import add_node, patch_node, patch_node_reference
 from openbadges.verifier.actions.tasks import add_task
+from openbadges.verifier import contexts
+from openbadges.verifier.compaction import compact_natively, compact_openbadges_data, compaction_key, CompactionCache
 from openbadges.verifier.reducers.graph import graph_reducer
 from openbadges.verifier.state import get_node_by_id
+from openbadges.verifier.store import create_verification_store
 from openbadges.verifier.tasks.graph import fetch_http_node, jsonld_compact_data
 from openbadges.verifier.tasks import run_task
 from openbadges.verifier.tasks.task_types import (DETECT_AND_VALIDATE_NODE_CLASS, FETCH_HTTP_NODE, INTAKE_JSON,
                                          JSONLD_COMPACT_DATA)
+from openbadges.verifier.extensions import GeoLocation
 from openbadges.verifier.openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from openbadges.verifier.utils import MESSAGE_LEVEL_WARNING
 from openbadges.verifier.verifier import verify
@@ -69,8 +75,8 @@ class NodeStorageTests(unittest.TestCase):
         }
         state = graph_reducer([], add_node('http://example.com/node1', new_node))
         self.assertEqual(len(state), 1)
-        self.assertEqual(state[0]['id'], 'http://example.com/node1')
-        self.assertEqual(state[0]['key1'], 1)
+        self.assertEqual(list(state.values())[0]['id'], 'http://example.com/node1')
+        self.assertEqual(list(state.values())[0]['key1'], 1)
 
     def new_node_successfully_appends_to_state(self):
         new_node = {
@@ -79,6 +85,43 @@ class NodeStorageTests(unittest.TestCase):
         state = graph_reducer([{"id": "_:b9000"}], add_node('http://example.com/node1', new_node))
         self.assertEqual(len(state), 2)
 
+    def test_graph_indexed_by_node_id(self):
+        state = graph_reducer([], add_node('http://example.com/node1', {'key1': 1}))
+        state = graph_reducer(state, add_node('http://example.com/node2', {'key1': 2}))
+        previous_state = state
+        state = graph_reducer(state, patch_node('http://example.com/node1', {'key1': 3}))
+
+        self.assertEqual(get_node_by_id({'graph': state}, 'http://example.com/node1')['key1'], 3)
+        self.assertEqual(get_node_by_id({'graph': previous_state}, 'http://example.com/node1')['key1'], 1)
+        self.assertEqual(list(state.keys()), ['http://example.com/node2', 'http://example.com/node1'])
+        with self.assertRaises(IndexError):
+            get_node_by_id({'graph': state}, 'http://example.com/node3')
+
+    def test_earlier_graph_versions_unchanged(self):
+        first_state = graph_reducer([], add_node('http://example.com/node1', {'key1': 1}))
+        second_state = graph_reducer(first_state, patch_node('http://example.com/node1', {'key1': 2}))
+        third_state = graph_reducer(second_state, add_node('http://example.com/node2', {'key1': 3}))
+
+        self.assertEqual(first_state.values(), [{'id': 'http://example.com/node1', 'key1': 1}])
+        self.assertEqual(second_state.values(), [{'id': 'http://example.com/node1', 'key1': 2}])
+        self.assertEqual(third_state.keys(), ['http://example.com/node1', 'http://example.com/node2'])
+
+        branched_state = graph_reducer(first_state, patch_node('http://example.com/node1', {'key1': 4}))
+        self.assertEqual(get_node_by_id({'graph': branched_state}, 'http://example.com/node1')['key1'], 4)
+        self.assertEqual(get_node_by_id({'graph': third_state}, 'http://example.com/node1')['key1'], 2)
+        self.assertEqual(get_node_by_id({'graph': first_state}, 'http://example.com/node1')['key1'], 1)
+
+    def test_duplicate_node_ids_kept(self):
+        state = graph_reducer([], add_node('http://example.com/node1', {'key1': 1}))
+        state = graph_reducer(state, add_node('http://example.com/node1', {'key1': 2}))
+        self.assertEqual(len(state), 2)
+        self.assertEqual(get_node_by_id({'graph': state}, 'http://example.com/node1')['key1'], 1,
+                         "Lookups find the first node with an id")
+
+        state = graph_reducer(state, patch_node('http://example.com/node1', {'key1': 3}))
+        self.assertEqual([node['key1'] for node in state.values()], [2, 3])
+        self.assertEqual(get_node_by_id({'graph': state}, 'http://example.com/node1')['key1'], 2)
+
     def test_store_nested(self):
         new_node = {
             "key1": 1,
@@ -86,7 +129,7 @@ class NodeStorageTests(unittest.TestCase):
         }
         state = graph_reducer([], add_node('http://example.com/node1', new_node))
         self.assertEqual(len(state), 1)
-        first_node = [node for node in state if node['id'] == 'http://example.com/node1'][0]
+        first_node = [node for node in state.values() if node['id'] == 'http://example.com/node1'][0]
         self.assertEqual(first_node['key1'], 1)
         nested_node = first_node['nested1']
         self.assertEqual(nested_node['key2'], 2)
@@ -107,6 +150,15 @@ class NodeStorageTests(unittest.TestCase):
         """
         pass
 
+    def test_stores_allocate_blank_node_ids_independently(self):
+        first_store = create_verification_store()
+        second_store = create_verification_store({'fast_store': True})
+        for store in [first_store, second_store, first_store]:
+            store.dispatch(add_node(data={'name': 'Unnamed'}))
+
+        self.assertEqual(list(first_store.get_state()['graph'].keys()), ['_:b0', '_:b1'])
+        self.assertEqual(list(second_store.get_state()['graph'].keys()), ['_:b0'])
+
     def test_store_lists(self):
         new_node = {
             "key1": 1,
@@ -152,7 +204,7 @@ class NodeUpdateTests(unittest.TestCase):
         action = patch_node_reference([first_node['id'], 'badge'], new_id)
 
         graph_state = graph_reducer(graph_state, action)
-        self.assertEqual(graph_state[0]['badge'], new_id)
+        self.assertEqual(list(graph_state.values())[0]['badge'], new_id)
 
 
 
@@ -209,8 +261,112 @@ class JsonLdCompactTests(unittest.TestCase):
 
         state = graph_reducer([], actions[0])
         self.assertEqual(len(state), 1, "Node should be added to graph")
-        self.assertEqual(state[0]['name'], data['thing_we_call_you_by'])
-        self.assertEqual(state[0].get('id'), '_:b100', "Node should have a blank id assigned")
+        self.assertEqual(list(state.values())[0]['name'], data['thing_we_call_you_by'])
+        self.assertEqual(list(state.values())[0].get('id'), '_:b100', "Node should have a blank id assigned")
+
+    def test_compaction_cache(self):
+        extension_url = 'http://example.org/extension-context'
+        documents = {
+            OPENBADGES_CONTEXT_V2_URI: test_components['openbadges_context'],
+            extension_url: json.dumps({'@context': {'thing_we_call_you_by': 'http://schema.org/name'}})
+        }
+
+        def loader(url):
+            return {'contextUrl': None, 'documentUrl': url, 'document': documents[url]}
+
+        data = {'@context': [OPENBADGES_CONTEXT_V2_URI, extension_url], 'thing_we_call_you_by': 'Test Data'}
+        cache = CompactionCache(recheck_after=0)
+        result, contexts = compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        self.assertEqual(result['name'], 'Test Data')
+        self.assertEqual(set(contexts), {OPENBADGES_CONTEXT_V2_URI, extension_url})
+        self.assertEqual(len(cache), 1)
+
+        result['name'] = 'Changed by a task'
+        cached_result, cached_contexts = compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        self.assertEqual(cached_result, {'@context': OPENBADGES_CONTEXT_V2_URI, 'name': 'Test Data'},
+                         "A cached result is returned as a copy")
+        self.assertEqual(cached_contexts, contexts, "The contexts found computing a result are cached with it")
+
+        cache.set(compaction_key(data), dict(cache.get(compaction_key(data)), result={'name': 'Cached'}))
+        self.assertEqual(compact_openbadges_data(data, {'documentLoader': loader}, cache)[0]['name'], 'Cached')
+
+        documents[extension_url] = json.dumps({'@context': {'thing_we_call_you_by': 'http://schema.org/description'}})
+        result, contexts = compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        self.assertEqual(result['description'], 'Test Data', "A changed context invalidates the cached result")
+
+        task = add_task(JSONLD_COMPACT_DATA, data=json.dumps(data), node_id='http://example.com/1')
+        result, message, actions = jsonld_compact_data({}, task, jsonld_options={'documentLoader': loader},
+                                                       compaction_cache=cache)
+        self.assertEqual(actions[0]['data']['description'], 'Test Data')
+
+    def test_compaction_cache_rechecks_documents_periodically(self):
+        loaded = []
+
+        def loader(url):
+            loaded.append(url)
+            return {'contextUrl': None, 'documentUrl': url, 'document': test_components['openbadges_context']}
+
+        data = json.loads(test_components['2_0_basic_assertion'])
+        cache = CompactionCache(recheck_after=3600)
+        compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        loaded[:] = []
+        for _ in range(3):
+            compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        self.assertEqual(loaded, [], "Hits within recheck_after do not load documents")
+
+        cache.recheck_after = 0
+        compact_openbadges_data(data, {'documentLoader': loader}, cache)
+        self.assertEqual(loaded, [OPENBADGES_CONTEXT_V2_URI])
+        self.assertEqual(pickle.loads(pickle.dumps(cache)).recheck_after, 0)
+
+    def test_native_compaction(self):
+        context_document = test_components['openbadges_context']
+
+        def loader(url):
+            return {'contextUrl': None, 'documentUrl': url, 'document': context_document}
+
+        for name in ['2_0_basic_assertion', '2_0_basic_badgeclass', '2_0_basic_issuer']:
+            data = json.loads(test_components[name])
+            data.pop('verification', None)
+            data['verify'] = {'type': 'hosted'}  # Compacted to another term and type
+            data['revoked'] = False
+            result = compact_natively(data, loader)
+            self.assertIsNotNone(result)
+            self.assertEqual(json.dumps(result), json.dumps(jsonld.compact(
+                data, OPENBADGES_CONTEXT_V2_URI, options={'documentLoader': loader})))
+
+        data = json.loads(test_components['2_0_basic_assertion'])
+        for unsupported in [{'http://example.org/term': 'value'}, {'evidence': 1.5},
+                            {'revoked': True, 'revokedAssertions': []},
+                            {'@context': [OPENBADGES_CONTEXT_V2_URI, 'http://example.org/extension-context']}]:
+            self.assertIsNone(compact_natively(dict(data, **unsupported), loader))
+
+        context_document = json.dumps({'@context': {'name': 'http://example.org/name'}})
+        self.assertIsNone(compact_natively(data, loader), "Only the bundled context is used natively")
+
+    def test_bundled_context_processed_once(self):
+        documents = {
+            OPENBADGES_CONTEXT_V2_URI: test_components['openbadges_context'],
+            GeoLocation.context_url: json.dumps(GeoLocation.context_json)
+        }
+
+        def loader(url):
+            return {'contextUrl': None, 'documentUrl': url, 'document': documents[url]}
+
+        data = json.loads(test_components['2_0_basic_assertion'])
+        data['@context'] = [OPENBADGES_CONTEXT_V2_URI, GeoLocation.context_url]
+        data['evidence'] = {'type': ['Extension', 'extensions:GeoCoordinates'], 'geo': {'latitude': 44.5}}
+        options = {'documentLoader': loader}
+        first, second = [contexts.compact(data, OPENBADGES_CONTEXT_V2_URI, dict(options, activeCtx=True))
+                         for _ in range(2)]
+        self.assertIs(first['activeCtx'], second['activeCtx'])
+        self.assertEqual(first['compacted'], jsonld.compact(data, OPENBADGES_CONTEXT_V2_URI, dict(options)))
+        self.assertEqual(contexts.expand(data, dict(options)), jsonld.expand(data, dict(options)))
+
+        documents[GeoLocation.context_url] = json.dumps({'@context': {'geo': 'http://example.org/geo'}})
+        self.assertEqual(contexts.compact(data, OPENBADGES_CONTEXT_V2_URI, dict(options)),
+                         jsonld.compact(data, OPENBADGES_CONTEXT_V2_URI, dict(options)),
+                         "A context that differs from the bundled one is processed by pyld")
 
 
 class ObjectRedirectionTests(unittest.TestCase):
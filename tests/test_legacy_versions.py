@@ -12,7 +12,7 @@ from openbadges.verifier.reducers import main_reducer
 from openbadges.verifier.tasks.task_types import (DETECT_INPUT_TYPE, FETCH_HTTP_NODE, INTAKE_JSON, JSONLD_COMPACT_DATA,
                                                   UPGRADE_0_5_NODE, UPGRADE_1_0_NODE, UPGRADE_1_1_NODE)
 from openbadges.verifier.tasks import run_task, task_named
-from openbadges.verifier.state import INITIAL_STATE
+from openbadges.verifier.state import graph_nodes, INITIAL_STATE
 from openbadges.verifier.tasks.validation import OBClasses
 from openbadges.verifier.verifier import generate_report, verification_store, verify
 
@@ -80,20 +80,20 @@ class V1_1DetectionAndUpgradesTests(unittest.TestCase):
         self.assertEqual(len(actions), 0)
 
         # Test timestamp upgrading
-        state['graph'][0]['issuedOn'] = 1500423730
+        graph_nodes(state)[0]['issuedOn'] = 1500423730
         result, message, actions = task_named(UPGRADE_1_1_NODE)(state, task)
         self.assertTrue(result)
         self.assertEqual(len(actions), 1)
         self.assertEqual(actions[0]['data']['issuedOn'], '2017-07-19T00:22:10+00:00')
         self.assertEqual(len(actions[0]['data'].keys()), 1, "There is a patch made of one prop")
 
-        state['graph'][0]['issuedOn'] = '1500423730.5'
+        graph_nodes(state)[0]['issuedOn'] = '1500423730.5'
         result, message, actions = task_named(UPGRADE_1_1_NODE)(state, task)
         self.assertTrue(result)
         self.assertEqual(len(actions), 1)
         state = main_reducer(state, actions[0])
 
-        state['graph'][0]['issuedOn'] = '2016-05-15'
+        graph_nodes(state)[0]['issuedOn'] = '2016-05-15'
         result, message, actions = task_named(UPGRADE_1_1_NODE)(state, task)
         self.assertTrue(result)
         self.assertEqual(len(actions), 1)
@@ -115,7 +115,7 @@ class V1_1DetectionAndUpgradesTests(unittest.TestCase):
                 state = main_reducer(state, action)
 
         # Test criteria class upgrade
-        state['graph'][0]['alignment'] = {
+        graph_nodes(state)[0]['alignment'] = {
             'url': 'http://somewhere.overtherainbow.net/wayuphigh',
             'name': "Knowledge of children's songs"
         }
@@ -150,8 +150,8 @@ class V1_1DetectionAndUpgradesTests(unittest.TestCase):
                 state = main_reducer(state, action)
 
         # Test alignment object upgrades
-        self.assertEqual(len(state['graph'][0]['alignment']), 2)
-        self.assertEqual(state['graph'][0]['alignment'][0]['targetUrl'], data['alignment'][0]['url'])
+        self.assertEqual(len(graph_nodes(state)[0]['alignment']), 2)
+        self.assertEqual(graph_nodes(state)[0]['alignment'][0]['targetUrl'], data['alignment'][0]['url'])
 
     def test_upgrade_1_1_issuer(self):
         setUpContextCache()
@@ -170,7 +170,7 @@ class V1_1DetectionAndUpgradesTests(unittest.TestCase):
                 state = main_reducer(state, action)
 
         self.assertTrue(result)
-        self.assertEqual(state['graph'][0]['type'], OBClasses.Issuer)
+        self.assertEqual(graph_nodes(state)[0]['type'], OBClasses.Issuer)
 
     @responses.activate
     def test_upgrade_1_1_issuer_in_full_verify_with_redirect(self):
@@ -306,9 +306,9 @@ class V1_0DetectionAndUpgradesTests(unittest.TestCase):
         report = generate_report(store)
 
         self.assertTrue(report['report']['valid'])
-        assertion_node = state['graph'][0]
-        badgeclass_node = state['graph'][1]
-        issuer_node = state['graph'][2]
+        assertion_node = graph_nodes(state)[0]
+        badgeclass_node = graph_nodes(state)[1]
+        issuer_node = graph_nodes(state)[2]
 
         self.assertEqual(assertion_node['id'], assertion_data['verify']['url'])
         self.assertEqual(badgeclass_node['@context'], OPENBADGES_CONTEXT_V2_URI)
@@ -406,9 +406,9 @@ class V1_0DetectionAndUpgradeTests(unittest.TestCase):
         report = generate_report(store)
 
         self.assertTrue(report['report']['valid'])
-        assertion_node = state['graph'][0]
-        badgeclass_node = state['graph'][2]
-        issuer_node = state['graph'][1]
+        assertion_node = graph_nodes(state)[0]
+        badgeclass_node = graph_nodes(state)[2]
+        issuer_node = graph_nodes(state)[1]
 
         self.assertEqual(assertion_node['id'], assertion_url)
         self.assertEqual(badgeclass_node['@context'], OPENBADGES_CONTEXT_V2_URI)
@@ -1,10 +1,18 @@
+import datetime
 import json
 from pyld import jsonld
 from requests_cache import CachedSession
 import responses
 import unittest
 
-from openbadges.verifier.utils import CachableDocumentLoader
+from openbadges.verifier.contexts import (BundledContextLoader, bundled_document, compact, register_context,
+                                          reset_contexts, unregister_context)
+from openbadges.verifier.openbadges_context import (OPENBADGES_CONTEXT_V1_DICT, OPENBADGES_CONTEXT_V1_URI,
+                                                    OPENBADGES_CONTEXT_V2_DICT, OPENBADGES_CONTEXT_V2_REDIRECT_URI,
+                                                    OPENBADGES_CONTEXT_V2_URI)
+from openbadges.verifier.utils import (CachableDocumentLoader, clear_shared_loaders, ContextTracker,
+                                      get_http_session)
+from openbadges.verifier.verifier import _get_options
 
 try:
     from .testfiles.test_components import test_components
@@ -32,6 +40,56 @@ class DocumentLoaderTests(unittest.TestCase):
             first_remote_document.get('document'), second_remote_document.get('document'))
         self.assertEqual(first_remote_document.get('document'), data)
 
+    @responses.activate
+    def test_caching_loader_sweeps_expired_responses_periodically(self):
+        url = 'http://example.com/assertionmaybe'
+        responses.add(responses.GET, url, body=test_components['2_0_basic_assertion'], status=200)
+
+        loadurl = CachableDocumentLoader(use_cache=True, sweep_interval=3600)
+        sweeps = []
+        loadurl.session.remove_expired_responses = lambda: sweeps.append(True)
+        for _ in range(3):
+            loadurl(url)
+        self.assertEqual(sweeps, [], "No sweep before sweep_interval has passed")
+        self.assertEqual(loadurl.stats(), {'hits': 2, 'misses': 1, 'evictions': 0})
+
+        # Responses that expire immediately are swept on the next load once the interval has passed.
+        loadurl = CachableDocumentLoader(use_cache=True, expire_after=-1, sweep_interval=0)
+        loadurl(url)
+        self.assertEqual(len(loadurl.session.cache.responses), 0)
+        self.assertEqual(loadurl.stats(), {'hits': 0, 'misses': 1, 'evictions': 1})
+
+    @responses.activate
+    def test_sweep_interval_from_timedelta(self):
+        url = 'http://example.com/assertionmaybe'
+        responses.add(responses.GET, url, body=test_components['2_0_basic_assertion'], status=200)
+
+        loadurl = CachableDocumentLoader(use_cache=True, expire_after=datetime.timedelta(minutes=5))
+        self.assertEqual(loadurl.sweep_interval, 300)
+        loadurl(url)
+        self.assertTrue(loadurl(url).get('from_cache'))
+
+        loadurl = CachableDocumentLoader(use_cache=True, sweep_interval=datetime.timedelta(seconds=0))
+        loadurl(url)
+        self.assertEqual(loadurl.sweep_interval, 0)
+
+    @responses.activate
+    def test_no_sweep_without_expiry(self):
+        url = 'http://example.com/assertionmaybe'
+        responses.add(responses.GET, url, body=test_components['2_0_basic_assertion'], status=200)
+
+        self.assertIsNone(CachableDocumentLoader(use_cache=False, expire_after=None).sweep_interval)
+        loadurl = CachableDocumentLoader(use_cache=True, expire_after=None)
+        sweeps = []
+        loadurl.session.remove_expired_responses = lambda: sweeps.append(True)
+        loadurl(url)
+        self.assertTrue(loadurl(url).get('from_cache'))
+        self.assertEqual(sweeps, [])
+
+        options = _get_options({'cache_expire_after': None, 'cache_name': 'no-expiry'})
+        loader = options['jsonld_options']['documentLoader']
+        self.assertIsNone(loader.sweep_interval)
+
     @responses.activate
     def test_that_noncaching_loader_loads_url(self):
         url = 'http://example.com/assertionmaybe'
@@ -45,6 +103,49 @@ class DocumentLoaderTests(unittest.TestCase):
         self.assertEqual(document.get('from_cache', 'Uncached'), 'Uncached')
         self.assertEqual(document.get('document'), data)
 
+    @responses.activate
+    def test_bundled_context_loader(self):
+        loader = BundledContextLoader(CachableDocumentLoader(use_cache=False))
+        self.assertEqual(json.loads(loader(OPENBADGES_CONTEXT_V2_URI)['document']), OPENBADGES_CONTEXT_V2_DICT)
+        self.assertEqual(json.loads(loader(OPENBADGES_CONTEXT_V1_URI)['document']), OPENBADGES_CONTEXT_V1_DICT)
+        self.assertEqual(json.loads(loader(OPENBADGES_CONTEXT_V2_REDIRECT_URI)['document']),
+                         OPENBADGES_CONTEXT_V2_DICT)
+
+        url = 'http://example.org/registered-context'
+        context = {'@context': {'thing_we_call_you_by': 'http://schema.org/name'}}
+        responses.add(responses.GET, url, body=json.dumps({'@context': {}}))
+        self.assertEqual(json.loads(loader(url)['document']), {'@context': {}})
+        register_context(url, context)
+        self.assertEqual(json.loads(loader(url)['document']), context)
+        self.assertEqual(len(responses.calls), 1, "Only the unregistered context was fetched")
+
+        compacted = compact({'@context': url, 'thing_we_call_you_by': 'Test Data'}, OPENBADGES_CONTEXT_V2_URI,
+                            options={'documentLoader': loader})
+        self.assertEqual(compacted['name'], 'Test Data')
+
+        unregister_context(url)
+        self.assertEqual(json.loads(loader(url)['document']), {'@context': {}})
+        register_context(url, context)
+        reset_contexts()
+        self.assertIsNone(bundled_document(url))
+        self.assertIsNotNone(bundled_document(OPENBADGES_CONTEXT_V2_URI))
+
+    @responses.activate
+    def test_context_tracker_records_extension_contexts(self):
+        loader = CachableDocumentLoader(use_cache=False)
+        extension_url = 'http://example.org/extension-context'
+        plain_url = 'http://example.org/plain-context'
+        responses.add(responses.GET, extension_url, body=json.dumps({'@context': {'foo': 'http://example.org/foo'}}))
+        responses.add(responses.GET, plain_url, body=json.dumps({'@context': 'http://example.org/other'}))
+
+        first_tracker, second_tracker = ContextTracker(loader), ContextTracker(loader)
+        first_tracker(extension_url)
+        first_tracker(plain_url)
+        second_tracker(plain_url)
+
+        self.assertEqual(first_tracker.contexts, set([extension_url]))
+        self.assertEqual(second_tracker.contexts, set())
+
     @responses.activate
     def test_that_pyld_accepts_caching_loader_for_compaction(self):
         assertion_data = json.loads(test_components['2_0_basic_assertion'])
@@ -101,3 +202,33 @@ class DocumentLoaderTests(unittest.TestCase):
         # second compaction should have built from the cache
         self.assertEqual(first_compacted['verification']['type'],
                          second_compacted['verification']['type'])
+
+
+class SharedDocumentLoaderTests(unittest.TestCase):
+    def test_loader_shared_between_verifications(self):
+        first_options = _get_options({})
+        second_options = _get_options({'include_original_json': True})
+        loader = first_options['jsonld_options']['documentLoader']
+        self.assertIs(loader, second_options['jsonld_options']['documentLoader'])
+        self.assertIs(get_http_session(first_options), loader.session)
+
+        other_options = _get_options({'cache_expire_after': 60})
+        self.assertIsNot(other_options['jsonld_options']['documentLoader'], loader)
+
+        uncached_options = _get_options({'use_cache': False})
+        self.assertFalse(uncached_options['jsonld_options']['documentLoader'].use_cache)
+
+    @responses.activate
+    def test_cache_hits_across_verifications(self):
+        url = 'http://example.com/assertionmaybe'
+        responses.add(
+            responses.GET, url, body=test_components['2_0_basic_assertion'], status=200,
+            content_type='application/ld+json')
+
+        first_document = _get_options({})['jsonld_options']['documentLoader'](url)
+        second_document = _get_options({})['jsonld_options']['documentLoader'](url)
+        self.assertFalse(first_document.get('from_cache'))
+        self.assertTrue(second_document.get('from_cache'))
+
+        clear_shared_loaders()
+        self.assertFalse(_get_options({})['jsonld_options']['documentLoader'](url).get('from_cache'))
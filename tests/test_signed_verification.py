@@ -332,5 +332,5 @@ class GraphScrubbingTests(unittest.TestCase):
         new_graph = graph_reducer(graph, action)
 
         self.assertEqual(len(new_graph), 4)
-        rev_list = [n for n in new_graph if n['id'] == revocation_list['id']][0]
+        rev_list = [n for n in new_graph.values() if n['id'] == revocation_list['id']][0]
         self.assertEqual(rev_list['revokedAssertions'], [])
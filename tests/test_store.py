@@ -4,7 +4,14 @@ import unittest
 from pydux import create_store
 
 from openbadges.verifier import verify
+from openbadges.verifier.actions.batch import batch_actions
+from openbadges.verifier.actions.graph import add_node, patch_node
+from openbadges.verifier.actions.input import store_input
+from openbadges.verifier.actions.tasks import add_task, report_message, resolve_task, trigger_condition
 from openbadges.verifier.reducers import main_reducer
+from openbadges.verifier.reducers.tasks import task_reducer
+from openbadges.verifier.scheduler import TaskScheduler
+from openbadges.verifier.store import FastStore
 from openbadges.verifier.state import (filter_active_tasks, INITIAL_STATE, get_node_by_id,
                               get_node_by_path,)
 
@@ -22,6 +29,63 @@ class InitializationTests(unittest.TestCase):
         self.assertEqual(store.get_state(), INITIAL_STATE)
 
 
+class FastStoreTests(unittest.TestCase):
+    def test_fast_store_matches_pydux_store(self):
+        actions = [
+            store_input('http://example.org/assertion'),
+            add_task('DETECT_INPUT_TYPE'),
+            add_node('http://example.org/assertion', {'type': 'Assertion'}),
+            add_node('http://example.org/badgeclass', {'type': 'BadgeClass'}),
+            patch_node('http://example.org/assertion', {'badge': 'http://example.org/badgeclass'}),
+            resolve_task(1, success=True),
+            report_message('TEST MESSAGE'),
+        ]
+        store = create_store(main_reducer, INITIAL_STATE)
+        fast_store = FastStore(INITIAL_STATE)
+        for action in actions:
+            store.dispatch(action)
+            fast_store.dispatch(action)
+
+        state, fast_state = store.get_state(), fast_store.get_state()
+        for key in ('input', 'graph', 'tasks', 'report'):
+            self.assertEqual(fast_state[key], state[key])
+        self.assertEqual(list(fast_state['graph'].keys()), list(state['graph'].keys()))
+        self.assertEqual(len(INITIAL_STATE['graph']), 0, "Initial state is not modified")
+
+    def test_batch_matches_separate_dispatches(self):
+        actions = [
+            store_input('http://example.org/assertion'),
+            add_task('DETECT_INPUT_TYPE'),
+            add_node('http://example.org/assertion', {'type': 'Assertion'}),
+            patch_node('http://example.org/assertion', {'badge': 'http://example.org/badgeclass'}),
+            add_task('VALIDATE_PROPERTY', node_id='http://example.org/assertion', prop_name='badge'),
+            add_task('VALIDATE_PROPERTY', node_id='http://example.org/assertion', prop_name='badge'),
+            resolve_task(1, success=True),
+        ]
+        store = create_store(main_reducer, INITIAL_STATE)
+        for action in actions:
+            store.dispatch(action)
+        batch_store = create_store(main_reducer, INITIAL_STATE)
+        batch_store.dispatch(batch_actions(actions[:2]))
+        batch_store.dispatch(batch_actions([batch_actions(actions[2:4])] + actions[4:]))
+        fast_store = FastStore(INITIAL_STATE)
+        fast_store.dispatch(batch_actions(actions))
+
+        for key in ('input', 'graph', 'tasks', 'report'):
+            self.assertEqual(batch_store.get_state()[key], store.get_state()[key])
+            self.assertEqual(fast_store.get_state()[key], store.get_state()[key])
+        self.assertEqual(len(store.get_state()['tasks']), 2)
+
+    def test_fast_store_notifies_listeners(self):
+        fast_store = FastStore()
+        calls = []
+        unsubscribe = fast_store.subscribe(lambda: calls.append(len(fast_store.get_state()['tasks'])))
+        fast_store.dispatch(add_task('DETECT_INPUT_TYPE'))
+        unsubscribe()
+        fast_store.dispatch(add_task('INTAKE_JSON'))
+        self.assertEqual(calls, [1])
+
+
 class TaskFilterTests(unittest.TestCase):
     def test_active_filter(self):
         tasks = [
@@ -49,6 +113,129 @@ class TaskFilterTests(unittest.TestCase):
         self.assertEqual(len(active_tasks), 1, "Task with an incomplete prereq should not be active")
 
 
+class TaskSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TaskScheduler(create_store(main_reducer, INITIAL_STATE))
+
+    def _active_task_ids(self):
+        return [t['task_id'] for t in filter_active_tasks(self.scheduler.get_state())]
+
+    def test_next_task_follows_task_order(self):
+        self.assertIsNone(self.scheduler.next_task())
+
+        self.scheduler.dispatch(add_task('DETECT_INPUT_TYPE'))
+        self.scheduler.dispatch(add_task('INTAKE_JSON'))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 1)
+
+        self.scheduler.dispatch(resolve_task(1))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 2)
+        self.scheduler.dispatch(resolve_task(2))
+        self.assertIsNone(self.scheduler.next_task())
+
+    def test_prerequisites_by_name_and_task_key(self):
+        self.scheduler.dispatch(add_task('VERIFY_JWS', prerequisites='SIGNING_KEY_FETCHED'))
+        self.scheduler.dispatch(add_task('UPGRADE_1_1_NODE', prerequisites=['compact_key']))
+        self.assertIsNone(self.scheduler.next_task(), "Tasks with unknown prerequisites are not ready")
+
+        self.scheduler.dispatch(add_task('JSONLD_COMPACT_DATA', task_key='compact_key'))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 3)
+
+        self.scheduler.dispatch(resolve_task(3))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 2)
+
+        self.scheduler.dispatch(trigger_condition('SIGNING_KEY_FETCHED'))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 1)
+        self.assertEqual(self._active_task_ids(), [1, 2])
+
+    def test_prerequisite_can_become_unmet_again(self):
+        self.scheduler.dispatch(add_task('ISSUER_PROPERTY_DEPENDENCIES'))
+        self.scheduler.dispatch(add_task(
+            'ASSERTION_VERIFICATION_DEPENDENCIES', prerequisites='ISSUER_PROPERTY_DEPENDENCIES'))
+        self.scheduler.dispatch(resolve_task(1))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 2)
+
+        self.scheduler.dispatch(add_task('ISSUER_PROPERTY_DEPENDENCIES'))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 3)
+        self.assertEqual(self._active_task_ids(), [3])
+
+        self.scheduler.dispatch(resolve_task(3))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 2)
+
+    def test_batched_actions(self):
+        self.scheduler.dispatch(add_task('ISSUER_PROPERTY_DEPENDENCIES'))
+        self.scheduler.dispatch(batch_actions([
+            add_task('ASSERTION_VERIFICATION_DEPENDENCIES', prerequisites='ISSUER_PROPERTY_DEPENDENCIES'),
+            resolve_task(1),
+            add_task('INTAKE_JSON'),
+            resolve_task(3),
+        ]))
+        self.assertEqual(self.scheduler.next_task()['task_id'], 2)
+        self.assertEqual(self._active_task_ids(), [2])
+
+    def test_next_tasks_defers_named_tasks(self):
+        deferred = ('FETCH_HTTP_NODE', 'IMAGE_VALIDATION')
+        self.scheduler.dispatch(add_task('FETCH_HTTP_NODE', url='http://example.org/1'))
+        self.scheduler.dispatch(add_task('INTAKE_JSON'))
+        self.scheduler.dispatch(add_task('IMAGE_VALIDATION', node_id='_:b0', prop_name='image'))
+        self.scheduler.dispatch(add_task('FETCH_HTTP_NODE', url='http://example.org/2'))
+        self.assertEqual([t['task_id'] for t in self.scheduler.next_tasks(deferred)], [2])
+
+        self.scheduler.dispatch(resolve_task(2))
+        self.assertEqual([t['task_id'] for t in self.scheduler.next_tasks(deferred)], [1, 3, 4])
+        self.assertEqual([t['task_id'] for t in self.scheduler.next_tasks()], [1])
+
+        for task_id in (1, 3, 4):
+            self.scheduler.dispatch(resolve_task(task_id))
+        self.assertEqual(self.scheduler.next_tasks(deferred), [])
+        self.assertFalse(any(self.scheduler._ready.values()), "Resolved tasks are dropped from the ready queues")
+
+
+class TaskReducerTests(unittest.TestCase):
+    def test_duplicate_tasks_not_added(self):
+        state = task_reducer([], add_task('VALIDATE_PROPERTY', node_id='_:b0', prop_name='name'))
+        state = task_reducer(state, add_task('VALIDATE_EXPECTED_NODE_CLASS', node_path=['_:b0', 'badge']))
+        state = task_reducer(state, add_task('FETCH_HTTP_NODE', url='http://example.org/1'))
+        self.assertEqual(len(state), 3)
+
+        for action in [add_task('VALIDATE_RDF_TYPE_PROPERTY', node_id='_:b0', prop_name='name'),
+                       add_task('VALIDATE_EXPECTED_NODE_CLASS', node_path=['_:b0', 'badge']),
+                       add_task('FETCH_HTTP_NODE', url='http://example.org/1')]:
+            self.assertEqual(len(task_reducer(state, action)), 3)
+
+        for action in [add_task('VALIDATE_PROPERTY', node_id='_:b0', prop_name='description'),
+                       add_task('VALIDATE_EXPECTED_NODE_CLASS', node_path=['_:b0', 'issuer']),
+                       add_task('FETCH_HTTP_NODE', url='http://example.org/2')]:
+            self.assertEqual(len(task_reducer(state, action)), 4)
+
+    def test_earlier_versions_unchanged_by_appends(self):
+        first_state = task_reducer([], add_task('DETECT_INPUT_TYPE'))
+        second_state = task_reducer(first_state, add_task('INTAKE_JSON'))
+        third_state = task_reducer(second_state, resolve_task(2, success=True))
+
+        self.assertEqual([t['task_id'] for t in first_state], [1])
+        self.assertEqual(len(second_state), 2)
+        self.assertTrue(third_state[1]['complete'])
+
+        branched_state = task_reducer(first_state, report_message('A MESSAGE'))
+        self.assertEqual([t['name'] for t in branched_state], ['DETECT_INPUT_TYPE', 'REPORT_MESSAGE'])
+        self.assertEqual([t['name'] for t in third_state], ['DETECT_INPUT_TYPE', 'INTAKE_JSON'])
+
+    def test_earlier_versions_unchanged_by_resolutions(self):
+        first_state = task_reducer([], add_task('DETECT_INPUT_TYPE'))
+        second_state = task_reducer(first_state, resolve_task(1, success=True, result='Resolved'))
+        third_state = task_reducer(second_state, resolve_task(1, success=False, result='Resolved again'))
+
+        self.assertFalse(first_state[0]['complete'])
+        self.assertFalse(first_state.get_task(1)['complete'])
+        self.assertEqual(list(second_state)[0]['result'], 'Resolved')
+        self.assertEqual(third_state[0]['result'], 'Resolved again')
+
+        branched_state = task_reducer(first_state, resolve_task(1, success=False, result='Branched'))
+        self.assertEqual(branched_state[0]['result'], 'Branched')
+        self.assertEqual(third_state[0]['result'], 'Resolved again')
+        self.assertFalse(first_state[0]['complete'])
+
+
 class FindNodeByPathTests(unittest.TestCase):
     def test_find_node_with_single_length_path(self):
         state = {
@@ -5,8 +5,9 @@ from pydux import create_store
 from openbadges.verifier.reducers import main_reducer
 from openbadges.verifier.actions.tasks import add_task, resolve_task
 from openbadges.verifier.reducers.tasks import _new_state_with_updated_item
-from openbadges.verifier.tasks.utils import abbreviate_value
+from openbadges.verifier.tasks.utils import abbreviate_value, is_data_uri, is_iri, is_url
 from openbadges.verifier.state import INITIAL_STATE, filter_active_tasks
+from openbadges.verifier.utils import memoize_strings
 
 
 class TaskActionTests(unittest.TestCase):
@@ -61,3 +62,52 @@ class TaskUtilsTests(unittest.TestCase):
         self.assertEqual(abbreviate_value(['interesting']), 'interesting')
         self.assertEqual(abbreviate_value(['interesting', 1]), 'interesting, 1')
         self.assertEqual(abbreviate_value([{'a': 'b'}, 'interesting']), "{'a': 'b'}, interesting")
+
+    def test_memoize_strings(self):
+        calls = []
+
+        @memoize_strings(maxsize=2)
+        def length(value):
+            calls.append(value)
+            return len(value)
+
+        self.assertEqual([length('a'), length('bb'), length('a')], [1, 2, 1])
+        self.assertEqual(calls, ['a', 'bb'])
+
+        length('ccc')  # Evicts 'bb', the least recently used
+        length('bb')
+        length('a')
+        self.assertEqual(calls, ['a', 'bb', 'ccc', 'bb', 'a'])
+
+        self.assertEqual(length(['x', 'y']), 2)
+        self.assertEqual(length(['x', 'y']), 2)
+        self.assertEqual(calls[-2:], [['x', 'y'], ['x', 'y']], "Non-string arguments are not cached")
+
+        length.cache_clear()
+        length('bb')
+        self.assertEqual(calls[-1], 'bb')
+
+        @memoize_strings(max_length=2)
+        def short_length(value):
+            calls.append(value)
+            return len(value)
+
+        short_length('ccc')
+        short_length('ccc')
+        self.assertEqual(calls[-2:], ['ccc', 'ccc'], "Strings longer than max_length are not cached")
+
+    def test_id_classification(self):
+        for value in ['http://example.org/1', 'HTTPS://example.org/a?b=c#d']:
+            self.assertTrue(is_url(value) and is_iri(value) and not is_data_uri(value))
+        urn = 'urn:uuid:2f900c7c-f5d5-4a2d-9dc2-8b3e7e7d5e9c'
+        for value in ['_:b0', urn, urn.upper()]:
+            self.assertTrue(is_iri(value) and not is_url(value))
+        for value in ['', ' http://example.org', 'http://exa mple.org', 'httpx://example.org', 'ftp://example.org', 'urn:uuid:1']:
+            self.assertFalse(is_url(value) or is_iri(value))
+        for value in [None, 1, ['http://example.org']]:
+            self.assertFalse(is_url(value) or is_data_uri(value))
+
+        long_data_uri = 'data:image/png;base64,' + 'A' * 100000
+        self.assertTrue(is_data_uri(long_data_uri))
+        self.assertTrue(is_data_uri('DATA:,x'))
+        self.assertFalse(is_data_uri('data:x') or is_url(long_data_uri) or is_iri(long_data_uri))
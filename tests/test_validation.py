@@ -1,13 +1,16 @@
 # coding=utf-8
 from datetime import datetime, timedelta
 import json
+import os
 from pyld import jsonld
 from pytz import utc
 from pydux import create_store
 import responses
+import subprocess
+import sys
 import unittest
 
-from openbadges.verifier.actions.action_types import ADD_TASK, PATCH_NODE
+from openbadges.verifier.actions.action_types import ADD_TASK, PATCH_NODE, RESOLVE_TASK
 from openbadges.verifier.actions.graph import add_node, patch_node
 from openbadges.verifier.actions.tasks import add_task
 from openbadges.verifier.openbadges_context import OPENBADGES_CONTEXT_V2_DICT
@@ -16,12 +19,15 @@ from openbadges.verifier.state import filter_active_tasks, INITIAL_STATE
 from openbadges.verifier.tasks import task_named, run_task
 from openbadges.verifier.tasks.validation import (_get_validation_actions, assertion_timestamp_checks,
                                          criteria_property_dependencies, detect_and_validate_node_class,
-                                         OBClasses, PrimitiveValueValidator, validate_property, ValueTypes,)
+                                         get_validation_plan, OBClasses, PrimitiveValueValidator,
+                                         validate_expected_node_class, validate_node_properties, validate_property,
+                                         ValueTypes,)
 from openbadges.verifier.tasks.verification import (_default_verification_policy, hosted_id_in_verification_scope,)
 from openbadges.verifier.tasks.task_types import (ASSERTION_TIMESTAMP_CHECKS, CRITERIA_PROPERTY_DEPENDENCIES,
                                          DETECT_AND_VALIDATE_NODE_CLASS, HOSTED_ID_IN_VERIFICATION_SCOPE,
                                          IDENTITY_OBJECT_PROPERTY_DEPENDENCIES, ISSUER_PROPERTY_DEPENDENCIES,
-                                         VALIDATE_RDF_TYPE_PROPERTY, VALIDATE_PROPERTY, VALIDATE_EXPECTED_NODE_CLASS)
+                                         VALIDATE_NODE_PROPERTIES, VALIDATE_RDF_TYPE_PROPERTY, VALIDATE_PROPERTY,
+                                         VALIDATE_EXPECTED_NODE_CLASS)
 from openbadges.verifier.utils import MESSAGE_LEVEL_WARNING
 from openbadges.verifier.verifier import call_task, verify
 
@@ -127,6 +133,33 @@ class PropertyValidationTests(unittest.TestCase):
         for value in bad_values:
             self.assertFalse(validator(value), "{} should fail origin validation but passed".format(value))
 
+    def test_shared_validators(self):
+        validator = PrimitiveValueValidator.for_type(ValueTypes.DATETIME)
+        self.assertIs(PrimitiveValueValidator.for_type(ValueTypes.DATETIME), validator)
+        self.assertEqual(validator.value_type, ValueTypes.DATETIME)
+
+        self.assertIsNone(validator.validate_many([]))
+        self.assertIsNone(validator.validate_many(['2017-02-10T12:00:00Z', '2017-02-10T12:00:00+05:00']))
+        self.assertEqual(validator.validate_many(['2017-02-10T12:00:00Z', '2017-02-10T12:00:00']), 1)
+
+        tags = PrimitiveValueValidator.for_type(ValueTypes.TEXT)
+        self.assertIsNone(tags.validate_many(['important', 'learning']))
+        self.assertEqual(tags.validate_many([42, 'important', None]), 0)
+
+        with self.assertRaises(KeyError):
+            PrimitiveValueValidator.for_type('NOT_A_TYPE')
+
+    def test_language_registry_loaded_on_first_use(self):
+        check = "import sys; import openbadges.verifier; sys.exit('language_tags' in sys.modules)"
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.call([sys.executable, '-c', check], cwd=package_dir), 0)
+
+        validator = PrimitiveValueValidator.for_type(ValueTypes.LANGUAGE)
+        for _ in range(2):
+            self.assertTrue(validator('en-US'))
+            self.assertFalse(validator('en-US-not-a-real-tag-at-all'))
+            self.assertFalse(validator(5))
+
 
 class IriPropertyValidationTests(unittest.TestCase):
     def test_validate_compacted_iri_value(self):
@@ -1106,6 +1139,60 @@ class ClassValidationTaskTests(unittest.TestCase):
         print(results)
         self.assertTrue(all(i[0] for i in results))
 
+    def test_validation_plan_compiled_once(self):
+        plan = get_validation_plan(OBClasses.Assertion)
+        self.assertIs(get_validation_plan(OBClasses.Assertion), plan)
+
+        first_actions = _get_validation_actions(OBClasses.Assertion, 'http://example.com/1')
+        second_actions = _get_validation_actions(OBClasses.Assertion, node_path=['http://example.com/1', 'badge'])
+        self.assertEqual(len(first_actions), len(plan))
+        self.assertTrue(all(a['node_id'] == 'http://example.com/1' for a in first_actions))
+        self.assertTrue(all(a['node_path'] == ['http://example.com/1', 'badge'] for a in second_actions))
+        self.assertTrue(all('node_id' not in a and 'node_path' not in a for a in plan))
+
+        task_keys = [a['task_key'] for a in first_actions + second_actions]
+        self.assertEqual(task_keys.count('ASN_FLATTEN_BC'), 2)
+        self.assertEqual(len(set(task_keys)), len(task_keys) - 1, "Other task keys are generated per action")
+
+
+class SinglePassValidationTests(unittest.TestCase):
+    def test_properties_validated_in_one_task(self):
+        node = {
+            'id': 'http://example.com/badgeclass',
+            'type': 'BadgeClass',
+            'name': 'Test Badge',
+            'description': 42,
+            'image': 'http://example.com/badgeimage',
+            'criteria': 'http://example.com/criteria',
+            'issuer': 'http://example.com/issuer',
+            'tags': ['important', 'learning']
+        }
+        state = {'graph': [node], 'tasks': []}
+        task = add_task(VALIDATE_EXPECTED_NODE_CLASS, node_id=node['id'], expected_class=OBClasses.BadgeClass)
+
+        separate_actions = validate_expected_node_class(state, task)[2]
+        combined_actions = validate_expected_node_class(state, task, single_pass_validation=True)[2]
+        combined_task = [a for a in combined_actions if a['name'] == VALIDATE_NODE_PROPERTIES][0]
+        separate_properties = [a for a in combined_actions if a['name'] == VALIDATE_PROPERTY]
+        self.assertEqual([a['prop_name'] for a in separate_properties], ['issuer'], "Waits for its prerequisites")
+        self.assertEqual(len(combined_actions) + len(combined_task['properties']) - 1, len(separate_actions))
+
+        state = main_reducer(state, combined_task)
+        combined_task, property_tasks = state['tasks'][0], state['tasks'][1:]
+        self.assertEqual(property_tasks, combined_task['properties'])
+        self.assertTrue(all(t['name'] == VALIDATE_PROPERTY and not t['complete'] for t in property_tasks))
+        self.assertEqual(filter_active_tasks(state), [combined_task], "Properties wait for the combined task")
+
+        success, message, actions = validate_node_properties(state, combined_task)
+        self.assertTrue(success)
+        property_results = [a for a in actions if a['type'] == RESOLVE_TASK]
+        self.assertEqual([a['task_id'] for a in property_results], [t['task_id'] for t in property_tasks])
+        for property_task, result in zip(property_tasks, property_results):
+            expected = validate_property(state, property_task)
+            self.assertEqual((result['success'], result['result']), expected[:2])
+        description_task = [t for t in property_tasks if t['prop_name'] == 'description'][0]
+        self.assertFalse([a for a in property_results if a['task_id'] == description_task['task_id']][0]['success'])
+
 
 class RdfTypeValidationTests(unittest.TestCase):
     @responses.activate
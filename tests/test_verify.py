@@ -1,17 +1,24 @@
+import json
 import os
 import responses
+import threading
 import unittest
 
 from pydux import create_store
 
 from openbadges.verifier.actions.input import store_original_resource
 from openbadges.verifier.actions.tasks import add_task, report_message
+from openbadges.verifier.openbadges_context import OPENBADGES_CONTEXT_V2_URI
 from openbadges.verifier.reducers import main_reducer
 from openbadges.verifier.state import INITIAL_STATE
+from openbadges.verifier.subgraphs import SubgraphCache
 from openbadges.verifier.tasks import task_named
 from openbadges.verifier.tasks.task_types import VALIDATE_PROPERTY
 from openbadges.verifier.tasks.validation import ValueTypes
-from openbadges.verifier.verifier import call_task, generate_report, verify
+from openbadges.verifier.utils import clear_shared_loaders
+from openbadges.verifier.verifier import _get_options, call_task, generate_report, verification_store, verify
+from openbadges.verifier import verify_many
+from openbadges.verifier.batch import _shared_cache_options, sqlite_cache_available
 
 from openbadges_bakery import bake
 
@@ -20,7 +27,7 @@ try:
 except (ImportError, SystemError):
     from .testfiles.test_components import test_components
 
-from tests.utils import set_up_image_mock
+from tests.utils import set_up_badge_mocks, set_up_image_mock
 
 
 class InitializationTests(unittest.TestCase):
@@ -62,6 +69,10 @@ class InitializationTests(unittest.TestCase):
         self.assertEqual(
             len(results['report']['messages']), 0, "There should be no failing tasks.")
 
+        fast_store_results = verify(url, fast_store=True)
+        self.assertEqual(fast_store_results['report'], results['report'])
+        self.assertEqual(fast_store_results['graph'], results['graph'])
+
     @responses.activate
     def test_verify_of_baked_image(self):
         url = 'https://example.org/beths-robotics-badge.json'
@@ -106,6 +117,81 @@ class InitializationTests(unittest.TestCase):
         self.assertTrue(another_result['report']['valid'])
         self.assertEqual(another_result['report']['validationSubject'], results['report']['validationSubject'])
 
+    @responses.activate
+    def test_verify_with_concurrent_io_tasks(self):
+        url = 'https://example.org/beths-robotics-badge.json'
+        responses.add(
+            responses.GET, url, body=test_components['2_0_basic_assertion'], status=200,
+            content_type='application/ld+json'
+        )
+        set_up_image_mock('https://example.org/beths-robot-badge.png')
+        responses.add(
+            responses.GET, 'https://w3id.org/openbadges/v2',
+            body=test_components['openbadges_context'], status=200,
+            content_type='application/ld+json'
+        )
+        responses.add(
+            responses.GET, 'https://example.org/robotics-badge.json',
+            body=test_components['2_0_basic_badgeclass'], status=200,
+            content_type='application/ld+json'
+        )
+        set_up_image_mock(u'https://example.org/robotics-badge.png')
+        responses.add(
+            responses.GET, 'https://example.org/organization.json',
+            body=test_components['2_0_basic_issuer'], status=200,
+            content_type='application/ld+json'
+        )
+
+        sequential_results = verify(url)
+        concurrent_results = verify(url, max_workers=4)
+        self.assertTrue(concurrent_results['report']['valid'])
+        self.assertEqual(concurrent_results['report'], sequential_results['report'])
+        self.assertEqual(
+            sorted(n['id'] for n in concurrent_results['graph']),
+            sorted(n['id'] for n in sequential_results['graph']))
+
+    @responses.activate
+    def test_verify_with_metrics(self):
+        url = 'https://example.org/beths-robotics-badge.json'
+        responses.add(
+            responses.GET, url, body=test_components['2_0_basic_assertion'], status=200,
+            content_type='application/ld+json'
+        )
+        set_up_image_mock('https://example.org/beths-robot-badge.png')
+        responses.add(
+            responses.GET, 'https://w3id.org/openbadges/v2',
+            body=test_components['openbadges_context'], status=200,
+            content_type='application/ld+json'
+        )
+        responses.add(
+            responses.GET, 'https://example.org/robotics-badge.json',
+            body=test_components['2_0_basic_badgeclass'], status=200,
+            content_type='application/ld+json'
+        )
+        set_up_image_mock(u'https://example.org/robotics-badge.png')
+        responses.add(
+            responses.GET, 'https://example.org/organization.json',
+            body=test_components['2_0_basic_issuer'], status=200,
+            content_type='application/ld+json'
+        )
+
+        measured = []
+        results = verify(url, metrics=True, metrics_callback=lambda task, m: measured.append((task['name'], m)))
+        self.assertTrue(results['report']['valid'])
+        metrics = results['metrics']
+        self.assertEqual(len(metrics['tasks']), len(measured))
+        self.assertEqual(metrics['total']['taskCount'], len(measured))
+        self.assertEqual(metrics['byTaskName']['FETCH_HTTP_NODE']['taskCount'], 3)
+        self.assertEqual(metrics['byTaskName']['FETCH_HTTP_NODE']['httpRequests'], 3)
+        self.assertEqual(metrics['byTaskName']['IMAGE_VALIDATION']['httpRequests'], 2)
+        self.assertEqual(
+            metrics['total']['httpBytes'], sum(m['httpBytes'] for _, m in measured))
+        self.assertGreater(metrics['total']['httpBytes'], 0)
+        self.assertTrue(all(t['wallSeconds'] >= 0 for t in metrics['tasks']))
+
+        results = verify(url)
+        self.assertNotIn('metrics', results)
+
     # def debug_live_badge_verification(self):
     #     """
     #     Developers: Uncomment this test to run a quick verification check in your debugger.
@@ -118,6 +204,301 @@ class InitializationTests(unittest.TestCase):
     #     self.assertTrue(results['report']['valid'])
 
 
+class VerifyManyTests(unittest.TestCase):
+    @responses.activate
+    def test_verify_many_in_process(self):
+        set_up_badge_mocks()
+        inputs = ['https://example.org/beths-robotics-badge.json', 'not a badge']
+
+        results = list(verify_many(iter(inputs)))
+        self.assertEqual([r[0] for r in results], inputs)
+        self.assertTrue(results[0][1]['report']['valid'])
+        self.assertFalse(results[1][1]['report']['valid'])
+        self.assertEqual(results[1][1]['input']['value'], 'not a badge')
+        self.assertGreaterEqual(results[1][1]['report']['errorCount'], 1)
+
+    @responses.activate
+    def test_verify_many_with_process_pool(self):
+        set_up_badge_mocks()
+        url = 'https://example.org/beths-robotics-badge.json'
+        inputs = [url] * 5
+
+        results = list(verify_many(inputs, jobs=2, use_cache=False))
+        self.assertEqual(len(results), 5)
+        for badge_input, report in results:
+            self.assertEqual(badge_input, url)
+            self.assertTrue(report['report']['valid'])
+            self.assertEqual(report['report']['validationSubject'], url)
+
+    @responses.activate
+    def test_verify_many_reports_failures_in_pool(self):
+        set_up_badge_mocks()
+        url = 'https://example.org/beths-robotics-badge.json'
+        unpicklable = lambda: url  # noqa: E731
+        inputs = [url, unpicklable, url]
+
+        results = list(verify_many(inputs, jobs=2, use_cache=False))
+        self.assertEqual(sorted(results, key=lambda r: r[0] is unpicklable)[-1][0], unpicklable)
+        for badge_input, report in results:
+            if badge_input is unpicklable:
+                self.assertFalse(report['report']['valid'])
+                self.assertIn('Verification could not be completed', report['report']['messages'][0]['result'])
+            else:
+                self.assertTrue(report['report']['valid'])
+
+    @unittest.skipUnless(sqlite_cache_available(), "requests_cache cannot use sqlite with this Python")
+    @responses.activate
+    def test_verify_many_with_shared_cache(self):
+        set_up_badge_mocks(exclude=[OPENBADGES_CONTEXT_V2_URI])
+        context_requests = []
+
+        def context_callback(request):
+            # Workers are forked after the cache is warmed, so they see this request, and fail any other.
+            context_requests.append(request.url)
+            if len(context_requests) > 1:
+                return 500, {}, ''
+            return 200, {'Content-Type': 'application/ld+json'}, test_components['openbadges_context']
+        responses.add_callback(responses.GET, OPENBADGES_CONTEXT_V2_URI, callback=context_callback)
+
+        url = 'https://example.org/beths-robotics-badge.json'
+        results = list(verify_many([url] * 4, jobs=2))
+        self.assertEqual(len(context_requests), 1, "The context is fetched once, to warm the shared cache")
+        self.assertEqual(len(results), 4)
+        for badge_input, report in results:
+            self.assertTrue(report['report']['valid'], "Workers load the context from the shared cache")
+
+    @unittest.skipUnless(sqlite_cache_available(), "requests_cache cannot use sqlite with this Python")
+    def test_memory_cache_is_shared_through_sqlite(self):
+        options, cache_dir = _shared_cache_options({'use_cache': True})
+        try:
+            self.assertEqual(options['cache_backend'], 'sqlite')
+            self.assertTrue(options['cache_name'].startswith(cache_dir))
+        finally:
+            os.rmdir(cache_dir)
+
+        options, cache_dir = _shared_cache_options({'use_cache': True, 'cache_backend': 'redis'})
+        self.assertEqual(options['cache_backend'], 'redis')
+        self.assertIsNone(cache_dir)
+
+
+class VerificationLimitsTests(unittest.TestCase):
+    url = 'https://example.org/beths-robotics-badge.json'
+
+    def assert_stopped_at(self, results, limit):
+        report = results['report']
+        self.assertFalse(report['valid'])
+        self.assertEqual(report['limitReached'], limit)
+        messages = [m['result'] for m in report['messages']]
+        self.assertIn('Verification stopped early: reached {}'.format(limit), messages[-1])
+        self.assertTrue(all(m.startswith('Task not executed') for m in messages[:-1]))
+
+    @responses.activate
+    def test_max_tasks(self):
+        set_up_badge_mocks()
+        results = verify(self.url, max_tasks=5, metrics=True)
+        self.assert_stopped_at(results, 'max_tasks')
+        self.assertEqual(results['metrics']['total']['taskCount'], 5)
+
+    @responses.activate
+    def test_max_fetches(self):
+        set_up_badge_mocks()
+        results = verify(self.url, max_fetches=1, metrics=True)
+        self.assert_stopped_at(results, 'max_fetches')
+        self.assertEqual(results['metrics']['byTaskName']['FETCH_HTTP_NODE']['taskCount'], 1)
+
+    @responses.activate
+    def test_deadline(self):
+        set_up_badge_mocks()
+        results = verify(self.url, deadline_seconds=0)
+        self.assert_stopped_at(results, 'deadline_seconds')
+        self.assertEqual(len(results['graph']), 0)
+
+    @responses.activate
+    def test_limits_not_reached(self):
+        set_up_badge_mocks()
+        results = verify(self.url, deadline_seconds=60, max_tasks=1000, max_fetches=10)
+        self.assertTrue(results['report']['valid'])
+        self.assertNotIn('limitReached', results['report'])
+
+
+class SubgraphCacheTests(unittest.TestCase):
+    url = 'https://example.org/beths-robotics-badge.json'
+
+    @responses.activate
+    def test_validated_subgraphs_reused(self):
+        set_up_badge_mocks(exclude=['https://example.org/robotics-badge.png'])
+        cache = SubgraphCache()
+        results = verify(self.url, metrics=True, subgraph_cache=cache)
+        self.assertEqual(sorted(key[0] for key in cache._entries),
+                         ['https://example.org/organization.json', 'https://example.org/robotics-badge.json'])
+
+        cached_results = verify(self.url, metrics=True, subgraph_cache=cache)
+        self.assertLess(cached_results['metrics']['total']['taskCount'], results['metrics']['total']['taskCount'])
+        self.assertEqual(cached_results['report'], results['report'])
+        self.assertEqual(sorted(node['id'] for node in cached_results['graph']),
+                         sorted(node['id'] for node in results['graph']))
+
+    @responses.activate
+    def test_changed_content_not_reused(self):
+        set_up_badge_mocks()
+        cache = SubgraphCache()
+        verify(self.url, subgraph_cache=cache)
+
+        clear_shared_loaders()  # Drop cached HTTP responses
+        responses.reset()
+        set_up_badge_mocks(exclude=['https://example.org/robotics-badge.json'])
+        badgeclass = json.loads(test_components['2_0_basic_badgeclass'])
+        badgeclass['name'] = 'Renamed Robotics Badge'
+        responses.add(responses.GET, 'https://example.org/robotics-badge.json', body=json.dumps(badgeclass),
+                      status=200, content_type='application/ld+json')
+
+        results = verify(self.url, subgraph_cache=cache)
+        self.assertTrue(results['report']['valid'])
+        self.assertIn('Renamed Robotics Badge', [node.get('name') for node in results['graph']])
+        self.assertEqual(len(cache), 3)
+
+    @responses.activate
+    def test_changed_nested_issuer_not_reused(self):
+        set_up_badge_mocks()
+        cache = SubgraphCache()
+        verify(self.url, subgraph_cache=cache)
+
+        clear_shared_loaders()  # Drop cached HTTP responses
+        responses.reset()
+        set_up_badge_mocks(exclude=['https://example.org/organization.json'])
+        issuer = json.loads(test_components['2_0_basic_issuer'])
+        issuer['name'] = 'CHANGED'
+        responses.add(responses.GET, 'https://example.org/organization.json', body=json.dumps(issuer),
+                      status=200, content_type='application/ld+json')
+
+        results = verify(self.url, subgraph_cache=cache)
+        self.assertTrue(results['report']['valid'])
+        self.assertIn('https://example.org/organization.json', [call.request.url for call in responses.calls])
+        issuer_node = [node for node in results['graph'] if node['id'] == 'https://example.org/organization.json'][0]
+        self.assertEqual(issuer_node['name'], 'CHANGED', "The BadgeClass subgraph is reused, not its Issuer")
+        self.assertEqual(len(cache), 3)
+
+    @responses.activate
+    def test_subgraphs_expire(self):
+        set_up_badge_mocks()
+        cache = SubgraphCache(expire_after=0)
+        results = verify(self.url, metrics=True, subgraph_cache=cache)
+        self.assertEqual(verify(self.url, metrics=True, subgraph_cache=cache)['metrics']['total']['taskCount'],
+                         results['metrics']['total']['taskCount'])
+
+    @responses.activate
+    def test_stopped_verification_not_recorded(self):
+        set_up_badge_mocks()
+        cache = SubgraphCache()
+        verify(self.url, max_tasks=20, subgraph_cache=cache)
+        self.assertEqual(len(cache), 0)
+
+
+class SinglePassValidationTests(unittest.TestCase):
+    url = 'https://example.org/beths-robotics-badge.json'
+
+    def _verify(self, **options):
+        selected_options = _get_options(options)
+        store = verification_store(self.url, options=selected_options)
+        property_results = sorted(
+            (t.get('node_id') or str(t.get('node_path')), t['prop_name'], t['success'], t['result'])
+            for t in store.get_state()['tasks'] if t['name'] == VALIDATE_PROPERTY)
+        report = generate_report(store, options=selected_options)['report']
+        return report, property_results
+
+    @responses.activate
+    def test_single_pass_report_matches_separate_tasks(self):
+        set_up_badge_mocks(exclude=['https://example.org/robotics-badge.png'])
+        responses.add(responses.GET, 'https://example.org/robotics-badge.png', status=404)
+        issuer = json.loads(test_components['2_0_basic_issuer'])
+        issuer['email'] = 'not an email'
+        badgeclass = json.loads(test_components['2_0_basic_badgeclass'])
+        badgeclass['image'] = 'not an image'
+        responses.replace(responses.GET, 'https://example.org/robotics-badge.json', body=json.dumps(badgeclass),
+                          status=200, content_type='application/ld+json')
+
+        for options in [{}, {'fast_store': True}]:
+            responses.replace(responses.GET, 'https://example.org/organization.json', body=json.dumps(issuer),
+                              status=200, content_type='application/ld+json')
+            report, property_results = self._verify(**options)
+            single_pass_report, single_pass_property_results = self._verify(single_pass_validation=True, **options)
+            self.assertGreater(report['errorCount'], 0)
+            self.assertEqual(single_pass_report, report)
+            self.assertEqual(single_pass_property_results, property_results)
+
+
+class FailFastTests(unittest.TestCase):
+    @responses.activate
+    def test_fail_fast_stops_after_first_error(self):
+        set_up_badge_mocks(exclude=['https://example.org/robotics-badge.png'])
+        url = 'https://example.org/beths-robotics-badge.json'
+
+        results = verify(url)
+        self.assertGreater(results['report']['errorCount'], 0)
+
+        fail_fast_results = verify(url, fail_fast=True, metrics=True)
+        self.assertFalse(fail_fast_results['report']['valid'])
+        self.assertEqual(fail_fast_results['report']['errorCount'], 1)
+        self.assertEqual(fail_fast_results['report']['messages'][0], results['report']['messages'][0])
+        self.assertLess(fail_fast_results['metrics']['total']['taskCount'],
+                        len(verify(url, metrics=True)['metrics']['tasks']))
+
+    @responses.activate
+    def test_fail_fast_on_valid_badge(self):
+        set_up_badge_mocks()
+        url = 'https://example.org/beths-robotics-badge.json'
+        self.assertEqual(verify(url, fail_fast=True)['report'], verify(url)['report'])
+
+
+class ConcurrentVerificationTests(unittest.TestCase):
+    @responses.activate
+    def test_verifications_in_threads(self):
+        set_up_badge_mocks()
+        url = 'https://example.org/beths-robotics-badge.json'
+        expected = verify(url)
+        results = []
+
+        def _verify():
+            results.append(verify(url))
+        threads = [threading.Thread(target=_verify) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(result['report'], expected['report'])
+            self.assertEqual(result['graph'], expected['graph'])
+
+
+class CacheOptionsTests(unittest.TestCase):
+    @responses.activate
+    def test_verify_without_cache_repeats_requests(self):
+        clear_shared_loaders()
+        set_up_badge_mocks()
+        url = 'https://example.org/beths-robotics-badge.json'
+
+        results = verify(url, use_cache=False)
+        self.assertTrue(results['report']['valid'])
+        first_calls = [call.request.url for call in responses.calls]
+        self.assertIn(url, first_calls)
+
+        results = verify(url, use_cache=False)
+        self.assertTrue(results['report']['valid'])
+        self.assertEqual([call.request.url for call in responses.calls], first_calls * 2)
+
+
+class BundledContextsTests(unittest.TestCase):
+    @responses.activate
+    def test_verify_without_fetching_contexts(self):
+        clear_shared_loaders()  # Drop cached HTTP responses
+        set_up_badge_mocks(exclude=[OPENBADGES_CONTEXT_V2_URI])
+        results = verify('https://example.org/beths-robotics-badge.json', bundled_contexts=True)
+        self.assertTrue(results['report']['valid'])
+        self.assertNotIn(OPENBADGES_CONTEXT_V2_URI, [call.request.url for call in responses.calls])
+
+
 class MessagesTests(unittest.TestCase):
     def test_message_reporting(self):
         store = create_store(main_reducer, INITIAL_STATE)
@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from openbadges.verifier.openbadges_context import OPENBADGES_CONTEXT_V2_URI
+
+try:
+    from tests.testfiles.test_components import test_components
+except (ImportError, SystemError):
+    from .testfiles.test_components import test_components
+
+
+class StandInServer(object):
+    """
+    A local HTTP server that serves fixed resources by path, standing in for remote badge hosts.
+    """
+    def __init__(self):
+        resources = self.resources = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    body, content_type = resources[self.path]
+                except KeyError:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    def add(self, path, body, content_type='application/ld+json'):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.resources['/' + path] = (body, content_type)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "verify_async requires Python 3.5+")
+class VerifyAsyncTests(unittest.TestCase):
+    def setUp(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _set_up_badge(self, server):
+        for key, path in [('2_0_basic_assertion', 'beths-robotics-badge.json'),
+                          ('2_0_basic_badgeclass', 'robotics-badge.json'),
+                          ('2_0_basic_issuer', 'organization.json')]:
+            server.add(path, test_components[key].replace('https://example.org/', server.base_url))
+        server.add('openbadges/v2', test_components['openbadges_context'])
+        with open(os.path.join(os.path.dirname(__file__), 'testfiles', 'public_domain_heart.png'), 'rb') as f:
+            image = f.read()
+        server.add('beths-robot-badge.png', image, 'image/png')
+        server.add('robotics-badge.png', image, 'image/png')
+
+    def _local_transport(self, server):
+        from openbadges.verifier.aio import AiohttpTransport
+
+        class LocalContextTransport(AiohttpTransport):
+            def get(self, url, headers=None):
+                url = url.replace(OPENBADGES_CONTEXT_V2_URI, server.base_url + 'openbadges/v2')
+                return super(LocalContextTransport, self).get(url, headers)
+
+        return LocalContextTransport()
+
+    def test_verify_async_against_local_server(self):
+        from openbadges.verifier import verify_async
+
+        with StandInServer() as server:
+            self._set_up_badge(server)
+            url = server.base_url + 'beths-robotics-badge.json'
+
+            transport = self._local_transport(server)
+            try:
+                results = self.loop.run_until_complete(verify_async(url, transport=transport))
+            finally:
+                self.loop.run_until_complete(transport.close())
+
+        self.assertEqual(results['input']['input_type'], 'url')
+        self.assertEqual(results['report']['validationSubject'], url)
+        self.assertEqual(len(results['report']['messages']), 0, "There should be no failing tasks.")
+        self.assertTrue(results['report']['valid'])
+        self.assertEqual(len(results['graph']), 3)
+
+    def test_many_verifications_share_one_loop(self):
+        import asyncio
+        from openbadges.verifier import verify_async
+
+        with StandInServer() as server:
+            self._set_up_badge(server)
+            url = server.base_url + 'beths-robotics-badge.json'
+
+            transport = self._local_transport(server)
+            try:
+                verifications = [
+                    asyncio.ensure_future(verify_async(url, transport=transport), loop=self.loop) for _ in range(5)]
+                all_results = self.loop.run_until_complete(asyncio.gather(*verifications))
+            finally:
+                self.loop.run_until_complete(transport.close())
+
+        self.assertEqual(len(all_results), 5)
+        self.assertTrue(all(r['report']['valid'] for r in all_results))
+
+    def test_unreachable_resource_fails_task(self):
+        from openbadges.verifier import verify_async
+
+        with StandInServer() as server:
+            self._set_up_badge(server)
+            del server.resources['/robotics-badge.png']
+            url = server.base_url + 'beths-robotics-badge.json'
+
+            transport = self._local_transport(server)
+            try:
+                results = self.loop.run_until_complete(verify_async(url, transport=transport))
+            finally:
+                self.loop.run_until_complete(transport.close())
+
+        self.assertFalse(results['report']['valid'])
+        self.assertEqual(results['report']['errorCount'], 1)
+        self.assertIn('Could not fetch image', results['report']['messages'][0]['result'])
+
+    def test_response_encoding_from_content_type(self):
+        from openbadges.verifier.aio import build_response
+
+        content = u'{"name": "Bad\u00e9 Badge"}'.encode('latin-1')
+        response = build_response(
+            'https://example.org/badge.json', 200, {'Content-Type': 'application/json; charset=ISO-8859-1'}, content)
+        self.assertEqual(response.encoding, 'ISO-8859-1')
+        self.assertEqual(response.json()['name'], u'Bad\u00e9 Badge')
+
+        response = build_response('https://example.org/badge.png', 200, {'Content-Type': 'image/png'}, b'')
+        self.assertIsNone(response.encoding)
@@ -20,3 +20,17 @@ def set_up_context_mock():
 def set_up_image_mock(url):
     with open(os.path.join(os.path.dirname(__file__), 'testfiles', 'public_domain_heart.png'), 'rb') as f:
         responses.add(responses.GET, url, body=f.read(), content_type='image/png')
+
+
+# Mock the resources of the basic 2.0 hosted badge, except any urls in exclude
+def set_up_badge_mocks(exclude=()):
+    for key, url in [('2_0_basic_assertion', 'https://example.org/beths-robotics-badge.json'),
+                     ('2_0_basic_badgeclass', 'https://example.org/robotics-badge.json'),
+                     ('2_0_basic_issuer', 'https://example.org/organization.json'),
+                     ('openbadges_context', OPENBADGES_CONTEXT_V2_URI)]:
+        if url not in exclude:
+            responses.add(
+                responses.GET, url, body=test_components[key], status=200, content_type='application/ld+json')
+    for url in ['https://example.org/beths-robot-badge.png', 'https://example.org/robotics-badge.png']:
+        if url not in exclude:
+            set_up_image_mock(url)